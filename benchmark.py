@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the coco2yolo_obb converter.
+
+Generates a synthetic COCO dataset and times every stage of the conversion
+(JSON load, indexing, geometry, formatting, writing) as well as complete
+``convert_coco_to_yolo_obb`` runs and the start-up time of the command line
+tool. Throughput and peak memory are reported,
+and results can be saved as JSON and compared against an earlier run to catch
+performance regressions between commits.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --images 5000 --vertices 200 --output results.json
+    python benchmark.py --compare results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+try:
+    import numpy as np
+    import coco2yolo_obb as converter
+except ImportError as e:
+    print(f"Error: {e}")
+    print("Please install required packages and run from the repository root")
+    sys.exit(1)
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+ORDERINGS = ('grouped', 'shuffled', 'annotations-first')
+STAGES = ('startup', 'load', 'index', 'geometry', 'format', 'write', 'end-to-end')
+
+
+def encode_rle_counts(counts):
+    """Compress RLE run lengths into the COCO (pycocotools) string form."""
+    chars = []
+    for i, value in enumerate(counts):
+        if i > 2:
+            value -= counts[i - 2]
+        more = True
+        while more:
+            chunk = value & 0x1f
+            value >>= 5
+            more = value != -1 if chunk & 0x10 else value != 0
+            if more:
+                chunk |= 0x20
+            chars.append(chr(chunk + 48))
+    return ''.join(chars)
+
+
+def ellipse_rle(cx, cy, a, b, width, height):
+    """Uncompressed RLE counts of an axis-aligned filled ellipse, without building the mask."""
+    counts = []
+    position = 0
+    for column in range(max(0, int(cx - a)), min(width, int(cx + a) + 1)):
+        t = (column - cx) / a
+        if abs(t) > 1:
+            continue
+        half = b * math.sqrt(1 - t * t)
+        top, bottom = max(0, int(cy - half)), min(height - 1, int(cy + half))
+        if bottom < top:
+            continue
+        start = column * height + top
+        counts.append(start - position)
+        counts.append(bottom - top + 1)
+        position = start + bottom - top + 1
+    counts.append(width * height - position)
+    if not counts[:-1]:
+        counts = [width * height]
+    return counts
+
+
+def generate_coco(
+    num_images=1000,
+    annotations_per_image=10,
+    vertices=32,
+    rle_fraction=0.0,
+    ordering='grouped',
+    num_categories=10,
+    seed=0
+):
+    """
+    Create a synthetic COCO dataset.
+
+    Polygons are noisy star-shaped outlines with the given number of vertices.
+    A fraction of the annotations are crowd RLE masks (half of them with
+    compressed counts).
+
+    Args:
+        ordering: 'grouped' (annotations sorted by image), 'shuffled'
+            (annotations in random order) or 'annotations-first' (shuffled,
+            and the annotations array precedes images and categories)
+    """
+    rng = random.Random(seed)
+    images = []
+    annotations = []
+    for image_id in range(1, num_images + 1):
+        width, height = rng.choice([(640, 480), (1280, 720), (1920, 1080)])
+        images.append({
+            'id': image_id, 'file_name': f"image_{image_id:07d}.jpg",
+            'width': width, 'height': height
+        })
+        for _ in range(annotations_per_image):
+            cx, cy = rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height
+            a, b = rng.uniform(10, width / 8), rng.uniform(10, height / 8)
+            ann = {
+                'id': len(annotations) + 1,
+                'image_id': image_id,
+                'category_id': rng.randint(1, num_categories),
+                'iscrowd': 0
+            }
+            if rng.random() < rle_fraction:
+                counts = ellipse_rle(cx, cy, a, b, width, height)
+                ann['iscrowd'] = 1
+                ann['segmentation'] = {
+                    'size': [height, width],
+                    'counts': encode_rle_counts(counts) if rng.random() < 0.5 else counts
+                }
+            else:
+                rotation = rng.uniform(0, math.pi)
+                polygon = []
+                for i in range(vertices):
+                    t = 2 * math.pi * i / vertices
+                    radius = rng.uniform(0.8, 1.0)
+                    x, y = a * radius * math.cos(t), b * radius * math.sin(t)
+                    polygon.append(round(cx + x * math.cos(rotation) - y * math.sin(rotation), 2))
+                    polygon.append(round(cy + x * math.sin(rotation) + y * math.cos(rotation), 2))
+                ann['segmentation'] = [polygon]
+            annotations.append(ann)
+
+    if ordering != 'grouped':
+        rng.shuffle(annotations)
+    categories = [{'id': i, 'name': f"class_{i}"} for i in range(1, num_categories + 1)]
+    if ordering == 'annotations-first':
+        return {'annotations': annotations, 'images': images, 'categories': categories}
+    return {'images': images, 'categories': categories, 'annotations': annotations}
+
+
+def measure(func, repeat=3):
+    """
+    Best wall time of ``func`` over ``repeat`` runs, plus its peak traced memory
+    (from one extra run under tracemalloc, so tracing does not skew the timing).
+
+    Returns:
+        Tuple of (seconds, peak MB, result of the last call)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1 << 20), result
+
+
+def quiet(func, *args, **kwargs):
+    """Call ``func`` with its console output suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def dict_index(data):
+    """
+    Reference for the image -> annotations index: the dict-of-lists grouping
+    the converter used before its CSR index, paired with the image dicts.
+    """
+    images_dict = {img['id']: img for img in data['images']}
+    annotations_by_image = {}
+    for ann in data['annotations']:
+        image_id = ann['image_id']
+        if image_id not in annotations_by_image:
+            annotations_by_image[image_id] = []
+        annotations_by_image[image_id].append(ann)
+    return [(images_dict[image_id], annotations)
+            for image_id, annotations in annotations_by_image.items()
+            if image_id in images_dict]
+
+
+def first_polygons(annotations):
+    """Point sets the converter fits, one per annotation with a segmentation."""
+    polygons, widths, heights = [], [], []
+    for ann in annotations:
+        segmentation = ann['segmentation']
+        if isinstance(segmentation, dict):
+            polygon = converter.rle_to_polygon_points(segmentation)
+            height, width = segmentation['size']
+        else:
+            polygon = segmentation[0]
+            width = height = 1000
+        if len(polygon) >= 6:
+            polygons.append(polygon)
+            widths.append(width)
+            heights.append(height)
+    return polygons, widths, heights
+
+
+def startup_commands(work_dir):
+    """
+    Commands timed by the start-up benchmark, as (name, argv) pairs: the bare
+    interpreter and NumPy for reference, importing the converter, ``--version``,
+    and a one-image conversion with each geometry backend.
+    """
+    script = str(Path(converter.__file__).absolute())
+    json_file = work_dir / 'one_image.json'
+    with open(json_file, 'w') as f:
+        json.dump(generate_coco(1, 1, 8, 0.0, 'grouped'), f)
+    commands = [
+        ('startup.python', [sys.executable, '-c', 'pass']),
+        ('startup.numpy', [sys.executable, '-c', 'import numpy']),
+        ('startup.import', [sys.executable, '-c', 'import coco2yolo_obb']),
+        ('startup.version', [sys.executable, script, '--version']),
+    ]
+    for backend in converter.GEOMETRY_BACKENDS:
+        if backend == 'opencv' and cv2 is None:
+            continue
+        commands.append((f"startup.convert_{backend}", [
+            sys.executable, script, str(json_file), '--output-dir', str(work_dir / 'one_image'),
+            '--geometry-backend', backend
+        ]))
+    return commands
+
+
+def run_benchmarks(args, work_dir):
+    """Run the selected benchmarks and return {name: result dict}."""
+    data = generate_coco(
+        args.images, args.annotations_per_image, args.vertices,
+        args.rle_fraction, args.ordering, seed=args.seed
+    )
+    json_file = work_dir / 'annotations.json'
+    with open(json_file, 'w') as f:
+        json.dump(data, f)
+    num_annotations = len(data['annotations'])
+    print(f"Dataset: {args.images} images, {num_annotations} annotations, "
+          f"{json_file.stat().st_size / (1 << 20):.1f} MB JSON ({args.ordering})\n")
+
+    results = {}
+
+    def record(name, func, items, unit, repeat=args.repeat):
+        seconds, peak_mb, result = measure(func, repeat)
+        results[name] = {
+            'seconds': seconds,
+            'items': items,
+            'unit': unit,
+            'throughput': items / seconds if seconds > 0 else float('inf'),
+            'peak_mb': peak_mb
+        }
+        print(f"{name:<28} {seconds * 1000:10.1f} ms {items / max(seconds, 1e-12):14,.0f} {unit}/s "
+              f"{peak_mb:10.1f} MB")
+        return result
+
+    def load():
+        with open(json_file, 'r') as f:
+            return json.load(f)
+
+    stages = set(args.stages)
+    if 'startup' in stages:
+        for name, command in startup_commands(work_dir):
+            record(name, lambda: subprocess.run(
+                command, stdout=subprocess.DEVNULL, check=True, cwd=Path(converter.__file__).parent
+            ), 1, 'runs')
+    if 'load' in stages:
+        record('load.json', load, num_annotations, 'annotations')
+    if 'index' in stages:
+        record('index.dict_reference', lambda: dict_index(data), num_annotations, 'annotations')
+        record('index.csr',
+               lambda: list(converter._image_annotations(
+                   data['images'], converter._AnnotationIndex(data['annotations']),
+                   converter.ConversionStats()
+               )),
+               num_annotations, 'annotations')
+
+    polygons, widths, heights = first_polygons(data['annotations'])
+    if 'geometry' in stages:
+        if cv2 is not None:
+            record('geometry.opencv',
+                   lambda: [converter.calculate_obb_corners(p, w, h)
+                            for p, w, h in zip(polygons, widths, heights)],
+                   len(polygons), 'polygons')
+            record('geometry.batch_opencv',
+                   lambda: converter.calculate_obb_corners_batch(
+                       polygons, widths, heights, backend='opencv'
+                   ),
+                   len(polygons), 'polygons')
+        record('geometry.batch_numpy',
+               lambda: converter.calculate_obb_corners_batch(
+                   polygons, widths, heights, backend='numpy'
+               ),
+               len(polygons), 'polygons')
+        corners = record('geometry.batch',
+                         lambda: converter.calculate_obb_corners_batch(polygons, widths, heights),
+                         len(polygons), 'polygons')
+    else:
+        corners = converter.calculate_obb_corners_batch(polygons, widths, heights)
+
+    if 'format' in stages:
+        class_ids = [i % 10 for i in range(len(corners))]
+        record('format.lines',
+               lambda: converter.format_label_lines(class_ids, corners),
+               len(corners), 'lines')
+
+    if 'write' in stages:
+        per_file = max(1, args.annotations_per_image)
+        text = converter.format_label_lines(
+            [i % 10 for i in range(len(corners[:per_file]))], corners[:per_file]
+        )
+        write_dir = work_dir / 'write'
+
+        def write_files():
+            shutil.rmtree(write_dir, ignore_errors=True)
+            write_dir.mkdir()
+            for i in range(args.images):
+                with open(write_dir / f"image_{i:07d}.txt", 'w') as f:
+                    f.write(text)
+
+        def write_tar():
+            shutil.rmtree(write_dir, ignore_errors=True)
+            write_dir.mkdir()
+            sink = converter._TarShardSink(write_dir)
+            for i in range(args.images):
+                sink.write(Path(f"image_{i:07d}.txt"), text, 'w')
+            sink.close()
+
+        record('write.files', write_files, args.images, 'files')
+        record('write.tar', write_tar, args.images, 'files')
+
+    if 'end-to-end' in stages:
+        output_dir = work_dir / 'labels'
+
+        def convert(**kwargs):
+            def run():
+                shutil.rmtree(output_dir, ignore_errors=True)
+                quiet(converter.convert_coco_to_yolo_obb, str(json_file), str(output_dir), **kwargs)
+            return run
+
+        variants = [
+            ('e2e.default', {}),
+            ('e2e.streaming', {'streaming': True}),
+            ('e2e.tar', {'output_backend': 'tar'}),
+        ]
+        if args.workers > 1:
+            variants.append((f"e2e.workers{args.workers}", {'workers': args.workers}))
+        for name, kwargs in variants:
+            record(name, convert(**kwargs), num_annotations, 'annotations',
+                   repeat=max(1, args.repeat - 1))
+
+    return results
+
+
+def git_revision():
+    """Current commit of the working tree, if available."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline, threshold):
+    """
+    Print the change of every benchmark against a baseline.
+
+    Returns:
+        Names of the benchmarks that got slower by more than ``threshold`` (a fraction)
+    """
+    regressions = []
+    print(f"\nComparison against {baseline['meta'].get('revision') or 'baseline'}:")
+    print(f"{'benchmark':<28} {'baseline':>10} {'current':>10} {'change':>9}")
+    for name, result in current.items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['seconds']
+        after = result['seconds']
+        change = after / before - 1 if before > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<28} {before * 1000:8.1f}ms {after * 1000:8.1f}ms {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    """Main function with argument parsing."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the COCO to YOLO OBB conversion pipeline on synthetic data",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s
+  %(prog)s --images 5000 --vertices 200 --rle-fraction 0.2
+  %(prog)s --output before.json
+  %(prog)s --compare before.json --threshold 0.1
+        """
+    )
+    parser.add_argument('--images', type=int, default=1000, help='Number of images (default: 1000)')
+    parser.add_argument('--annotations-per-image', type=int, default=10,
+                        help='Annotations per image (default: 10)')
+    parser.add_argument('--vertices', type=int, default=32,
+                        help='Vertices per polygon (default: 32)')
+    parser.add_argument('--rle-fraction', type=float, default=0.1,
+                        help='Fraction of annotations stored as RLE masks (default: 0.1)')
+    parser.add_argument('--ordering', choices=ORDERINGS, default='grouped',
+                        help='Order of annotations in the JSON file (default: grouped)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per benchmark, best is kept (default: 3)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for the parallel end-to-end run '
+                             '(default: CPU count)')
+    parser.add_argument('--stages', nargs='+',
+                        default=list(STAGES), choices=STAGES,
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('--output', help='Save results to this JSON file')
+    parser.add_argument('--compare', help='Compare against results saved with --output')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Slowdown reported as a regression by --compare (default: 0.1 = 10%%)')
+    args = parser.parse_args()
+
+    meta = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__ if cv2 is not None else None,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {
+            key: value for key, value in vars(args).items()
+            if key not in ('output', 'compare', 'threshold')
+        }
+    }
+
+    print(f"{'benchmark':<28} {'time':>13} {'throughput':>21} {'peak memory':>13}")
+    with tempfile.TemporaryDirectory(prefix="coco2yolo-bench-") as tmp_dir:
+        results = run_benchmarks(args, Path(tmp_dir))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('parameters') != meta['parameters']:
+            print("\nWarning: baseline was recorded with different parameters")
+        if compare_results(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
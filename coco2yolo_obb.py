@@ -10,157 +10,4698 @@ Author: Your Name
 License: MIT
 """
 
+from __future__ import annotations
+
 import json
+import hashlib
 import os
+import re
 import math
 import argparse
+import array
+import contextlib
+import functools
+import importlib
+import itertools
+import operator
+import shutil
+import struct
 import sys
+import tempfile
+import tarfile
+import time
+import io
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Iterator, Optional, Callable
+
+
+class _LazyModule:
+    """
+    Stand-in for a module that is only imported once one of its attributes is used.
+    
+    NumPy and OpenCV take most of the start-up time, and OpenCV is only needed
+    by the 'opencv' geometry backend, so ``--help`` or unpacking shards should
+    not wait for them. Once imported, the module replaces this object in the
+    module globals, so later lookups cost nothing extra.
+    """
+    
+    def __init__(self, name: str, package: str):
+        self._name = name
+        self._package = package
+    
+    def __getattr__(self, attr: str):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        try:
+            module = importlib.import_module(self._name)
+        except ImportError as e:
+            raise ImportError(
+                f"Required dependency missing: {e}. Please install it: pip install {self._package}"
+            ) from e
+        for alias, value in list(globals().items()):
+            if value is self:
+                globals()[alias] = module
+        return getattr(module, attr)
+
+
+np = _LazyModule('numpy', 'numpy')
+cv2 = _LazyModule('cv2', 'opencv-python')
+
+
+class OptionError(ValueError):
+    """An invalid conversion option, or options that cannot be combined."""
+
+
+def calculate_obb_corners(
+    segmentation: List[float], image_width: int, image_height: int
+) -> List[float]:
+    """
+    Calculate oriented bounding box corners from segmentation polygon.
+    
+    Args:
+        segmentation: List of polygon coordinates [x1, y1, x2, y2, ...]
+        image_width: Width of the image
+        image_height: Height of the image
+        
+    Returns:
+        List of 8 normalized corner coordinates [x1, y1, x2, y2, x3, y3, x4, y4]
+        in ``CORNER_ORDER``
+    """
+    # Convert segmentation to numpy array
+    points = np.array(segmentation).reshape(-1, 2).astype(np.float32)
+    
+    # Calculate minimum area rectangle, in the same form with every OpenCV version
+    center, size, angle = cv2.minAreaRect(points)
+    box_points = cv2.boxPoints((center,) + _canonical_rect(size, angle))
+    
+    # Normalize coordinates to [0, 1] range
+    normalized_corners = []
+    for point in box_points:
+        x_norm = point[0] / image_width
+        y_norm = point[1] / image_height
+        normalized_corners.extend([x_norm, y_norm])
+    
+    return normalized_corners
+
+
+# Point sets are processed in slices of about this many vertices
+_BATCH_ELEMENTS = 1 << 16
+
+# Point sets with at least this many vertices have interior points filtered out
+# before their convex hull is computed
+_DENSE_POINTS = 256
+
+
+def _pack_polygons(polygons: List[List[float]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pack flat polygons [x1, y1, x2, y2, ...] into one CSR vertex buffer.
+    
+    Returns:
+        Tuple of (x, y, offsets) where polygon i owns vertices offsets[i]:offsets[i + 1]
+    """
+    lengths = np.fromiter(map(len, polygons), dtype=np.int64, count=len(polygons))
+    if (lengths % 2).any():
+        raise ValueError("polygons must have an even number of coordinates")
+    if all(type(p) is list for p in polygons):
+        # Much cheaper than one small array per polygon
+        flat = np.fromiter(
+            itertools.chain.from_iterable(polygons), dtype=np.float64, count=int(lengths.sum())
+        )
+    else:
+        flat = np.concatenate([np.asarray(p, dtype=np.float64).ravel() for p in polygons])
+    counts = lengths // 2
+    offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return flat[0::2], flat[1::2], offsets
+
+
+def _segment_ids(offsets: np.ndarray) -> np.ndarray:
+    """Owning segment of every element of a CSR layout."""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def _offsets_from_ids(ids: np.ndarray, num: int) -> np.ndarray:
+    """CSR offsets of a sorted segment id array."""
+    offsets = np.zeros(num + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=num), out=offsets[1:])
+    return offsets
+
+
+def _sort_segments(
+    x: np.ndarray, y: np.ndarray, ids: np.ndarray, offsets: np.ndarray
+) -> np.ndarray:
+    """
+    Permutation sorting every CSR segment by (x, y), keeping segments in place.
+    
+    A single float argsort on x shifted into a disjoint range per segment is far
+    cheaper than a multi-key lexsort; runs of equal keys are then re-sorted by y.
+    Input that is already sorted (e.g. RLE boundary points) is detected first.
+    """
+    dx = np.diff(x)
+    ordered = (ids[1:] != ids[:-1]) | (dx > 0) | ((dx == 0) & (y[1:] >= y[:-1]))
+    if ordered.all():
+        return np.arange(len(x))
+    low = np.minimum.reduceat(x, offsets[:-1])
+    high = np.maximum.reduceat(x, offsets[:-1])
+    span = float((high - low).max()) + 1.0
+    key = (x - low[ids]) + ids * span
+    order = np.argsort(key)
+    key = key[order]
+    tied = np.zeros(len(key), dtype=bool)
+    tied[1:] = key[1:] == key[:-1]
+    if tied.any():
+        tied[:-1] |= tied[1:]
+        positions = np.flatnonzero(tied)
+        subset = order[positions]
+        by_y = np.argsort(y[subset])
+        by_y = by_y[np.argsort(key[positions][by_y], kind='stable')]
+        order[positions] = subset[by_y]
+    return order
+
+
+def _reduce_chain(x: np.ndarray, y: np.ndarray, ids: np.ndarray, sign: float):
+    """
+    Reduce (id, x, y)-sorted points to their lower (sign=1) or upper (sign=-1) hull chains.
+    
+    Every pass drops, in all segments at once, each interior point that does not
+    make a strict convex turn with its current neighbours. Hull vertices always
+    do, so chains converge after a few passes; segments that stop changing are
+    set aside so later passes only touch the ones still shrinking.
+    """
+    done = []
+    while len(x) > 2:
+        interior = np.zeros(len(x), dtype=bool)
+        interior[1:-1] = (ids[1:-1] == ids[:-2]) & (ids[1:-1] == ids[2:])
+        turn = np.zeros(len(x))
+        turn[1:-1] = ((x[1:-1] - x[:-2]) * (y[2:] - y[1:-1])
+                      - (y[1:-1] - y[:-2]) * (x[2:] - x[1:-1]))
+        drop = interior & (sign * turn <= 0)
+        if not drop.any():
+            break
+        changed = np.zeros(int(ids[-1]) + 1, dtype=bool)
+        changed[ids[drop]] = True
+        settled = ~changed[ids]
+        done.append((x[settled], y[settled], ids[settled]))
+        pending = ~settled & ~drop
+        x, y, ids = x[pending], y[pending], ids[pending]
+    done.append((x, y, ids))
+    x, y, ids = (np.concatenate(parts) for parts in zip(*done))
+    order = np.argsort(ids, kind='stable')
+    return x[order], y[order], ids[order]
+
+
+def _octagon_filter(x: np.ndarray, y: np.ndarray, offsets: np.ndarray):
+    """
+    Akl-Toussaint heuristic: drop points strictly inside the octagon spanned by
+    the extreme points of every dense CSR point set along x, y, x + y and x - y.
+    
+    The discarded points can never be hull vertices. Outlines have few of them,
+    but filled point sets (e.g. noisy crowd masks) consist mostly of them, and
+    this linear pass is much cheaper than sorting them in ``_convex_hulls``.
+    """
+    sizes = np.diff(offsets)
+    dense = sizes >= _DENSE_POINTS
+    if not dense.any():
+        return x, y, offsets
+    ids = _segment_ids(offsets)
+    candidate = dense[ids]
+    cx, cy = x[candidate], y[candidate]
+    # Dense segments renumbered 0..k-1 with their own offsets
+    sub_sizes = sizes[dense]
+    starts = np.zeros(len(sub_sizes), dtype=np.int64)
+    np.cumsum(sub_sizes[:-1], out=starts[1:])
+    index = np.arange(len(cx))
+    
+    def extreme(key):
+        # First point of every segment where key is minimal
+        smallest = np.repeat(np.minimum.reduceat(key, starts), sub_sizes)
+        return np.minimum.reduceat(np.where(key == smallest, index, len(cx)), starts)
+    
+    # Counter-clockwise: left, lower-left, bottom, lower-right, right, upper-right, top, upper-left
+    corners = [
+        extreme(cx), extreme(cx + cy), extreme(cy), extreme(cy - cx),
+        extreme(-cx), extreme(-cx - cy), extreme(-cy), extreme(cx - cy)
+    ]
+    inside = np.ones(len(cx), dtype=bool)
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        # Left of the edge a -> b: nx * x + ny * y > c, with (nx, ny) = (-(by - ay), bx - ax)
+        nx, ny = cy[a] - cy[b], cx[b] - cx[a]
+        c = nx * cx[a] + ny * cy[a]
+        # Edges between coinciding extremes bound nothing
+        c[(nx == 0) & (ny == 0)] = -np.inf
+        inside &= (
+            np.repeat(nx, sub_sizes) * cx + np.repeat(ny, sub_sizes) * cy > np.repeat(c, sub_sizes)
+        )
+    for corner in corners:
+        inside[corner] = False
+    
+    keep = np.ones(len(x), dtype=bool)
+    keep[np.flatnonzero(candidate)[inside]] = False
+    return x[keep], y[keep], _offsets_from_ids(ids[keep], len(offsets) - 1)
+
+
+def _convex_hulls(x: np.ndarray, y: np.ndarray, offsets: np.ndarray):
+    """
+    Convex hulls of CSR point sets by a segmented, vectorized monotone chain.
+    
+    Returns:
+        Tuple of (hull x, hull y, hull offsets) with each hull in counter-clockwise
+        order starting from its leftmost point. Hulls of 1 or 2 vertices are point
+        and segment degenerates.
+    """
+    num = len(offsets) - 1
+    x, y, offsets = _octagon_filter(x, y, offsets)
+    ids = _segment_ids(offsets)
+    order = _sort_segments(x, y, ids, offsets)
+    x, y = x[order], y[order]
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:] = (x[1:] != x[:-1]) | (y[1:] != y[:-1]) | (ids[1:] != ids[:-1])
+    x, y, ids = x[keep], y[keep], ids[keep]
+    offsets = _offsets_from_ids(ids, num)
+    
+    # Points strictly above the line from the first (leftmost) to the last
+    # (rightmost) point cannot be on the lower chain, and vice versa
+    first, last = offsets[:-1][ids], offsets[1:][ids] - 1
+    fx, fy, lx, ly = x[first], y[first], x[last], y[last]
+    side = (lx - fx) * (y - fy) - (ly - fy) * (x - fx)
+    endpoint = (np.arange(len(x)) == first) | (np.arange(len(x)) == last)
+    lower = _reduce_chain(*(a[(side < 0) | endpoint] for a in (x, y, ids)), 1.0)
+    upper = _reduce_chain(*(a[(side > 0) | endpoint] for a in (x, y, ids)), -1.0)
+    
+    # Lower chain left to right, then the upper chain right to left without its endpoints
+    lower_counts = np.bincount(lower[2], minlength=num)
+    upper_counts = np.bincount(upper[2], minlength=num)
+    sizes = lower_counts + np.maximum(upper_counts - 2, 0)
+    hull_offsets = np.zeros(num + 1, dtype=np.int64)
+    np.cumsum(sizes, out=hull_offsets[1:])
+    
+    lower_offsets = np.zeros(num + 1, dtype=np.int64)
+    np.cumsum(lower_counts, out=lower_offsets[1:])
+    upper_offsets = np.zeros(num + 1, dtype=np.int64)
+    np.cumsum(upper_counts, out=upper_offsets[1:])
+    lower_rank = np.arange(len(lower[2])) - lower_offsets[lower[2]]
+    upper_rank = np.arange(len(upper[2])) - upper_offsets[upper[2]]
+    upper_size = upper_counts[upper[2]]
+    interior = (upper_rank > 0) & (upper_rank < upper_size - 1)
+    
+    hx = np.empty(hull_offsets[-1])
+    hy = np.empty(hull_offsets[-1])
+    target = hull_offsets[lower[2]] + lower_rank
+    hx[target], hy[target] = lower[0], lower[1]
+    segment = upper[2][interior]
+    target = (
+        hull_offsets[segment] + lower_counts[segment] + upper_size[interior] - 2
+        - upper_rank[interior]
+    )
+    hx[target], hy[target] = upper[0][interior], upper[1][interior]
+    return hx, hy, hull_offsets
+
+
+def _min_area_rects_from_hulls(hx: np.ndarray, hy: np.ndarray, offsets: np.ndarray):
+    """
+    Minimum-area rectangles of CSR convex hulls by rotating calipers.
+    
+    The optimal rectangle has a side on a hull edge. Edge angles of a
+    counter-clockwise hull increase monotonically, so the vertices touching the
+    other three sides of every candidate rectangle are found for all edges of
+    all hulls with one ``searchsorted`` over the unwrapped edge angles.
+    
+    Returns:
+        Tuple of (centers, sizes, angles); where rectangles of different
+        orientations share the minimum area, the one on the first such edge
+    """
+    sizes = np.diff(offsets)
+    ids = _segment_ids(offsets)
+    start = np.repeat(offsets[:-1], sizes)
+    size = np.repeat(sizes, sizes)
+    position = np.arange(len(hx))
+    rank = position - start
+    following = np.where(rank + 1 == size, start, position + 1)
+    ex, ey = hx[following] - hx, hy[following] - hy
+    length = np.hypot(ex, ey)
+    length[length == 0] = 1.0
+    ux, uy = ex / length, ey / length
+    
+    # Unwrapped edge angles; every turn of a strictly convex hull lies in (0, pi)
+    phi = np.arctan2(uy, ux)
+    turn = np.zeros(len(phi))
+    turn[1:] = np.diff(phi) % (2 * np.pi)
+    turn[(rank == 0) | (turn > np.pi)] = 0.0
+    total = np.cumsum(turn)
+    phi = phi[start] + total - total[start]
+    
+    # Two laps per hull, hulls shifted apart so one flat searchsorted serves all
+    shift = ids * (8 * np.pi)
+    laps = np.empty(2 * len(phi))
+    laps[start + position] = phi + shift
+    laps[start + size + position] = phi + 2 * np.pi + shift
+    phi += shift
+    
+    def extent(offset, dx, dy, reduce):
+        # Vertex between the two edges whose angles bracket phi + offset, and its
+        # predecessor to absorb rounding at the bracket boundary
+        local = np.searchsorted(laps, phi + offset) - 2 * start
+        local = np.where(local >= size, local - size, local)
+        local[local >= size] = 0
+        vertex = start + local
+        previous = np.where(local == 0, start + size - 1, vertex - 1)
+        return reduce(hx[vertex] * dx + hy[vertex] * dy, hx[previous] * dx + hy[previous] * dy)
+    
+    # Left normal n = (-uy, ux) points into a counter-clockwise hull
+    s_max = extent(np.pi / 2, ux, uy, np.maximum)
+    s_min = extent(3 * np.pi / 2, ux, uy, np.minimum)
+    t_max = extent(np.pi, -uy, ux, np.maximum)
+    t_min = hy * ux - hx * uy
+    area = (s_max - s_min) * (t_max - t_min)
+    
+    # First edge of minimum area in every hull
+    smallest = np.minimum.reduceat(area, offsets[:-1])
+    candidate = np.where(area == smallest[ids], np.arange(len(area)), len(area))
+    best = np.minimum.reduceat(candidate, offsets[:-1])
+    ux, uy = ux[best], uy[best]
+    s_min, s_max, t_min, t_max = s_min[best], s_max[best], t_min[best], t_max[best]
+    
+    # Points and segments: the rectangle is the segment itself
+    segment = sizes <= 2
+    if segment.any():
+        first = offsets[:-1]
+        other = np.where(sizes == 2, first + 1, first)
+        dx, dy = hx[other] - hx[first], hy[other] - hy[first]
+        span = np.hypot(dx, dy)
+        point = span == 0
+        span[point] = 1.0
+        ux = np.where(segment, np.where(point, 1.0, dx / span), ux)
+        uy = np.where(segment, np.where(point, 0.0, dy / span), uy)
+        s0 = hx[first] * ux + hy[first] * uy
+        t0 = hy[first] * ux - hx[first] * uy
+        s_min = np.where(segment, s0, s_min)
+        s_max = np.where(segment, s0 + np.where(point, 0.0, span), s_max)
+        t_min = np.where(segment, t0, t_min)
+        t_max = np.where(segment, t0, t_max)
+    return _rects_from_extents(ux, uy, s_min, s_max, t_min, t_max)
+
+
+def _rects_from_extents(ux, uy, s_min, s_max, t_min, t_max):
+    """
+    Rectangles (centers, sizes, angles) spanning [s_min, s_max] along the unit
+    vectors (ux, uy) and [t_min, t_max] along their left normals (-uy, ux).
+    """
+    s_mid = (s_min + s_max) / 2
+    t_mid = (t_min + t_max) / 2
+    centers = np.stack([s_mid * ux - t_mid * uy, s_mid * uy + t_mid * ux], axis=1)
+    # The side along (ux, uy) is the "width" of a rectangle at the angle of (ux, uy)
+    sizes, angles = _canonical_rects(
+        np.stack([s_max - s_min, t_max - t_min], axis=1), np.degrees(np.arctan2(uy, ux))
+    )
+    return centers, sizes, angles
+
+
+# How minimum-area rectangles are computed: vectorized NumPy code for all
+# polygons at once, or cv2.minAreaRect one polygon at a time; 'auto' uses
+# OpenCV when it is installed (it is the faster of the two) and NumPy otherwise
+GEOMETRY_BACKENDS = ('auto', 'numpy', 'opencv')
+
+
+@functools.lru_cache(maxsize=None)
+def _opencv_available() -> bool:
+    try:
+        cv2.minAreaRect
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_geometry_backend(backend: str = 'auto') -> str:
+    """The geometry backend ('numpy' or 'opencv') that ``backend`` stands for."""
+    if backend not in GEOMETRY_BACKENDS:
+        raise OptionError(f"Unknown geometry backend: {backend}")
+    if backend == 'auto':
+        return 'opencv' if _opencv_available() else 'numpy'
+    return backend
+
+
+def _opencv_min_area_rects(x: np.ndarray, y: np.ndarray, offsets: np.ndarray):
+    """
+    ``_min_area_rects`` with ``cv2.minAreaRect`` (in float32, like ``calculate_obb_corners``).
+    
+    The angle convention of the installed OpenCV version is only seen here:
+    the rectangles are returned in the canonical form like those of the NumPy
+    backend.
+    """
+    points = np.stack([x, y], axis=1).astype(np.float32)
+    bounds = offsets.tolist()
+    rects = [cv2.minAreaRect(points[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    centers = np.array([center for center, _, _ in rects], dtype=np.float64).reshape(-1, 2)
+    sizes = np.array([size for _, size, _ in rects], dtype=np.float64).reshape(-1, 2)
+    angles = np.array([angle for _, _, angle in rects], dtype=np.float64)
+    sizes, angles = _canonical_rects(sizes, angles)
+    return centers, sizes, angles
+
+
+def _min_area_rects(x: np.ndarray, y: np.ndarray, offsets: np.ndarray, backend: str = 'auto'):
+    """Minimum-area rectangles of CSR point sets, processed in bounded slices."""
+    if resolve_geometry_backend(backend) == 'opencv':
+        return _opencv_min_area_rects(x, y, offsets)
+    num = len(offsets) - 1
+    centers = np.empty((num, 2))
+    sizes = np.empty((num, 2))
+    angles = np.empty(num)
+    lo = 0
+    while lo < num:
+        # Take as many whole segments as fit the element budget (at least one)
+        hi = max(
+            lo + 1, int(np.searchsorted(offsets, offsets[lo] + _BATCH_ELEMENTS, side='right')) - 1
+        )
+        hi = min(hi, num)
+        part = slice(offsets[lo], offsets[hi])
+        hull = _convex_hulls(x[part], y[part], offsets[lo:hi + 1] - offsets[lo])
+        centers[lo:hi], sizes[lo:hi], angles[lo:hi] = _min_area_rects_from_hulls(*hull)
+        lo = hi
+    return centers, sizes, angles
+
+
+def min_area_rect_batch(
+    points: np.ndarray,
+    counts: Optional[np.ndarray] = None,
+    backend: str = 'auto'
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of ``cv2.minAreaRect`` for a batch of point sets.
+    
+    Args:
+        points: Padded array of shape (B, N, 2)
+        counts: Optional number of valid points per row (defaults to N)
+        backend: Geometry backend (see ``GEOMETRY_BACKENDS``)
+        
+    Returns:
+        Tuple of (centers (B, 2), sizes (B, 2), angles (B,) in degrees in (0, 90]),
+        the convention of OpenCV 4.5.1+ whatever the backend and OpenCV version
+    """
+    points = np.asarray(points, dtype=np.float64)
+    num, width = points.shape[:2]
+    counts = np.full(num, width) if counts is None else np.asarray(counts, dtype=np.int64)
+    valid = np.arange(width)[None, :] < counts[:, None]
+    offsets = np.zeros(num + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return _min_area_rects(points[..., 0][valid], points[..., 1][valid], offsets, backend)
+
+
+def box_points_batch(centers: np.ndarray, sizes: np.ndarray, angles: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of ``cv2.boxPoints``.
+    
+    Returns:
+        Array of shape (B, 4, 2) with corners in the same order as OpenCV; for
+        rectangles in the canonical form, that is ``CORNER_ORDER``
+    """
+    radians = np.radians(angles)
+    b = np.cos(radians) * 0.5
+    a = np.sin(radians) * 0.5
+    cx, cy = centers[:, 0], centers[:, 1]
+    w, h = sizes[:, 0], sizes[:, 1]
+    p0 = np.stack([cx - a * h - b * w, cy + b * h - a * w], axis=1)
+    p1 = np.stack([cx + a * h - b * w, cy - b * h - a * w], axis=1)
+    return np.stack([p0, p1, 2 * centers - p0, 2 * centers - p1], axis=1)
+
 
-try:
-    import numpy as np
-    import cv2
-except ImportError as e:
-    print(f"Error: Required dependency missing: {e}")
-    print("Please install required packages: pip install numpy opencv-python")
-    sys.exit(1)
+def calculate_obb_corners_batch(
+    polygons,
+    image_width,
+    image_height,
+    counts: Optional[np.ndarray] = None,
+    backend: str = 'auto'
+) -> np.ndarray:
+    """
+    Calculate normalized oriented bounding box corners for many polygons at once.
+    
+    With ``backend='opencv'`` the boxes are those of ``calculate_obb_corners``.
+    The NumPy backend computes in float64 rather than OpenCV's float32, so its
+    boxes agree to float32 precision; where several rectangles share the
+    minimum area (e.g. right triangles), it may return another one.
+    
+    Args:
+        polygons: Either a list of flat polygons [x1, y1, x2, y2, ...] of any length,
+            or a padded array of shape (B, N, 2) (see ``counts``)
+        image_width: Image width, scalar or one value per polygon
+        image_height: Image height, scalar or one value per polygon
+        counts: Number of valid vertices per row when ``polygons`` is a padded array
+        backend: Geometry backend (see ``GEOMETRY_BACKENDS``); 'opencv' uses the
+            float32 rectangles of ``cv2.minAreaRect``, like ``calculate_obb_corners``
+        
+    Returns:
+        Array of shape (B, 8) with normalized corners [x1, y1, x2, y2, x3, y3, x4, y4]
+    """
+    if isinstance(polygons, np.ndarray) and polygons.ndim == 3:
+        centers, sizes, angles = min_area_rect_batch(polygons, counts, backend)
+    else:
+        if len(polygons) == 0:
+            return np.empty((0, 8))
+        centers, sizes, angles = _min_area_rects(*_pack_polygons(polygons), backend)
+    
+    corners = box_points_batch(centers, sizes, angles)
+    corners[..., 0] /= np.asarray(image_width, dtype=np.float64).reshape(-1, 1)
+    corners[..., 1] /= np.asarray(image_height, dtype=np.float64).reshape(-1, 1)
+    return corners.reshape(-1, 8)
+
+
+# How boxes are written: 4 corners, or center, size and angle (the output of
+# the legacy first step, 1.coco2yolo-obb.py)
+LABEL_FORMATS = ('corners', 'xywha')
+
+# Values per box after the class ID
+_LABEL_COLUMNS = {'corners': 8, 'xywha': 5}
+
+# Order of the corners written for every box, with every geometry backend and
+# OpenCV version: that of cv2.boxPoints for the rectangle with its angle in
+# (0, 90], as cv2.minAreaRect of OpenCV 4.5.1 to 4.x reports it
+CORNER_ORDER = 'opencv-4.5.1'
+
+
+# Angles (in degrees) this close to a multiple of 90 are snapped to it
+_ANGLE_SNAP = 1e-7
+
+
+def _canonical_rects(sizes: np.ndarray, angles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Express rectangles with their angle in (0, 90], as OpenCV 4.5.1+ does.
+    
+    (w, h, a), (w, h, a + 180) and (h, w, a + 90) are the same rectangle, so
+    angles from any OpenCV version (or any other source) map to one form.
+    Angles within ``_ANGLE_SNAP`` degrees of a multiple of 90 are snapped to it.
+    """
+    theta = np.asarray(angles, dtype=np.float64) % 180.0
+    theta[(theta < _ANGLE_SNAP) | (theta > 180.0 - _ANGLE_SNAP)] = 0.0
+    theta[np.abs(theta - 90.0) < _ANGLE_SNAP] = 90.0
+    swap = (theta == 0.0) | (theta > 90.0)
+    theta = np.where(theta > 90.0, theta - 90.0, np.where(theta == 0.0, 90.0, theta))
+    sizes = np.asarray(sizes, dtype=np.float64)
+    return np.where(swap[:, None], sizes[:, ::-1], sizes), theta
+
+
+def _canonical_rect(size: Tuple[float, float], angle: float) -> Tuple[Tuple[float, float], float]:
+    """``_canonical_rects`` for a single rectangle, with scalar math."""
+    theta = angle % 180.0
+    if theta < _ANGLE_SNAP or theta > 180.0 - _ANGLE_SNAP:
+        return (size[1], size[0]), 90.0
+    if abs(theta - 90.0) < _ANGLE_SNAP:
+        return (size[0], size[1]), 90.0
+    if theta > 90.0:
+        return (size[1], size[0]), theta - 90.0
+    return (size[0], size[1]), theta
+
+
+def calculate_obb_xywha(
+    segmentation: List[float], image_width: int, image_height: int
+) -> List[float]:
+    """
+    Calculate the oriented bounding box of a polygon as center, size and angle.
+    
+    Returns:
+        List [cx, cy, w, h, angle] with the center and size normalized by the
+        image size and the angle in degrees in (0, 90]
+    """
+    points = np.array(segmentation).reshape(-1, 2).astype(np.float32)
+    (cx, cy), size, angle = cv2.minAreaRect(points)
+    size, angle = _canonical_rect(size, angle)
+    return [
+        cx / image_width, cy / image_height, size[0] / image_width, size[1] / image_height, angle
+    ]
+
+
+def calculate_obb_xywha_batch(
+    polygons,
+    image_width,
+    image_height,
+    counts: Optional[np.ndarray] = None,
+    backend: str = 'auto'
+) -> np.ndarray:
+    """
+    Batch version of ``calculate_obb_xywha``; takes the arguments of
+    ``calculate_obb_corners_batch``.
+    
+    The angle is reported in (0, 90] whatever the installed OpenCV version.
+    
+    Returns:
+        Array of shape (B, 5) with [cx, cy, w, h, angle] per polygon
+    """
+    if isinstance(polygons, np.ndarray) and polygons.ndim == 3:
+        centers, sizes, angles = min_area_rect_batch(polygons, counts, backend)
+    else:
+        if len(polygons) == 0:
+            return np.empty((0, 5))
+        centers, sizes, angles = _min_area_rects(*_pack_polygons(polygons), backend)
+    
+    sizes, angles = _canonical_rects(sizes, angles)
+    scale = np.stack([
+        np.broadcast_to(np.asarray(image_width, dtype=np.float64).ravel(), len(angles)),
+        np.broadcast_to(np.asarray(image_height, dtype=np.float64).ravel(), len(angles))
+    ], axis=1)
+    return np.concatenate([centers / scale, sizes / scale, angles[:, None]], axis=1)
+
+
+def xywha_to_corners(
+    boxes: np.ndarray, image_width: float = 1.0, image_height: float = 1.0
+) -> np.ndarray:
+    """
+    Convert normalized [cx, cy, w, h, angle] boxes to normalized corners.
+    
+    The rectangle is built in pixel space when the image size is given; with
+    the default of 1 it is built in normalized space, as the legacy second step
+    (2.convert_OBB.py) did. Corners are in ``CORNER_ORDER``, like those the
+    converter writes with ``label_format='corners'``.
+    
+    Args:
+        boxes: Array of shape (N, 5)
+        image_width: Image width (scalar or one value per box)
+        image_height: Image height (scalar or one value per box)
+    
+    Returns:
+        Array of shape (N, 8) with corners [x1, y1, x2, y2, x3, y3, x4, y4]
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+    scale = np.stack(np.broadcast_arrays(
+        np.asarray(image_width, dtype=np.float64).reshape(-1),
+        np.asarray(image_height, dtype=np.float64).reshape(-1)
+    ), axis=1)
+    sizes, angles = _canonical_rects(boxes[:, 2:4] * scale, boxes[:, 4])
+    corners = box_points_batch(boxes[:, 0:2] * scale, sizes, angles)
+    return (corners / scale[:, None, :]).reshape(-1, 8)
+
+
+def corners_to_xywha(
+    corners: np.ndarray, image_width: float = 1.0, image_height: float = 1.0
+) -> np.ndarray:
+    """
+    Convert normalized corners to normalized [cx, cy, w, h, angle] boxes.
+    
+    Inverse of ``xywha_to_corners``; corners may be in any order around the
+    rectangle, and sides are averaged to absorb the rounding of label files.
+    
+    Args:
+        corners: Array of shape (N, 8)
+        image_width: Image width (scalar or one value per box)
+        image_height: Image height (scalar or one value per box)
+    
+    Returns:
+        Array of shape (N, 5) with the angle in degrees in (0, 90]
+    """
+    corners = np.asarray(corners, dtype=np.float64).reshape(-1, 4, 2)
+    scale = np.stack(np.broadcast_arrays(
+        np.asarray(image_width, dtype=np.float64).reshape(-1),
+        np.asarray(image_height, dtype=np.float64).reshape(-1)
+    ), axis=1)
+    points = corners * scale[:, None, :]
+    p0, p1, p2, p3 = points[:, 0], points[:, 1], points[:, 2], points[:, 3]
+    # Opposite sides of the rectangle, averaged
+    along = ((p2 - p1) + (p3 - p0)) / 2
+    across = ((p0 - p1) + (p3 - p2)) / 2
+    sizes = np.stack(
+        [np.hypot(along[:, 0], along[:, 1]), np.hypot(across[:, 0], across[:, 1])], axis=1
+    )
+    sizes, angles = _canonical_rects(sizes, np.degrees(np.arctan2(along[:, 1], along[:, 0])))
+    return np.concatenate([points.mean(axis=1) / scale, sizes / scale, angles[:, None]], axis=1)
+
+
+# How annotations made of several polygons are reduced to one point set
+MULTI_PART_POLICIES = ('first', 'union', 'largest')
+
+
+def merge_polygon_parts(parts: List[List[float]], policy: str = 'first'):
+    """
+    Combine the polygon parts of one annotation into the point set to fit.
+    
+    Args:
+        parts: Polygons [x1, y1, x2, y2, ...] of a single annotation
+        policy: 'first' keeps the first part, 'union' fits one box around all
+            parts, 'largest' keeps the part with the largest area
+        
+    Returns:
+        Flat polygon [x1, y1, x2, y2, ...]
+    """
+    if policy not in MULTI_PART_POLICIES:
+        raise ValueError(f"Unknown multi-part policy: {policy}")
+    if policy == 'first' or len(parts) == 1:
+        return parts[0]
+    if policy == 'union':
+        return np.concatenate([np.asarray(part, dtype=np.float64).ravel() for part in parts])
+    
+    def area(part):
+        # Shoelace formula
+        part = np.asarray(part, dtype=np.float64).ravel()
+        x, y = part[0:len(part) - 1:2], part[1::2]
+        return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+    
+    return max(parts, key=area)
+
+
+def _clip_to_box(
+    x: np.ndarray, y: np.ndarray, offsets: np.ndarray, x0: float, y0: float, x1: float, y1: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Clip CSR polygons to the box [x0, x1] x [y0, y1] (vectorized Sutherland-Hodgman).
+    
+    The polygons are clipped against the four box edges in turn. Each pass
+    handles all polygons at once: a vertex is kept if it lies inside the edge,
+    preceded by the crossing point when the side changes from the previous
+    vertex. Polygons outside the box come back empty.
+    
+    Returns:
+        Tuple of (x, y, offsets) of the clipped polygons
+    """
+    num = len(offsets) - 1
+    for axis, bound, keep_greater in ((0, x0, True), (1, y0, True), (0, x1, False), (1, y1, False)):
+        if len(x) == 0:
+            break
+        ids = _segment_ids(offsets)
+        position = np.arange(len(x))
+        previous = np.where(position == offsets[:-1][ids], offsets[1:][ids] - 1, position - 1)
+        values, others = (x, y) if axis == 0 else (y, x)
+        inside = values >= bound if keep_greater else values <= bound
+        crossing = inside != inside[previous]
+        
+        counts = crossing.astype(np.int64) + inside
+        starts = np.cumsum(counts) - counts
+        clipped = np.empty((2, int(counts.sum())), dtype=np.float64)
+        rows = np.flatnonzero(crossing)
+        before = previous[rows]
+        t = (bound - values[before]) / (values[rows] - values[before])
+        clipped[axis, starts[rows]] = bound
+        clipped[1 - axis, starts[rows]] = others[before] + t * (others[rows] - others[before])
+        rows = np.flatnonzero(inside)
+        clipped[0, starts[rows] + crossing[rows]] = x[rows]
+        clipped[1, starts[rows] + crossing[rows]] = y[rows]
+        x, y = clipped
+        offsets = _offsets_from_ids(np.repeat(ids, counts), num)
+    return x, y, offsets
+
+
+def clip_polygon(polygon: List[float], x0: float, y0: float, x1: float, y1: float) -> List[float]:
+    """
+    Clip a polygon to an axis-aligned box.
+    
+    Args:
+        polygon: Flat polygon [x1, y1, x2, y2, ...]
+        x0, y0, x1, y1: Box corners
+        
+    Returns:
+        The part of the polygon inside the box as a flat polygon (empty if
+        there is none)
+    """
+    x, y, _ = _clip_to_box(*_pack_polygons([polygon]), x0, y0, x1, y1)
+    return np.stack([x, y], axis=1).ravel().tolist()
+
+
+def _decode_rle_counts(counts) -> np.ndarray:
+    """
+    Run lengths of a COCO RLE, given either as a list of integers or as the
+    compressed string produced by pycocotools (6-bit chunks with delta coding).
+    """
+    if not isinstance(counts, (str, bytes)):
+        return np.asarray(counts, dtype=np.int64)
+    if isinstance(counts, str):
+        counts = counts.encode('ascii')
+    chunks = np.frombuffer(counts, dtype=np.uint8).astype(np.int64) - 48
+    if len(chunks) == 0:
+        return np.zeros(0, dtype=np.int64)
+    
+    # Every value is a little-endian group of 5-bit chunks; bit 0x20 marks a continuation
+    ends = np.flatnonzero((chunks & 0x20) == 0)
+    if len(ends) == 0 or ends[-1] != len(chunks) - 1:
+        raise ValueError("truncated RLE counts string")
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(len(chunks)) - np.repeat(starts, ends - starts + 1)
+    values = np.add.reduceat((chunks & 0x1f) << (5 * position), starts)
+    # Bit 0x10 of the last chunk is the sign
+    negative = (chunks[ends] & 0x10) != 0
+    values[negative] -= np.left_shift(1, 5 * (position[ends[negative]] + 1))
+    
+    # From the fourth value on, each count is stored relative to the one two before
+    values[1::2] = np.cumsum(values[1::2])
+    values[2::2] = np.cumsum(values[2::2])
+    return values
+
+
+def _stored_rle_counts(counts) -> np.ndarray:
+    """
+    Run lengths of a COCO RLE as the annotation cache stores them: the single
+    (invalid) run length -1 stands for counts that cannot be decoded.
+    """
+    try:
+        return _decode_rle_counts(counts)
+    except (TypeError, ValueError):
+        return np.full(1, -1, dtype=np.int64)
+
+
+@functools.lru_cache(maxsize=1024)
+def _rle_boundary_points(counts, height: int, width: int) -> np.ndarray:
+    """
+    Pixel coordinates whose convex hull equals that of the RLE foreground.
+    
+    COCO RLE runs scan the mask column by column and alternate between
+    background and foreground, starting with background. Each foreground run
+    is split at column boundaries into a partial first column, a block of full
+    columns and a partial last column, and only the topmost and bottommost of
+    their end pixels in every column are kept, so the mask itself is never
+    materialized.
+    
+    Returns:
+        Read-only flat array [x1, y1, x2, y2, ...] (empty for an empty mask)
+    """
+    lengths = _decode_rle_counts(counts)
+    if (lengths < 0).any():
+        raise ValueError("negative run length in RLE counts")
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    if bounds[-1] != height * width:
+        raise ValueError(f"RLE counts cover {bounds[-1]} pixels, expected {height * width}")
+    start, stop = bounds[1:-1:2], bounds[2::2]
+    keep = stop > start
+    first_col, first_row = np.divmod(start[keep], height)
+    last_col, last_row = np.divmod(stop[keep] - 1, height)
+    
+    # Runs spanning columns reach the bottom of their first column and the top
+    # of their last; runs spanning three or more also cover full columns between
+    spans = last_col > first_col
+    block = last_col - first_col > 1
+    top = np.where(spans, 0, first_row)
+    bottom = np.where(spans, height - 1, last_row)
+    x = np.concatenate([
+        first_col, first_col, last_col, last_col,
+        (first_col + 1)[block], (first_col + 1)[block], (last_col - 1)[block], (last_col - 1)[block]
+    ])
+    y = np.concatenate([
+        first_row, bottom, top, last_row,
+        np.zeros(block.sum()), np.full(block.sum(), height - 1),
+        np.zeros(block.sum()), np.full(block.sum(), height - 1)
+    ])
+    
+    points = np.unique(np.stack([x, y], axis=1).astype(np.float64), axis=0)
+    # Sorted by column, then row: only the top and bottom pixel of a column can be on the hull
+    column = points[:, 0]
+    extreme = np.ones(len(points), dtype=bool)
+    extreme[1:-1] = (column[1:-1] != column[:-2]) | (column[1:-1] != column[2:])
+    points = points[extreme].ravel()
+    points.setflags(write=False)
+    return points
+
+
+def rle_to_polygon_points(rle: Dict[str, Any]) -> np.ndarray:
+    """
+    Boundary points of a COCO RLE segmentation (``iscrowd`` annotations).
+    
+    Decoded masks are cached, so repeated RLEs are only processed once.
+    
+    Args:
+        rle: Dict with ``size`` [height, width] and ``counts``, either a list of
+            run lengths or a compressed string
+        
+    Returns:
+        Flat array [x1, y1, x2, y2, ...] in pixels, usable wherever a polygon is
+        expected; the minimum-area rectangle of these points is that of the mask
+    """
+    height, width = rle['size']
+    counts = rle['counts']
+    if isinstance(counts, list):
+        counts = tuple(counts)
+    return _rle_boundary_points(counts, int(height), int(width))
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Sentinel yielded by _iter_coco_sections once a top-level array has been fully read
+_SECTION_END = object()
+
+
+class _JsonStream:
+    """Minimal incremental reader over a JSON text file."""
+
+    def __init__(self, f, chunk_size: int):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        # Drop the consumed prefix and read at least as much as is still pending,
+        # so re-decoding a large element that straddles chunks stays linear
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self._f.read(max(self._chunk_size, len(self.buf)))
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A scalar touching the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_coco_sections(json_file: str, chunk_size: int = 1 << 20) -> Iterator[Tuple[str, Any]]:
+    """
+    Walk the top-level arrays of a COCO file one element at a time.
+    
+    Args:
+        json_file: Path to COCO annotation JSON file
+        chunk_size: Number of characters read from disk at a time
+        
+    Yields:
+        (key, element) pairs in file order, followed by (key, _SECTION_END)
+        once each top-level array is complete. Non-array values are skipped.
+    """
+    with open(json_file, 'r') as f:
+        stream = _JsonStream(f, chunk_size)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if stream.peek() == '[':
+                stream.pos += 1
+                if stream.peek() == ']':
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield key, stream.value()
+                        separator = stream.peek()
+                        stream.pos += 1
+                        if separator == ']':
+                            break
+                        if separator != ',':
+                            raise json.JSONDecodeError(
+                                "Expecting ',' delimiter", stream.buf, stream.pos - 1
+                            )
+                yield key, _SECTION_END
+            else:
+                stream.value()
+            separator = stream.peek()
+            stream.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", stream.buf, stream.pos - 1)
+
+
+class _SpillBuckets:
+    """
+    Hash-partitioned on-disk store for annotations that cannot be written yet.
+    
+    Annotations are appended as JSON lines to one of ``num_buckets`` files keyed by
+    image ID, so each bucket can later be grouped by image on its own. Buckets that
+    grow beyond ``max_bucket_bytes`` are re-partitioned when read back, which keeps
+    the memory needed for any single bucket bounded regardless of dataset size.
+    """
+
+    def __init__(self, directory: str, num_buckets: int = 64, max_bucket_bytes: int = 64 << 20):
+        self.directory = directory
+        self.num_buckets = num_buckets
+        self.max_bucket_bytes = max_bucket_bytes
+        self._files = {}
+        self.count = 0
+
+    def add(self, ann: Dict[str, Any]) -> None:
+        bucket = hash((0, ann['image_id'])) % self.num_buckets
+        f = self._files.get(bucket)
+        if f is None:
+            f = open(os.path.join(self.directory, f"bucket-0-{bucket}.jsonl"), 'w')
+            self._files[bucket] = f
+        f.write(json.dumps(ann, separators=(',', ':')) + "\n")
+        self.count += 1
+
+    def groups(self) -> Iterator[Tuple[Any, List[Dict[str, Any]]]]:
+        """Yield (image_id, annotations) for every spilled image, preserving annotation order."""
+        for f in self._files.values():
+            f.close()
+        paths = [f.name for f in self._files.values()]
+        self._files = {}
+        for path in paths:
+            yield from self._read_bucket(path, depth=0)
+
+    def _read_bucket(self, path: str, depth: int) -> Iterator[Tuple[Any, List[Dict[str, Any]]]]:
+        if os.path.getsize(path) > self.max_bucket_bytes and depth < 4:
+            # Too large to group in memory: split it again with a different hash salt
+            sub_files = {}
+            with open(path, 'r') as f:
+                for line in f:
+                    image_id = json.loads(line)['image_id']
+                    bucket = hash((depth + 1, image_id)) % self.num_buckets
+                    sub = sub_files.get(bucket)
+                    if sub is None:
+                        sub = open(f"{path}.{bucket}", 'w')
+                        sub_files[bucket] = sub
+                    sub.write(line)
+            os.remove(path)
+            for sub in sub_files.values():
+                sub.close()
+            for sub in sub_files.values():
+                yield from self._read_bucket(sub.name, depth + 1)
+            return
+
+        grouped = {}
+        with open(path, 'r') as f:
+            for line in f:
+                ann = json.loads(line)
+                grouped.setdefault(ann['image_id'], []).append(ann)
+        os.remove(path)
+        yield from grouped.items()
+
+
+def _source_key(json_file: str, sample_size: int = 1 << 16) -> Dict[str, Any]:
+    """Size, modification time and a hash of sampled chunks identifying a file's contents."""
+    stat = os.stat(json_file)
+    digest = hashlib.sha1(str(stat.st_size).encode('ascii'))
+    with open(json_file, 'rb') as f:
+        for position in (0, stat.st_size // 2, max(0, stat.st_size - sample_size)):
+            f.seek(position)
+            digest.update(f.read(sample_size))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sample_sha1': digest.hexdigest()}
+
+
+def _csr_take(offsets: np.ndarray, order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reorder the rows of a CSR layout.
+    
+    Returns:
+        Tuple of (indices of the reordered row elements, offsets of the new rows)
+    """
+    lengths = offsets[order + 1] - offsets[order]
+    new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    indices = (
+        np.repeat(offsets[order] - new_offsets[:-1], lengths)
+        + np.arange(new_offsets[-1], dtype=np.int64)
+    )
+    return indices, new_offsets
+
+
+def _as_int64(values) -> Optional[np.ndarray]:
+    """``values`` as an int64 array, or None if they are not all integers."""
+    try:
+        # array() fills from a list much faster than from an iterator
+        return np.frombuffer(array.array('q', list(values)), dtype=np.int64)
+    except (TypeError, OverflowError):
+        return None
+
+
+def _first_appearance_groups(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group equal keys in order of their first appearance.
+    
+    Returns:
+        Tuple of (key of each group, element indices ordered by group with the
+        original order kept within a group, offsets of the groups in them); the
+        indices are None if the keys are already grouped
+    """
+    num = len(keys)
+    if num == 0:
+        return keys, None, np.zeros(1, dtype=np.int64)
+    # Grouped input has one run of equal consecutive keys per key; it is only
+    # worth checking when the runs are few, as shuffled keys have about one run per element
+    changes = keys[1:] != keys[:-1]
+    num_runs = int(np.count_nonzero(changes)) + 1
+    if 2 * num_runs <= num:
+        run_starts = np.flatnonzero(changes)
+        run_starts += 1
+        run_keys = np.concatenate((keys[:1], keys[run_starts]))
+        sorted_keys = np.sort(run_keys, kind='stable')
+        if (sorted_keys[1:] != sorted_keys[:-1]).all():
+            return run_keys, None, np.concatenate(([0], run_starts, [num]))
+    del changes
+    
+    # A stable sort puts every group in one block that starts with its first appearance
+    sorter = np.argsort(keys, kind='stable')
+    if num < 2 ** 31:
+        sorter = sorter.astype(np.int32)
+    sorted_keys = keys[sorter]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    group_keys = sorted_keys[starts]
+    del sorted_keys
+    lengths = np.diff(np.append(starts, num))
+    by_appearance = np.argsort(sorter[starts])
+    starts, lengths = starts[by_appearance], lengths[by_appearance]
+    offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if len(starts) == num_runs:
+        return group_keys[by_appearance], None, offsets
+    
+    # Move the blocks into order of appearance in one array: the position in
+    # ``sorter`` advances by one within a block and jumps at the start of the next
+    order = np.ones(num, dtype=sorter.dtype)
+    order[offsets[:-1]] = starts - np.concatenate(([0], starts[:-1] + lengths[:-1] - 1))
+    np.cumsum(order, out=order)
+    return group_keys[by_appearance], sorter[order], offsets
+
+
+def _lookup_rows(keys: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Row of each query in ``keys`` (the last one if repeated), or -1 if it is missing."""
+    if not len(keys):
+        return np.full(len(queries), -1, dtype=np.int64)
+    sorter = np.argsort(keys, kind='stable')
+    position = np.searchsorted(keys, queries, side='right', sorter=sorter) - 1
+    rows = sorter[np.maximum(position, 0)]
+    return np.where((position >= 0) & (keys[rows] == queries), rows, -1)
+
+
+class _CocoCache:
+    """
+    Columnar copy of a parsed COCO file that is memory-mapped on later runs.
+    
+    The cache directory holds one ``.npy`` file per column plus ``meta.json``
+    with the key of the source file (size, mtime and a hash of sampled chunks)
+    and the category IDs. Annotations are stored grouped by image in order of
+    first appearance, exactly as the converter processes them:
+    
+    - ``image_ids``, ``image_sizes`` (width, height), ``name_bytes`` and
+      ``name_offsets`` (UTF-8 file names) per image
+    - ``group_ids`` (COCO image ID), ``group_images`` (row in the image
+      columns, -1 if the image is not listed) and ``group_offsets`` into the
+      annotation columns per annotated image
+    - ``ann_ids``, ``ann_categories`` and ``part_offsets`` into the polygon
+      parts per annotation
+    - ``vertex_offsets`` per part into ``vertices``, one flat float32 buffer of
+      interleaved x, y coordinates
+    - ``rle_rows`` (annotation row, ascending), ``rle_sizes`` (height, width)
+      and ``rle_offsets`` into ``rle_counts``, the decoded run lengths, per RLE
+      segmentation (see ``_stored_rle_counts``; a missing size is stored as
+      -1, -1), so RLEs that cannot be decoded still fail to convert
+    
+    Vertices are stored as float32, so converting from the cache can differ
+    from converting the JSON in the last written decimal.
+    """
+    
+    VERSION = 2
+    META_NAME = 'meta.json'
+    COLUMNS = (
+        'image_ids', 'image_sizes', 'name_bytes', 'name_offsets',
+        'group_ids', 'group_images', 'group_offsets',
+        'ann_ids', 'ann_categories', 'part_offsets', 'vertex_offsets', 'vertices',
+        'rle_rows', 'rle_sizes', 'rle_offsets', 'rle_counts'
+    )
+    
+    def __init__(self, directory: Path):
+        with open(directory / self.META_NAME, 'r') as f:
+            self.meta = json.load(f)
+        for name in self.COLUMNS:
+            # Plain array views of the maps avoid np.memmap's per-slice overhead
+            setattr(self, name, np.load(directory / f"{name}.npy", mmap_mode='r').view(np.ndarray))
+        self.category_ids = self.meta['categories']
+    
+    @staticmethod
+    def default_directory(json_file: str) -> Path:
+        path = Path(json_file)
+        return path.with_name(path.name + '.cache')
+    
+    @classmethod
+    def open(
+        cls, json_file: str, directory: Optional[str] = None, streaming: bool = False
+    ) -> '_CocoCache':
+        """
+        Load the cache of ``json_file``, (re)building it if it is missing or stale.
+        
+        Args:
+            json_file: Path to COCO annotation JSON file
+            directory: Cache directory (defaults to ``<json_file>.cache``)
+            streaming: Parse the JSON incrementally when the cache is built
+            
+        Raises:
+            ValueError: If the file uses image, annotation or category IDs that
+                are not integers, or polygons that are not numeric
+        """
+        directory = Path(directory) if directory else cls.default_directory(json_file)
+        key = _source_key(json_file)
+        try:
+            with open(directory / cls.META_NAME, 'r') as f:
+                meta = json.load(f)
+            if meta.get('version') == cls.VERSION and meta.get('source') == key:
+                return cls(directory)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        
+        if streaming:
+            sections = _iter_coco_sections(json_file)
+        else:
+            with open(json_file, 'r') as f:
+                sections = _iter_loaded_sections(json.load(f))
+        cls.build(directory, sections, key)
+        return cls(directory)
+    
+    @classmethod
+    def build(
+        cls, directory: Path, sections: Iterator[Tuple[str, Any]], key: Dict[str, Any]
+    ) -> None:
+        """Write the cache from the (key, element) pairs of ``_iter_coco_sections``."""
+        image_ids, image_sizes, names = [], array.array('q'), []
+        categories = []
+        ann_images, ann_ids, ann_categories = [], array.array('q'), array.array('q')
+        part_counts, vertex_counts = array.array('q'), array.array('q')
+        vertices = array.array('f')
+        rle_anns, rle_sizes, rle_counts = array.array('q'), array.array('q'), []
+        try:
+            for section, item in sections:
+                if item is _SECTION_END:
+                    continue
+                if section == 'images':
+                    image_ids.append(operator.index(item['id']))
+                    # 0 for a missing size, filled in by probing the image files
+                    image_sizes.extend((item.get('width') or 0, item.get('height') or 0))
+                    names.append(item['file_name'])
+                elif section == 'categories':
+                    categories.append(operator.index(item['id']))
+                elif section == 'annotations':
+                    ann_images.append(operator.index(item['image_id']))
+                    ann_ids.append(item['id'])
+                    ann_categories.append(item['category_id'])
+                    segmentation = item.get('segmentation')
+                    if isinstance(segmentation, dict):
+                        rle_anns.append(len(ann_ids) - 1)
+                        size = segmentation.get('size')
+                        rle_sizes.extend(
+                            size if isinstance(size, list) and len(size) == 2 else (-1, -1)
+                        )
+                        rle_counts.append(_stored_rle_counts(segmentation.get('counts')))
+                        segmentation = None
+                    elif segmentation and not isinstance(segmentation[0], list):
+                        segmentation = [segmentation]
+                    parts = segmentation or ()
+                    part_counts.append(len(parts))
+                    for part in parts:
+                        vertex_counts.append(len(part))
+                        vertices.extend(part)
+        except TypeError as e:
+            raise ValueError(f"unsupported value in COCO file: {e}") from e
+        
+        # Group annotations by image in order of first appearance, keeping their order
+        group_ids, order, group_offsets = _first_appearance_groups(
+            np.array(ann_images, dtype=np.int64)
+        )
+        if order is None:
+            order = np.arange(len(ann_images))
+        
+        part_offsets = np.zeros(len(part_counts) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(part_counts, dtype=np.int64), out=part_offsets[1:])
+        vertex_offsets = np.zeros(len(vertex_counts) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(vertex_counts, dtype=np.int64), out=vertex_offsets[1:])
+        parts, part_offsets = _csr_take(part_offsets, order)
+        points, vertex_offsets = _csr_take(vertex_offsets, parts)
+        
+        image_ids = np.array(image_ids, dtype=np.int64)
+        encoded = [name.encode('utf-8') for name in names]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        # RLE segmentations in the order of the annotation rows
+        rle_rows = position[np.frombuffer(rle_anns, dtype=np.int64)]
+        rle_order = np.argsort(rle_rows, kind='stable')
+        rle_offsets = np.zeros(len(rle_counts) + 1, dtype=np.int64)
+        np.cumsum([len(counts) for counts in rle_counts], out=rle_offsets[1:])
+        counts_indices, rle_offsets = _csr_take(rle_offsets, rle_order)
+        columns = {
+            'image_ids': image_ids,
+            'image_sizes': np.frombuffer(image_sizes, dtype=np.int64).reshape(-1, 2),
+            'name_bytes': np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            'name_offsets': name_offsets,
+            'group_ids': group_ids,
+            'group_images': _lookup_rows(image_ids, group_ids),
+            'group_offsets': group_offsets,
+            'ann_ids': np.frombuffer(ann_ids, dtype=np.int64)[order],
+            'ann_categories': np.frombuffer(ann_categories, dtype=np.int64)[order],
+            'part_offsets': part_offsets,
+            'vertex_offsets': vertex_offsets,
+            'vertices': np.frombuffer(vertices, dtype=np.float32)[points],
+            'rle_rows': rle_rows[rle_order],
+            'rle_sizes': np.frombuffer(rle_sizes, dtype=np.int64).reshape(-1, 2)[rle_order],
+            'rle_offsets': rle_offsets,
+            'rle_counts': np.concatenate(
+                [np.zeros(0, dtype=np.int64)] + rle_counts
+            )[counts_indices],
+        }
+        meta = {'version': cls.VERSION, 'source': key, 'categories': categories}
+        
+        # Build next to the target and swap it in, so readers never see a partial cache
+        directory.parent.mkdir(parents=True, exist_ok=True)
+        temp_dir = Path(tempfile.mkdtemp(prefix=directory.name + '.', dir=directory.parent))
+        try:
+            for name, column in columns.items():
+                np.save(temp_dir / f"{name}.npy", column)
+            with open(temp_dir / cls.META_NAME, 'w') as f:
+                json.dump(meta, f, separators=(',', ':'))
+            if directory.exists():
+                shutil.rmtree(directory)
+            os.replace(temp_dir, directory)
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+    
+    def __len__(self) -> int:
+        """Number of annotated images."""
+        return len(self.group_ids)
+    
+    def categories(self, class_mapping: Optional[Dict[int, int]] = None) -> Dict[int, int]:
+        """Like ``_category_mapping`` for the cached category IDs."""
+        categories = [{'id': cat_id} for cat_id in self.category_ids]
+        return _category_mapping({'categories': categories}, class_mapping)
+    
+    def file_names(self) -> List[str]:
+        """The ``file_name`` of every listed image."""
+        offsets = self.name_offsets.tolist()
+        names = self.name_bytes.tobytes()
+        return [names[start:stop].decode('utf-8') for start, stop in zip(offsets, offsets[1:])]
+    
+    def image_annotations(self, stats) -> Iterator[Tuple[Dict[str, Any], '_CachedAnnotations']]:
+        """
+        (image dict, annotations) per annotated image, like ``_image_annotations``.
+        
+        The annotations are only read from the columns when iterated, so worker
+        processes forked with them share the mapped pages.
+        """
+        group_offsets = self.group_offsets.tolist()
+        sizes = self.image_sizes.tolist()
+        name_offsets = self.name_offsets.tolist()
+        image_ids = self.image_ids.tolist()
+        for group, row in enumerate(self.group_images.tolist()):
+            if row < 0:
+                stats.warn(
+                    'missing_image',
+                    f"Warning: Image ID {int(self.group_ids[group])} not found in images list"
+                )
+                continue
+            image_info = {
+                'id': image_ids[row],
+                'file_name': self.name_bytes[
+                    name_offsets[row]:name_offsets[row + 1]
+                ].tobytes().decode('utf-8'),
+                'width': sizes[row][0],
+                'height': sizes[row][1],
+            }
+            yield image_info, _CachedAnnotations(
+                self, group_offsets[group], group_offsets[group + 1]
+            )
+    
+    def annotations(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """
+        Annotation dicts of rows ``start:stop``.
+        
+        They only carry ``id``, ``category_id`` and ``segmentation``.
+        """
+        part_offsets = self.part_offsets[start:stop + 1].tolist()
+        vertex_offsets = self.vertex_offsets[part_offsets[0]:part_offsets[-1] + 1].tolist()
+        part_base, vertex_base = part_offsets[0], vertex_offsets[0]
+        coordinates = self.vertices[vertex_base:vertex_offsets[-1]].tolist()
+        # RLE segmentations among the rows
+        first_rle, last_rle = np.searchsorted(self.rle_rows, (start, stop)).tolist()
+        rle = {}
+        for index, row in enumerate(self.rle_rows[first_rle:last_rle].tolist(), first_rle):
+            rle[row] = {
+                'size': self.rle_sizes[index].tolist(),
+                'counts': self.rle_counts[
+                    self.rle_offsets[index]:self.rle_offsets[index + 1]
+                ].tolist()
+            }
+        annotations = []
+        for index, (ann_id, category_id) in enumerate(zip(
+            self.ann_ids[start:stop].tolist(), self.ann_categories[start:stop].tolist()
+        )):
+            ann = {'id': ann_id, 'category_id': category_id}
+            first, last = part_offsets[index] - part_base, part_offsets[index + 1] - part_base
+            if first < last:
+                ann['segmentation'] = [
+                    coordinates[
+                        vertex_offsets[part] - vertex_base:vertex_offsets[part + 1] - vertex_base
+                    ]
+                    for part in range(first, last)
+                ]
+            elif start + index in rle:
+                ann['segmentation'] = rle[start + index]
+            annotations.append(ann)
+        return annotations
+
+
+class _CachedAnnotations:
+    """The annotations of one image in a ``_CocoCache``, read when iterated."""
+    
+    __slots__ = ('cache', 'start', 'stop')
+    
+    def __init__(self, cache: _CocoCache, start: int, stop: int):
+        self.cache = cache
+        self.start = start
+        self.stop = stop
+    
+    def __len__(self) -> int:
+        return self.stop - self.start
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.cache.annotations(self.start, self.stop))
+
+
+def _iter_loaded_sections(coco_data: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """The (key, element) pairs of ``_iter_coco_sections`` for an already loaded COCO dict."""
+    for key in ('images', 'categories', 'annotations'):
+        for item in coco_data.get(key, ()):
+            yield key, item
+        yield key, _SECTION_END
+
+
+# Warning categories counted by ConversionStats
+WARNING_KINDS = (
+    'missing_category', 'failed_annotation', 'missing_image', 'poor_fit', 'stem_collision',
+    'missing_size', 'unreadable_image', 'size_mismatch'
+)
+
+
+class ConversionStats:
+    """
+    Timings, counters and warnings of one conversion.
+    
+    Stages record wall time and the number of items they handled; stages may
+    nest (e.g. ``geometry`` runs inside ``convert``) and stages timed in worker
+    processes are summed over all workers. Warnings are counted per kind and
+    only the first ``max_printed_warnings`` of each kind are printed.
+    
+    ``callback(event, stats)`` is called with ``'stage'``, ``'warning'``,
+    ``'progress'`` or ``'done'`` so API callers can follow a conversion.
+    """
+    
+    def __init__(
+        self,
+        callback: Optional[Callable[[str, 'ConversionStats'], None]] = None,
+        max_printed_warnings: int = 10,
+        progress_every: int = 100,
+        verbose: bool = True
+    ):
+        self.callback = callback
+        self.max_printed_warnings = max_printed_warnings
+        self.progress_every = progress_every
+        # Print progress lines and warnings (off inside worker processes)
+        self.verbose = verbose
+        self.total_files = None
+        self.file_count = 0
+        self.annotation_count = 0
+        self.skipped_count = 0
+        self.stages = {}
+        self.warnings = {}
+        self.messages = []
+        # FitReport of the boxes checked by --validate
+        self.validation = None
+        self._start = time.perf_counter()
+        self._progress_start = self._start
+        self._end = None
+    
+    @contextlib.contextmanager
+    def stage(self, name: str, items: int = 0):
+        """Time the enclosed block as (part of) stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start, items)
+    
+    def add_stage(self, name: str, seconds: float, items: int = 0) -> None:
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'items': 0})
+        stage['seconds'] += seconds
+        stage['items'] += items
+        self._notify('stage')
+    
+    def warn(self, kind: str, message: str, count: int = 1) -> None:
+        """Count ``count`` warnings of ``kind``; ``message`` describes the first of them."""
+        previous = self.warnings.get(kind, 0)
+        self.warnings[kind] = previous + count
+        if previous < self.max_printed_warnings:
+            self.messages.append((kind, message))
+            if self.verbose:
+                print(message)
+                if previous + 1 == self.max_printed_warnings:
+                    print(f"Further {kind.replace('_', ' ')} warnings are counted but not printed")
+        self._notify('warning')
+    
+    def begin(self, total_files: Optional[int] = None) -> None:
+        """Start measuring throughput; ``total_files`` enables the ETA."""
+        self.total_files = total_files
+        self._progress_start = time.perf_counter()
+    
+    def files_written(self, files: int, annotations: int) -> None:
+        before = self.file_count
+        self.file_count += files
+        self.annotation_count += annotations
+        every = self.progress_every
+        if self.verbose and every and before // every != self.file_count // every:
+            print(self.progress_line())
+        if files:
+            self._notify('progress')
+    
+    def files_per_second(self) -> float:
+        elapsed = (self._end or time.perf_counter()) - self._progress_start
+        return self.file_count / elapsed if elapsed > 0 else 0.0
+    
+    def eta(self) -> Optional[float]:
+        """Seconds until all files are written, if the total is known."""
+        rate = self.files_per_second()
+        if self.total_files is None or not rate:
+            return None
+        return max(0, self.total_files - self.file_count) / rate
+    
+    def progress_line(self) -> str:
+        line = f"Processed {self.file_count} files... ({self.files_per_second():.0f} files/s"
+        eta = self.eta()
+        if eta is not None:
+            line += f", ETA {eta:.0f}s"
+        return line + ")"
+    
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Add the stages and warnings of a worker's ``snapshot()``."""
+        for name, stage in snapshot['stages'].items():
+            self.add_stage(name, stage['seconds'], stage['items'])
+        remaining = dict(snapshot['warnings'])
+        for kind, message in snapshot['messages']:
+            self.warn(kind, message)
+            remaining[kind] -= 1
+        for kind, count in remaining.items():
+            if count:
+                self.warn(kind, f"Warning: {count} more {kind.replace('_', ' ')} warnings", count)
+        if snapshot.get('validation') is not None:
+            if self.validation is None:
+                self.validation = FitReport()
+            self.validation.merge(snapshot['validation'])
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'stages': self.stages, 'warnings': self.warnings, 'messages': self.messages,
+            'validation': None if self.validation is None else self.validation.snapshot()
+        }
+    
+    def finish(self) -> None:
+        self._end = time.perf_counter()
+        self._notify('done')
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Machine-readable report (see ``--stats-json``)."""
+        elapsed = (self._end or time.perf_counter()) - self._start
+        return {
+            'files': self.file_count,
+            'annotations': self.annotation_count,
+            'skipped_files': self.skipped_count,
+            'elapsed_seconds': round(elapsed, 6),
+            'files_per_second': round(self.files_per_second(), 3),
+            'stages': {
+                name: {
+                    'seconds': round(stage['seconds'], 6),
+                    'items': stage['items'],
+                    'items_per_second': (
+                        round(stage['items'] / stage['seconds'], 3)
+                        if stage['items'] and stage['seconds'] > 0 else None
+                    )
+                }
+                for name, stage in self.stages.items()
+            },
+            'warnings': dict(self.warnings),
+            'warning_examples': [message for _, message in self.messages],
+            'validation': None if self.validation is None else self.validation.summary()
+        }
+    
+    def write_json(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+            f.write('\n')
+    
+    def _notify(self, event: str) -> None:
+        if self.callback is not None:
+            self.callback(event, self)
+
+
+# Box fit problems flagged by --validate
+FIT_ISSUES = ('degenerate', 'thin', 'low_fill', 'self_intersecting')
+
+# Polygons with up to this many vertices are checked for self-intersections by
+# comparing every pair of edges, larger ones by a sweep over their edges
+_SELF_INTERSECTION_VERTICES = 64
+
+
+def _polygon_areas(x: np.ndarray, y: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Shoelace areas of CSR polygons."""
+    sizes = np.diff(offsets)
+    ids = _segment_ids(offsets)
+    position = np.arange(len(x))
+    following = np.where(position + 1 == offsets[1:][ids], offsets[:-1][ids], position + 1)
+    cross = x * y[following] - x[following] * y
+    return np.abs(np.bincount(ids, weights=cross, minlength=len(sizes))) / 2
+
+
+def _self_intersecting(
+    x: np.ndarray, y: np.ndarray, offsets: np.ndarray, limit: int = _SELF_INTERSECTION_VERTICES
+):
+    """
+    Which CSR polygons have two edges that properly cross each other.
+    
+    Polygons are sorted by size and padded in chunks so all edge pairs of a
+    chunk are tested at once; edges that only touch or overlap are not
+    counted. Polygons with more than ``limit`` vertices are tested one at a
+    time by ``_sweep_self_intersecting``.
+    
+    Returns:
+        Tuple of (self-intersecting mask, tested mask); every polygon is tested
+    """
+    sizes = np.diff(offsets)
+    crossing = np.zeros(len(sizes), dtype=bool)
+    tested = np.ones(len(sizes), dtype=bool)
+    
+    # Polygons whose vertices go around their mean once, in one direction, are
+    # star-shaped and therefore simple; this covers convex polygons and most
+    # outlines of compact objects, which then skip the pairwise test
+    ids = _segment_ids(offsets)
+    position = np.arange(len(x))
+    following = np.where(position + 1 == offsets[1:][ids], offsets[:-1][ids], position + 1)
+    count = np.maximum(sizes, 1)
+    rx = x - (np.bincount(ids, weights=x, minlength=len(sizes)) / count)[ids]
+    ry = y - (np.bincount(ids, weights=y, minlength=len(sizes)) / count)[ids]
+    step = np.arctan2(
+        rx * ry[following] - ry * rx[following], rx * rx[following] + ry * ry[following]
+    )
+    turning = np.bincount(ids, weights=step, minlength=len(sizes))
+    forward = np.bincount(ids, weights=step > 0, minlength=len(sizes))
+    backward = np.bincount(ids, weights=step < 0, minlength=len(sizes))
+    star = ((forward == 0) | (backward == 0)) & (np.abs(np.abs(turning) - 2 * np.pi) < 1e-6)
+    
+    for polygon in np.flatnonzero((sizes > limit) & ~star).tolist():
+        start, stop = offsets[polygon], offsets[polygon + 1]
+        crossing[polygon] = _sweep_self_intersecting(x[start:stop], y[start:stop])
+    
+    polygons = np.flatnonzero((sizes <= limit) & (sizes >= 4) & ~star)
+    polygons = polygons[np.argsort(sizes[polygons], kind='stable')]
+    lo = 0
+    while lo < len(polygons):
+        width = int(sizes[polygons[lo]])
+        hi = lo + 1
+        # Grow the chunk while its padded pair array stays within the budget
+        while (
+            hi < len(polygons)
+            and (hi + 1 - lo) * int(sizes[polygons[hi]]) ** 2 <= _BATCH_ELEMENTS
+        ):
+            width = int(sizes[polygons[hi]])
+            hi += 1
+        chunk = polygons[lo:hi]
+        counts = sizes[chunk][:, None]
+        rank = np.arange(width)[None, :]
+        start = offsets[:-1][chunk][:, None]
+        first = start + np.minimum(rank, counts - 1)
+        second = start + np.where(rank + 1 < counts, rank + 1, 0)
+        ax, ay, bx, by = x[first], y[first], x[second], y[second]
+        dx, dy = (bx - ax)[:, :, None], (by - ay)[:, :, None]
+        
+        def side(px, py):
+            # side(...)[k, i, j]: on which side of edge i point j lies
+            return dx * (py[:, None, :] - ay[:, :, None]) - dy * (px[:, None, :] - ax[:, :, None])
+        
+        # Edge j's endpoints lie on both sides of edge i, and vice versa
+        straddle = side(ax, ay) * side(bx, by) < 0
+        straddle &= straddle.transpose(0, 2, 1)
+        # Non-adjacent pairs i < j of valid edges
+        i, j = np.arange(width)[:, None], np.arange(width)[None, :]
+        pairs = (
+            (j >= i + 2)[None] & (j[None] < counts[:, :, None])
+            & ~((i == 0)[None] & (j[None] == counts[:, :, None] - 1))
+        )
+        crossing[chunk] = (straddle & pairs).any(axis=(1, 2))
+        lo = hi
+    return crossing, tested
+
+
+def _sweep_self_intersecting(x: np.ndarray, y: np.ndarray) -> bool:
+    """
+    Whether two edges of one polygon properly cross each other.
+    
+    Only edges whose x ranges overlap can cross: with the edges sorted by
+    their left end, the candidates of an edge are the ones that follow it up
+    to its right end (a sweep line over x). Candidates whose y ranges overlap
+    as well get the exact test of ``_self_intersecting``, in slices of about
+    ``_BATCH_ELEMENTS`` pairs.
+    """
+    count = len(x)
+    bx, by = np.roll(x, -1), np.roll(y, -1)
+    x_min, x_max = np.minimum(x, bx), np.maximum(x, bx)
+    y_min, y_max = np.minimum(y, by), np.maximum(y, by)
+    order = np.argsort(x_min, kind='stable')
+    # Sorted edges k + 1 .. ends[k] - 1 start left of the right end of edge k
+    ends = np.searchsorted(x_min[order], x_max[order], side='left')
+    candidates = np.maximum(ends - np.arange(1, count + 1), 0)
+    bounds = np.concatenate(([0], np.cumsum(candidates)))
+    lo = 0
+    while lo < count:
+        hi = max(
+            lo + 1, int(np.searchsorted(bounds, bounds[lo] + _BATCH_ELEMENTS, side='right')) - 1
+        )
+        hi = min(hi, count)
+        lengths = candidates[lo:hi]
+        first = np.repeat(np.arange(lo, hi), lengths)
+        second = first + 1 + np.arange(len(first)) - np.repeat(bounds[lo:hi] - bounds[lo], lengths)
+        i, j = order[first], order[second]
+        keep = (y_min[j] < y_max[i]) & (y_min[i] < y_max[j])
+        # Adjacent edges share a vertex
+        gap = np.abs(i - j)
+        keep &= (gap != 1) & (gap != count - 1)
+        i, j = i[keep], j[keep]
+        dx, dy = bx[i] - x[i], by[i] - y[i]
+        straddle_i = (
+            (dx * (y[j] - y[i]) - dy * (x[j] - x[i]))
+            * (dx * (by[j] - y[i]) - dy * (bx[j] - x[i])) < 0
+        )
+        dx, dy = bx[j] - x[j], by[j] - y[j]
+        straddle_j = (
+            (dx * (y[i] - y[j]) - dy * (x[i] - x[j]))
+            * (dx * (by[i] - y[j]) - dy * (bx[i] - x[j])) < 0
+        )
+        if (straddle_i & straddle_j).any():
+            return True
+        lo = hi
+    return False
+
+
+def obb_fit_metrics(
+    polygons: List[List[float]],
+    box_sizes: np.ndarray,
+    areas: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Measure how well oriented boxes fit the polygons they were computed from.
+    
+    A box contains its polygon, so the fill ratio (polygon area over box
+    area) is also the IoU of polygon and box.
+    
+    Args:
+        polygons: Flat polygons [x1, y1, x2, y2, ...] in pixels
+        box_sizes: Array of shape (N, 2) with the side lengths of each box in pixels
+        areas: Optional area per polygon replacing its shoelace area where not
+            NaN (e.g. the pixel count of a mask, or the summed area of several
+            parts); such polygons are not checked for self-intersections
+    
+    Returns:
+        Dict of arrays: ``polygon_area``, ``box_area``, ``fill`` (at most 1, 0
+        for empty boxes), ``aspect`` (short over long side), ``self_intersecting`` and
+        ``intersection_tested``
+    """
+    x, y, offsets = _pack_polygons(polygons)
+    polygon_area = _polygon_areas(x, y, offsets)
+    crossing, tested = _self_intersecting(x, y, offsets)
+    if areas is not None:
+        given = ~np.isnan(areas)
+        polygon_area = np.where(given, areas, polygon_area)
+        crossing &= ~given
+        tested &= ~given
+    box_sizes = np.asarray(box_sizes, dtype=np.float64).reshape(-1, 2)
+    short, long = box_sizes.min(axis=1), box_sizes.max(axis=1)
+    box_area = short * long
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # The pixel count of a mask exceeds the area of the box around its
+        # pixel centers, so given areas can give ratios above 1
+        fill = np.minimum(np.where(box_area > 0, polygon_area / box_area, 0.0), 1.0)
+        aspect = np.where(long > 0, short / long, 0.0)
+    return {
+        'polygon_area': polygon_area,
+        'box_area': box_area,
+        'fill': fill,
+        'aspect': aspect,
+        'self_intersecting': crossing,
+        'intersection_tested': tested
+    }
+
+
+class FitReport:
+    """
+    Fit metrics of the boxes checked by ``--validate``.
+    
+    Boxes are flagged as ``degenerate`` (a side of (almost) zero length, e.g.
+    collinear points), ``thin`` (short side below ``min_aspect`` of the long
+    one), ``low_fill`` (polygon covers less than ``min_fill`` of the box) or
+    ``self_intersecting``; flagged boxes are listed individually, everything
+    else only enters the counts and the fill ratio histogram. Reports of
+    worker processes are combined with ``merge``.
+    """
+    
+    HISTOGRAM_BINS = 20
+    
+    def __init__(self, min_fill: float = 0.25, min_aspect: float = 0.02, drop: bool = False):
+        self.min_fill = min_fill
+        self.min_aspect = min_aspect
+        # Leave flagged boxes out of the label files
+        self.drop = drop
+        self.checked = 0
+        self.untested = 0
+        self.fill_sum = 0.0
+        self.histogram = [0] * self.HISTOGRAM_BINS
+        self.issues = dict.fromkeys(FIT_ISSUES, 0)
+        # [annotation ID, fill, aspect, issue names] per flagged box
+        self.flagged = []
+    
+    def check(self, ann_ids: list, metrics: Dict[str, np.ndarray]) -> np.ndarray:
+        """Record the metrics of a batch of boxes; returns the mask of flagged boxes."""
+        fill, aspect = metrics['fill'], metrics['aspect']
+        flags = np.stack([
+            aspect <= 1e-6,
+            aspect < self.min_aspect,
+            fill < self.min_fill,
+            metrics['self_intersecting']
+        ], axis=1)
+        self.checked += len(fill)
+        self.untested += int((~metrics['intersection_tested']).sum())
+        self.fill_sum += float(fill.sum())
+        bins = np.minimum(
+            (np.clip(fill, 0.0, 1.0) * self.HISTOGRAM_BINS).astype(np.int64),
+            self.HISTOGRAM_BINS - 1
+        )
+        self.histogram = (
+            np.array(self.histogram) + np.bincount(bins, minlength=self.HISTOGRAM_BINS)
+        ).tolist()
+        for name, count in zip(FIT_ISSUES, flags.sum(axis=0).tolist()):
+            self.issues[name] += count
+        flagged = flags.any(axis=1)
+        for row in np.flatnonzero(flagged).tolist():
+            self.flagged.append([
+                ann_ids[row], round(float(fill[row]), 6), round(float(aspect[row]), 6),
+                [name for name, flag in zip(FIT_ISSUES, flags[row].tolist()) if flag]
+            ])
+        return flagged
+    
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Add a worker's ``snapshot()``."""
+        self.checked += snapshot['checked']
+        self.untested += snapshot['untested']
+        self.fill_sum += snapshot['fill_sum']
+        self.histogram = [a + b for a, b in zip(self.histogram, snapshot['histogram'])]
+        for name, count in snapshot['issues'].items():
+            self.issues[name] += count
+        self.flagged.extend(snapshot['flagged'])
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'checked': self.checked, 'untested': self.untested, 'fill_sum': self.fill_sum,
+            'histogram': self.histogram, 'issues': self.issues, 'flagged': self.flagged
+        }
+    
+    def summary(self) -> Dict[str, Any]:
+        """Counts and fill ratio distribution, without the flagged boxes."""
+        return {
+            'checked': self.checked,
+            'flagged': len(self.flagged),
+            'dropped': len(self.flagged) if self.drop else 0,
+            'issues': dict(self.issues),
+            'mean_fill': round(self.fill_sum / self.checked, 6) if self.checked else None,
+            'fill_histogram': self.histogram,
+            'self_intersection_untested': self.untested,
+            'thresholds': {'min_fill': self.min_fill, 'min_aspect': self.min_aspect}
+        }
+    
+    def write_json(self, path: str) -> None:
+        """Write the summary and one compact row per flagged box."""
+        with open(path, 'w') as f:
+            json.dump(dict(self.summary(), boxes=self.flagged), f, separators=(',', ':'))
+            f.write('\n')
+
+
+def format_label_lines(class_ids, corners, precision: int = 6, clamp: bool = False) -> str:
+    """
+    Format YOLO OBB label lines for many boxes at once.
+    
+    Each line reads ``class_id x1 y1 x2 y2 x3 y3 x4 y4`` (or ``class_id cx cy
+    w h angle`` for boxes in the 'xywha' label format); the whole text is
+    produced by a single ``%`` operation instead of one f-string per coordinate.
+    
+    Args:
+        class_ids: Class ID per box
+        corners: Array of shape (N, 8) with normalized corner coordinates, or
+            of shape (N, 5) with [cx, cy, w, h, angle] per box
+        precision: Number of decimals per coordinate
+        clamp: Clip coordinates to [0, 1] (boxes of objects touching the image
+            border may extend slightly beyond it); corners only
+        
+    Returns:
+        The lines, each terminated by a newline
+    """
+    columns = _value_columns(corners)
+    if clamp and columns != 8:
+        raise ValueError("clamping applies to corner coordinates only")
+    values = _label_values(class_ids, corners, clamp, columns)
+    return _label_format(precision, len(values) // (columns + 1), columns) % tuple(values)
+
+
+def _value_columns(values) -> int:
+    """Values per box of a 2-D box array (8 corner coordinates otherwise)."""
+    shape = np.shape(values)
+    return shape[1] if len(shape) == 2 else 8
+
+
+def _label_values(class_ids, corners, clamp: bool = False, columns: int = 8) -> list:
+    """Flat list of class ID and box values per box, in label line order."""
+    corners = np.asarray(corners, dtype=np.float64).reshape(-1, columns)
+    if clamp:
+        # Adding 0.0 turns -0.0 into 0.0
+        corners = np.clip(corners, 0.0, 1.0) + 0.0
+    values = np.empty((len(corners), columns + 1), dtype=object)
+    values[:, 0] = class_ids
+    values[:, 1:] = corners
+    return values.ravel().tolist()
+
+
+def _label_format(precision: int, count: int = 1, columns: int = 8) -> str:
+    return ("%s" + f" %.{precision}f" * columns + "\n") * count
+
+
+class _Tiler:
+    """
+    Splits the labels of a large image into the labels of overlapping tiles.
+    
+    Tiles of ``size`` pixels start every ``stride`` pixels, plus a last row and
+    column flush with the image border; an image smaller than a tile is a
+    single tile. The regular grid is the spatial index: the tiles a polygon
+    overlaps follow from its bounding box by binary search over the tile
+    origins, so the work grows with the polygon-tile overlaps rather than
+    with polygons x tiles. All overlaps of an image are clipped together
+    (``_clip_to_box``). The parts of an annotation inside a tile are reduced
+    by the ``multi_part`` policy right away, and the annotation is kept in the
+    tile if the fragments its box is fitted to hold at least ``min_visible``
+    of its area. RLE masks are clipped as their convex hull.
+    """
+    
+    def __init__(
+        self,
+        size: int,
+        stride: Optional[int] = None,
+        min_visible: float = 0.5,
+        multi_part: str = 'first'
+    ):
+        self.size = size
+        self.stride = stride or size
+        self.min_visible = min_visible
+        self.multi_part = multi_part
+    
+    def origins(self, length: int) -> np.ndarray:
+        """Start of every tile along an image side of ``length`` pixels."""
+        if length <= self.size:
+            return np.zeros(1, dtype=np.int64)
+        origins = np.arange(0, length - self.size + 1, self.stride, dtype=np.int64)
+        if origins[-1] + self.size < length:
+            origins = np.append(origins, length - self.size)
+        return origins
+    
+    def split(
+        self,
+        output_file: Path,
+        annotations: List[Dict[str, Any]],
+        image_width: int,
+        image_height: int,
+        categories: Dict[int, int],
+        stats: ConversionStats
+    ) -> List[Tuple[Path, List[Dict[str, Any]], int, int]]:
+        """
+        Clip the annotations of one image to its tiles.
+        
+        Returns:
+            (label file ``<stem>_<x>_<y>.txt``, annotations with their clipped
+            polygons in tile pixels, tile width, tile height) of every tile with
+            visible annotations, row by row
+        """
+        # Annotations may be a lazy sequence; they are looked up again by position below
+        annotations = list(annotations)
+        columns, rows = self.origins(image_width), self.origins(image_height)
+        tile_width, tile_height = min(self.size, image_width), min(self.size, image_height)
+        parts = []
+        owners = []
+        masks = []
+        mask_owners = []
+        for index, ann in enumerate(annotations):
+            segmentation = ann.get('segmentation')
+            if not segmentation:
+                continue
+            if ann['category_id'] not in categories:
+                stats.warn(
+                    'missing_category',
+                    f"Warning: Category ID {ann['category_id']} not found in mapping"
+                )
+                continue
+            if isinstance(segmentation, dict):
+                try:
+                    masks.append(rle_to_polygon_points(segmentation))
+                except (KeyError, TypeError, ValueError) as e:
+                    stats.warn(
+                        'failed_annotation',
+                        f"Warning: Failed to process annotation {ann['id']}: {e}"
+                    )
+                    continue
+                mask_owners.append(index)
+                continue
+            for part in segmentation if isinstance(segmentation[0], list) else [segmentation]:
+                if len(part) % 2:
+                    stats.warn(
+                        'failed_annotation',
+                        f"Warning: Failed to process annotation {ann['id']}: odd polygon"
+                    )
+                elif len(part) >= 6:
+                    parts.append(part)
+                    owners.append(index)
+        if masks:
+            hx, hy, hull_offsets = _convex_hulls(*_pack_polygons(masks))
+            bounds = zip(mask_owners, hull_offsets[:-1].tolist(), hull_offsets[1:].tolist())
+            for owner, start, stop in bounds:
+                if stop - start >= 3:
+                    parts.append(np.stack([hx[start:stop], hy[start:stop]], axis=1).ravel())
+                    owners.append(owner)
+        if not parts:
+            return []
+        
+        # Range of tile columns and rows overlapped by the bounding box of every part
+        x, y, offsets = _pack_polygons(parts)
+        starts = offsets[:-1]
+        first_column = np.searchsorted(
+            columns + tile_width, np.minimum.reduceat(x, starts), 'right'
+        )
+        column_counts = np.maximum(
+            np.searchsorted(columns, np.maximum.reduceat(x, starts), 'left') - first_column, 0
+        )
+        first_row = np.searchsorted(rows + tile_height, np.minimum.reduceat(y, starts), 'right')
+        row_counts = np.maximum(
+            np.searchsorted(rows, np.maximum.reduceat(y, starts), 'left') - first_row, 0
+        )
+        
+        # One (part, tile) pair per overlap, the part moved into tile pixels
+        pair_counts = column_counts * row_counts
+        pair_parts = np.repeat(np.arange(len(parts)), pair_counts)
+        local = np.arange(len(pair_parts)) - np.repeat(
+            np.cumsum(pair_counts) - pair_counts, pair_counts
+        )
+        pair_columns = first_column[pair_parts] + local % column_counts[pair_parts]
+        pair_rows = first_row[pair_parts] + local // column_counts[pair_parts]
+        indices, pair_offsets = _csr_take(offsets, pair_parts)
+        ids = _segment_ids(pair_offsets)
+        clipped_x, clipped_y, clipped_offsets = _clip_to_box(
+            x[indices] - columns[pair_columns][ids], y[indices] - rows[pair_rows][ids],
+            pair_offsets,
+            0.0, 0.0, float(tile_width), float(tile_height)
+        )
+        
+        # Visible fraction of every annotation in every tile it overlaps
+        owners = np.asarray(owners, dtype=np.int64)
+        pair_owners = owners[pair_parts]
+        pair_tiles = pair_rows * len(columns) + pair_columns
+        keys, groups = np.unique(
+            pair_owners * (len(columns) * len(rows)) + pair_tiles, return_inverse=True
+        )
+        areas = _polygon_areas(clipped_x, clipped_y, clipped_offsets)
+        keep = np.flatnonzero(np.diff(clipped_offsets) >= 3)
+        if self.multi_part != 'union':
+            # One fragment per annotation and tile: its first part inside, or the largest
+            rank = -areas[keep] if self.multi_part == 'largest' else np.zeros(len(keep))
+            keep = keep[np.lexsort((pair_parts[keep], rank, groups[keep]))]
+            keep = keep[np.concatenate(([True], groups[keep][1:] != groups[keep][:-1]))[:len(keep)]]
+        visible = np.bincount(groups[keep], weights=areas[keep], minlength=len(keys))
+        # Area of all parts of the annotation, including those outside the tile
+        total = np.bincount(owners, weights=_polygon_areas(x, y, offsets))[
+            keys // (len(columns) * len(rows))
+        ]
+        fraction = np.divide(visible, total, out=np.ones_like(visible), where=total > 0)
+        keep = keep[fraction[groups[keep]] >= self.min_visible]
+        keep = keep[np.lexsort((pair_parts[keep], pair_owners[keep], pair_tiles[keep]))]
+        
+        coordinates = np.stack([clipped_x, clipped_y], axis=1).ravel().tolist()
+        clipped_offsets = (2 * clipped_offsets).tolist()
+        tiles = []
+        tile = owner = None
+        kept = zip(keep.tolist(), pair_tiles[keep].tolist(), pair_owners[keep].tolist())
+        for pair, pair_tile, pair_owner in kept:
+            if pair_tile != tile:
+                tile, owner = pair_tile, None
+                tile_x, tile_y = columns[tile % len(columns)], rows[tile // len(columns)]
+                tile_file = output_file.with_name(
+                    f"{output_file.stem}_{tile_x}_{tile_y}{output_file.suffix}"
+                )
+                tiles.append((tile_file, [], tile_width, tile_height))
+            if pair_owner != owner:
+                owner = pair_owner
+                tiles[-1][1].append(dict(annotations[owner], segmentation=[]))
+            tiles[-1][1][-1]['segmentation'].append(
+                coordinates[clipped_offsets[pair]:clipped_offsets[pair + 1]]
+            )
+        return tiles
+
+
+def _round_as_formatted(values: np.ndarray, precision: int) -> np.ndarray:
+    """``values`` rounded to ``precision`` decimals exactly as ``%.{precision}f`` formats them."""
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, precision)
+    # np.round scales by a power of ten, which can tip values close to a tie the other way
+    scaled = values * 10.0 ** precision
+    for index in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-4).tolist():
+        rounded.flat[index] = float("%.*f" % (precision, values.flat[index]))
+    return rounded
+
+
+def _box_pixel_sizes(
+    boxes: np.ndarray, widths: np.ndarray, heights: np.ndarray, label_format: str
+) -> np.ndarray:
+    """Pixel side lengths of normalized ``boxes`` in ``widths`` x ``heights`` images, as (N, 2)."""
+    scale = np.stack(
+        [np.asarray(widths, dtype=np.float64), np.asarray(heights, dtype=np.float64)], axis=1
+    )
+    if label_format == 'xywha':
+        return boxes[:, 2:4] * scale
+    points = boxes.reshape(-1, 4, 2) * scale[:, None, :]
+    return np.stack([
+        np.hypot(*(points[:, 1] - points[:, 0]).T), np.hypot(*(points[:, 2] - points[:, 1]).T)
+    ], axis=1)
+
+
+class _BoxBatch:
+    """
+    Polygons of several images waiting to be converted together.
+    
+    Annotations are validated as they are added; ``convert`` computes all
+    minimum-area rectangles with one ``calculate_obb_corners_batch`` (or
+    ``calculate_obb_xywha_batch``) call and hands back the boxes of every image
+    in the order the images were added, optionally checking how well they fit
+    (see ``FitReport``). This is the core shared by the label writers and
+    ``iter_yolo_obb``.
+    """
+    
+    def __init__(
+        self,
+        categories: Dict[int, int],
+        multi_part: str = 'first',
+        stats: Optional[ConversionStats] = None,
+        label_format: str = 'corners',
+        validation: Optional[Dict[str, Any]] = None,
+        geometry_backend: str = 'auto'
+    ):
+        self.categories = categories
+        self.multi_part = multi_part
+        self.label_format = label_format
+        self.geometry_backend = geometry_backend
+        self.columns = _LABEL_COLUMNS[label_format]
+        self.stats = ConversionStats() if stats is None else stats
+        # FitReport arguments when the fit of every box is checked
+        self.report = None
+        if validation is not None:
+            if self.stats.validation is None:
+                self.stats.validation = FitReport(**validation)
+            self.report = self.stats.validation
+        # (key, number of polygons) per image
+        self._items = []
+        self._class_ids = []
+        self._ann_ids = []
+        self._polygons = []
+        self._widths = []
+        self._heights = []
+        # Area per polygon where the shoelace formula does not apply (NaN otherwise)
+        self._areas = []
+    
+    def __len__(self) -> int:
+        return len(self._polygons)
+    
+    def add(
+        self, key, annotations: List[Dict[str, Any]], image_width: int, image_height: int
+    ) -> None:
+        """Queue the polygons of one image; ``key`` identifies it in ``convert``."""
+        count = len(self._polygons)
+        for ann in annotations:
+            # Skip annotations without segmentation
+            if 'segmentation' not in ann or not ann['segmentation']:
+                continue
+            
+            category_id = ann['category_id']
+            if category_id not in self.categories:
+                self.stats.warn(
+                    'missing_category',
+                    f"Warning: Category ID {category_id} not found in mapping"
+                )
+                continue
+            
+            segmentation = ann['segmentation']
+            area = math.nan
+            if isinstance(segmentation, dict):
+                # RLE mask (crowd annotations): use its boundary pixels as the polygon
+                try:
+                    if self.report is not None:
+                        area = float(_decode_rle_counts(segmentation['counts'])[1::2].sum())
+                    segmentation = rle_to_polygon_points(segmentation)
+                except (KeyError, TypeError, ValueError) as e:
+                    self.stats.warn(
+                        'failed_annotation',
+                        f"Warning: Failed to process annotation {ann['id']}: {e}"
+                    )
+                    continue
+            elif isinstance(segmentation[0], list):
+                # Handle multiple polygons
+                if self.report is not None and self.multi_part == 'union' and len(segmentation) > 1:
+                    area = float(_polygon_areas(*_pack_polygons(segmentation)).sum())
+                segmentation = merge_polygon_parts(segmentation, self.multi_part)
+            
+            # Skip if segmentation has less than 6 points (3 vertices minimum)
+            if len(segmentation) < 6:
+                continue
+            
+            if self.report is not None:
+                self._areas.append(area)
+            self._class_ids.append(self.categories[category_id])
+            self._ann_ids.append(ann['id'])
+            self._polygons.append(segmentation)
+            self._widths.append(image_width)
+            self._heights.append(image_height)
+        
+        self._items.append((key, len(self._polygons) - count))
+    
+    def convert(self) -> Tuple[list, list, np.ndarray, List[int]]:
+        """
+        Convert and clear all pending polygons.
+        
+        Returns:
+            Tuple of (keys, class IDs, boxes of shape (N, 8) or (N, 5) depending
+            on the label format, number of boxes per key); the boxes of the keys
+            follow each other in order, and polygons that fail to convert are
+            dropped with a warning
+        """
+        batch = (
+            calculate_obb_xywha_batch if self.label_format == 'xywha'
+            else calculate_obb_corners_batch
+        )
+        with self.stats.stage('geometry', len(self._polygons)):
+            try:
+                corners = batch(
+                    self._polygons, self._widths, self._heights, backend=self.geometry_backend
+                )
+                keep = None
+            except Exception:
+                # Fall back to one polygon at a time to report the offending annotations
+                corners, keep = self._convert_each()
+        
+        if self.report is not None:
+            with self.stats.stage('validate', len(corners)):
+                rows = np.arange(len(self._polygons)) if keep is None else np.flatnonzero(keep)
+                flagged = self._validate(corners, rows)
+            if self.report.drop and flagged.any():
+                corners = corners[~flagged]
+                keep = np.zeros(len(self._polygons), dtype=bool)
+                keep[rows[~flagged]] = True
+        
+        keys = [key for key, _ in self._items]
+        counts = [count for _, count in self._items]
+        class_ids = self._class_ids
+        if keep is not None:
+            class_ids = [class_id for class_id, kept in zip(class_ids, keep) if kept]
+            # Polygons left per image once the failed ones are dropped
+            kept = np.concatenate(([0], np.cumsum(keep)))
+            bounds = np.cumsum([0] + counts)
+            counts = (kept[bounds[1:]] - kept[bounds[:-1]]).tolist()
+        
+        self._items = []
+        self._class_ids = []
+        self._ann_ids = []
+        self._polygons = []
+        self._widths = []
+        self._heights = []
+        self._areas = []
+        return keys, class_ids, corners, counts
+    
+    def _validate(self, boxes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Check the fit of the boxes of polygons ``rows``; returns the mask of flagged boxes."""
+        sizes = _box_pixel_sizes(
+            boxes, np.asarray(self._widths)[rows], np.asarray(self._heights)[rows],
+            self.label_format
+        )
+        ann_ids = [self._ann_ids[row] for row in rows.tolist()]
+        metrics = obb_fit_metrics(
+            [self._polygons[row] for row in rows.tolist()], sizes, np.asarray(self._areas)[rows]
+        )
+        flagged = self.report.check(ann_ids, metrics)
+        
+        # Only the warnings that can still be printed need a message
+        count = int(flagged.sum())
+        printable = max(0, self.stats.max_printed_warnings - self.stats.warnings.get('poor_fit', 0))
+        printed = self.report.flagged[len(self.report.flagged) - count:][:printable]
+        for ann_id, fill, _, issues in printed:
+            problems = ", ".join(issue.replace('_', ' ') for issue in issues)
+            self.stats.warn(
+                'poor_fit',
+                f"Warning: Annotation {ann_id} has a poor box fit ({problems}, fill {fill:.3f})"
+            )
+        if count > printable:
+            self.stats.warn(
+                'poor_fit', f"Warning: {count - printable} more boxes with a poor fit",
+                count - printable
+            )
+        return flagged
+    
+    def _convert_each(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Boxes of the pending polygons that convert on their own, and a mask of those."""
+        convert = (
+            calculate_obb_xywha_batch if self.label_format == 'xywha'
+            else calculate_obb_corners_batch
+        )
+        rows = []
+        keep = np.zeros(len(self._polygons), dtype=bool)
+        for index, polygon in enumerate(self._polygons):
+            try:
+                rows.append(convert(
+                    [polygon], self._widths[index], self._heights[index],
+                    backend=self.geometry_backend
+                )[0])
+                keep[index] = True
+            except Exception as e:
+                self.stats.warn(
+                    'failed_annotation',
+                    f"Warning: Failed to process annotation {self._ann_ids[index]}: {e}"
+                )
+        return np.array(rows, dtype=np.float64).reshape(-1, self.columns), keep
+
+
+class _View:
+    """
+    One label set of a multi-view conversion.
+    
+    The boxes of a batch are fit once with the COCO category IDs as class IDs;
+    every view then keeps the boxes of its categories under its own class IDs,
+    drops boxes smaller than ``min_area`` square pixels and label files outside
+    its ``sample`` of the stems, and names the rest after its own directories.
+    Sampling hashes ``seed`` and the stem, so it is the same in every run and
+    smaller samples with the same seed are subsets of larger ones.
+    """
+    
+    def __init__(
+        self,
+        directories: Dict[str, str],
+        mapping: Dict[int, int],
+        min_area: float = 0.0,
+        sample: float = 1.0,
+        seed: int = 0
+    ):
+        # Output directory of the view for every output directory of the conversion
+        self.directories = directories
+        self.keys = np.array(sorted(mapping), dtype=np.int64)
+        self.values = np.array([mapping[key] for key in self.keys.tolist()], dtype=np.int64)
+        self.min_area = min_area
+        self.sample = sample
+        self.seed = seed
+    
+    def sampled(self, stem: str) -> bool:
+        """Whether the label file ``stem`` belongs to the view's sample."""
+        if self.sample >= 1.0:
+            return True
+        digest = hashlib.sha1(f"{self.seed}:{stem}".encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') < self.sample * 2.0 ** 64
+    
+    def route(
+        self, files: List[tuple], class_ids, boxes: np.ndarray, counts: List[int],
+        label_format: str
+    ) -> tuple:
+        """The (files, class IDs, boxes, counts) of a converted batch that belong to the view."""
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.keys, class_ids), max(len(self.keys) - 1, 0))
+        if len(self.keys):
+            keep = self.keys[rows] == class_ids
+        else:
+            keep = np.zeros(len(class_ids), dtype=bool)
+        box_files = np.repeat(np.arange(len(files)), counts)
+        if self.min_area > 0:
+            widths = np.array([file[2] for file in files], dtype=np.float64)
+            heights = np.array([file[3] for file in files], dtype=np.float64)
+            sizes = _box_pixel_sizes(boxes, widths[box_files], heights[box_files], label_format)
+            keep &= sizes[:, 0] * sizes[:, 1] >= self.min_area
+        selected = np.array([self.sampled(file[0].stem) for file in files], dtype=bool)
+        keep &= selected[box_files]
+        
+        view_files = []
+        for (output_file, mode, image_width, image_height), chosen in zip(files, selected.tolist()):
+            if chosen:
+                directory = self.directories[os.path.dirname(str(output_file))]
+                view_files.append(
+                    (Path(directory, output_file.name), mode, image_width, image_height)
+                )
+        view_counts = np.bincount(box_files[keep], minlength=len(files))[selected]
+        return view_files, self.values[rows[keep]].tolist(), boxes[keep], view_counts.tolist()
+
+
+class _LabelWriter:
+    """
+    Collects label files and converts their polygons in batches.
+    
+    The minimum-area rectangles are computed by a ``_BoxBatch`` once about
+    ``batch_size`` polygons are pending, formatted together, and the buffered
+    files are then written in the order they were added, each with a single
+    write. With ``tiling``, every image is split into the files of its tiles
+    (see ``_Tiler``) as it is added; with ``views``, every converted batch is
+    written once per view (see ``_View``) instead of to the files added.
+    """
+    
+    def __init__(
+        self,
+        categories: Dict[int, int],
+        batch_size: int = 4096,
+        stats: Optional[ConversionStats] = None,
+        on_written: Optional[Callable[[Path], None]] = None,
+        multi_part: str = 'first',
+        precision: int = 6,
+        clamp: bool = False,
+        label_format: str = 'corners',
+        validation: Optional[Dict[str, Any]] = None,
+        geometry_backend: str = 'auto',
+        io_threads: int = 0,
+        tiling: Optional[Dict[str, Any]] = None,
+        views: Optional[List[Dict[str, Any]]] = None,
+        sink=None,
+        arrays: Optional[_LabelArrays] = None
+    ):
+        self.categories = categories
+        self.multi_part = multi_part
+        self.precision = precision
+        self.clamp = clamp
+        self.label_format = label_format
+        # Object with a write(output_file, data, mode) method replacing plain files
+        self.sink = sink
+        # _LabelArrays also receiving the boxes written
+        self.arrays = arrays
+        # _Tiler arguments when every image is written as tiles
+        self.tiler = _Tiler(multi_part=multi_part, **tiling) if tiling else None
+        # _View arguments when the boxes are written to several label sets
+        self.views = [_View(**view) for view in views] if views else None
+        self.batch_size = batch_size
+        self.stats = ConversionStats() if stats is None else stats
+        self.on_written = on_written
+        self._own_sink = sink is None and io_threads > 0
+        if self._own_sink:
+            # Files are written in the background and reported once they are in place
+            self.sink = _ThreadedFileSink(io_threads, on_written=on_written, stats=self.stats)
+            self.on_written = None
+        self.file_count = 0
+        self.annotation_count = 0
+        self._batch = _BoxBatch(
+            categories, multi_part, self.stats, label_format, validation, geometry_backend
+        )
+    
+    def add(
+        self,
+        output_file: Path,
+        annotations: List[Dict[str, Any]],
+        image_width: int,
+        image_height: int,
+        mode: str = 'w'
+    ) -> None:
+        """Queue the YOLO OBB lines for one image (``mode='a'`` appends to an existing file)."""
+        if self.tiler is not None:
+            start = time.perf_counter()
+            tiles = self.tiler.split(
+                output_file, annotations, image_width, image_height, self.categories, self.stats
+            )
+            self.stats.add_stage('tile', time.perf_counter() - start, len(annotations))
+            for tile_file, tile_annotations, tile_width, tile_height in tiles:
+                self._batch.add(
+                    (tile_file, mode, tile_width, tile_height), tile_annotations,
+                    tile_width, tile_height
+                )
+        else:
+            self._batch.add(
+                (output_file, mode, image_width, image_height), annotations,
+                image_width, image_height
+            )
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Convert all pending polygons and write the buffered files."""
+        batch = self._batch.convert()
+        if self.views is None:
+            self._write(*batch)
+            return
+        for view in self.views:
+            start = time.perf_counter()
+            routed = view.route(*batch, self.label_format)
+            self.stats.add_stage('route', time.perf_counter() - start, len(batch[1]))
+            self._write(*routed)
+    
+    def _write(self, files: List[tuple], class_ids, corners: np.ndarray, counts: List[int]) -> None:
+        """Format and write converted files given as (output file, mode, width, height)."""
+        stats = self.stats
+        start = time.perf_counter()
+        columns = self._batch.columns
+        values = _label_values(class_ids, corners, self.clamp, columns)
+        line = _label_format(self.precision, 1, columns)
+        width = columns + 1
+        if self.arrays is not None:
+            boxes = np.clip(corners, 0.0, 1.0) if self.clamp else corners
+            self.arrays.add(files, class_ids, _round_as_formatted(boxes, self.precision), counts)
+        format_time = time.perf_counter() - start
+        
+        write_time = 0.0
+        offset = 0
+        for (output_file, mode, _, _), count in zip(files, counts):
+            start = time.perf_counter()
+            text = (line * count) % tuple(values[width * offset:width * (offset + count)])
+            offset += count
+            self.annotation_count += count
+            
+            written = time.perf_counter()
+            if self.sink is None:
+                _write_atomic(output_file, text, mode)
+            else:
+                self.sink.write(output_file, text, mode)
+            format_time += written - start
+            write_time += time.perf_counter() - written
+            if self.on_written is not None:
+                self.on_written(output_file)
+            if mode == 'w':
+                self.file_count += 1
+            stats.files_written(int(mode == 'w'), count)
+        stats.add_stage('format', format_time, offset)
+        stats.add_stage('write', write_time, len(files))
+    
+    def close(self) -> None:
+        """Wait until files handed to the I/O threads are on disk (``flush`` writes the rest)."""
+        if self._own_sink:
+            self.sink.close()
+
+
+class _CollectingSink:
+    """Label file sink that keeps the written data in memory."""
+    
+    def __init__(self):
+        self.items = []
+    
+    def write(self, output_file: Path, data: str, mode: str) -> None:
+        self.items.append((output_file, data, mode))
+
+
+class _LabelArrays:
+    """
+    Boxes of the label files written, kept as arrays for a ``LabelCache``.
+    
+    Label writers hand over every converted batch; worker processes return
+    theirs with their shard (``snapshot``) to be merged in submission order.
+    Files are only grouped when the cache is saved, so a file rewritten with
+    ``mode='w'`` replaces its earlier boxes and ``mode='a'`` extends them,
+    exactly like the label files.
+    """
+    
+    def __init__(self, label_format: str = 'corners'):
+        self.label_format = label_format
+        # (output file, mode, image width, image height) and number of boxes per written file
+        self.files = []
+        self.counts = []
+        self.class_ids = []
+        self.boxes = []
+    
+    def add(self, files: List[tuple], class_ids, boxes: np.ndarray, counts: List[int]) -> None:
+        self.files.extend(files)
+        self.counts.extend(counts)
+        self.class_ids.append(np.asarray(class_ids, dtype=np.int64))
+        self.boxes.append(
+            np.asarray(boxes, dtype=np.float32).reshape(-1, _LABEL_COLUMNS[self.label_format])
+        )
+    
+    def snapshot(self) -> tuple:
+        """Arguments of ``add`` for everything collected so far."""
+        columns = _LABEL_COLUMNS[self.label_format]
+        return (
+            self.files, np.concatenate(self.class_ids or [np.zeros(0, dtype=np.int64)]),
+            np.concatenate(self.boxes or [np.zeros((0, columns), dtype=np.float32)]), self.counts
+        )
+    
+    def save(self, stats: Optional[ConversionStats] = None) -> List[Path]:
+        """
+        Write one ``LabelCache`` per output directory.
+        
+        Returns:
+            Paths of the cache files written
+        """
+        files, class_ids, boxes, counts = self.snapshot()
+        # Row of the file every written part belongs to; a new 'w' starts the file over.
+        # Paths are keyed by their string, which is much faster to hash than a Path
+        rows = {}
+        sizes = []
+        parts = []
+        for output_file, mode, image_width, image_height in files:
+            key = str(output_file)
+            row = rows.get(key)
+            if mode == 'w' or row is None:
+                row = rows[key] = len(sizes)
+                sizes.append((image_width, image_height))
+            parts.append(row)
+        box_rows = np.repeat(np.array(parts, dtype=np.int64), counts)
+        
+        directories = {}
+        stems = [None] * len(sizes)
+        for key, row in rows.items():
+            directory, _, name = key.rpartition(os.sep)
+            stems[row] = name[:-len('.txt')]
+            directories.setdefault(directory, []).append(row)
+        paths = []
+        for directory, kept in directories.items():
+            kept.sort()
+            position = np.full(len(sizes), -1, dtype=np.int64)
+            position[kept] = np.arange(len(kept))
+            selected = np.flatnonzero(position[box_rows] >= 0)
+            selected = selected[np.argsort(position[box_rows[selected]], kind='stable')]
+            label_offsets = np.zeros(len(kept) + 1, dtype=np.int64)
+            np.cumsum(
+                np.bincount(position[box_rows[selected]], minlength=len(kept)),
+                out=label_offsets[1:]
+            )
+            path = Path(directory) / LabelCache.FILE_NAME
+            LabelCache.write(
+                path, [stems[row] for row in kept],
+                np.array([sizes[row] for row in kept], dtype=np.int64),
+                label_offsets, class_ids[selected], boxes[selected], self.label_format
+            )
+            paths.append(path)
+        return paths
+
+
+def _write_atomic(output_file: Path, data: str, mode: str = 'w') -> None:
+    """Write (or, with ``mode='a'``, extend) a file through a temporary file renamed into place."""
+    temp_file = output_file.with_name(
+        f".{output_file.name}.{os.getpid()}-{threading.get_ident()}.tmp"
+    )
+    try:
+        if mode == 'a':
+            try:
+                shutil.copyfile(output_file, temp_file)
+            except FileNotFoundError:
+                pass
+        with open(temp_file, mode) as f:
+            f.write(data)
+        os.replace(temp_file, output_file)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_file)
+        raise
+
+
+class _ThreadedFileSink:
+    """
+    Label file sink that writes files from a pool of threads.
+    
+    While the threads wait for the file system, the caller keeps computing
+    boxes. Every path is always handled by the same thread, in the order it
+    was queued, so data appended to a label lands after the data it extends.
+    The queues are bounded: a producer that gets too far ahead blocks. Files
+    are written atomically (see ``_write_atomic``), so an interrupted run never
+    leaves a partly written label.
+    
+    ``on_written`` is called in the producer's thread once a file is in place.
+    If writes fail (with any exception, not only ``OSError``), no more files
+    are queued, the threads drop the files still queued, and the error of the
+    first failed file, in queue order, is raised to the producer by every
+    later ``write`` and by ``close``.
+    """
+    
+    def __init__(
+        self,
+        threads: int = 4,
+        queue_size: int = 64,
+        on_written: Optional[Callable[[Path], None]] = None,
+        stats: Optional[ConversionStats] = None
+    ):
+        self.on_written = on_written
+        self.stats = stats
+        self.file_count = 0
+        self._queues = [queue.Queue(queue_size) for _ in range(threads)]
+        self._written = deque()
+        self._errors = []
+        self._busy = [0.0] * threads
+        self._sequence = 0
+        self._threads = [
+            threading.Thread(
+                target=self._run, args=(index,), name=f"coco2yolo-writer-{index}", daemon=True
+            )
+            for index in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def write(self, output_file: Path, data: str, mode: str) -> None:
+        self._collect()
+        self._queues[hash(output_file) % len(self._queues)].put(
+            (self._sequence, output_file, data, mode)
+        )
+        self._sequence += 1
+    
+    def _run(self, index: int) -> None:
+        jobs = self._queues[index]
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            if self._errors:
+                # Keep draining the queue, so that _stop() can always queue its end marker
+                continue
+            sequence, output_file, data, mode = job
+            start = time.perf_counter()
+            try:
+                _write_atomic(output_file, data, mode)
+            except Exception as e:
+                self._errors.append((sequence, e))
+            else:
+                self._written.append(output_file)
+            self._busy[index] += time.perf_counter() - start
+    
+    def _collect(self) -> None:
+        """Report files written so far, and raise the first error once all threads stopped."""
+        if self._errors:
+            self._stop()
+        while self._written:
+            output_file = self._written.popleft()
+            self.file_count += 1
+            if self.on_written is not None:
+                self.on_written(output_file)
+        if self._errors:
+            raise min(self._errors, key=operator.itemgetter(0))[1]
+    
+    def _stop(self) -> None:
+        if self._threads:
+            for jobs, thread in zip(self._queues, self._threads):
+                # A full queue is drained by its thread, unless that thread is gone
+                while thread.is_alive():
+                    try:
+                        jobs.put(None, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+            if self.stats is not None:
+                self.stats.add_stage('io', sum(self._busy), self.file_count + len(self._written))
+    
+    def close(self) -> None:
+        """Wait for all queued files; raises the error of the first failed file, if any."""
+        self._stop()
+        self._collect()
+
+
+# Per-process state of conversion workers, set once by _init_worker
+_WORKER_CATEGORIES = None
+_WORKER_JOBS = None
+_WORKER_OPTIONS = {}
+_WORKER_COLLECT = False
+_WORKER_WARNING_LIMIT = 10
+_WORKER_ARRAYS = False
+
+
+def _init_worker(
+    categories: Dict[int, int],
+    jobs: Optional[List[tuple]],
+    options: Dict[str, Any],
+    collect: bool = False,
+    warning_limit: int = 10,
+    arrays: bool = False
+) -> None:
+    global _WORKER_CATEGORIES, _WORKER_JOBS, _WORKER_OPTIONS
+    global _WORKER_COLLECT, _WORKER_WARNING_LIMIT, _WORKER_ARRAYS
+    _WORKER_CATEGORIES = categories
+    _WORKER_JOBS = jobs
+    _WORKER_OPTIONS = options
+    _WORKER_COLLECT = collect
+    _WORKER_WARNING_LIMIT = warning_limit
+    _WORKER_ARRAYS = arrays
+
+
+def _convert_shard(task) -> Tuple[int, int, Dict[str, Any], Optional[list], Optional[tuple]]:
+    """
+    Write one shard of label files in a worker process.
+    
+    ``task`` is either a (start, stop) range into the jobs shared at pool start-up
+    or a list of jobs. A job holds the arguments of ``_LabelWriter.add``.
+    
+    Returns:
+        Tuple of (files written, annotations written, ``ConversionStats``
+        snapshot with the stage timings and warnings, file contents, boxes);
+        the contents are only returned (instead of written) when the parent
+        process owns the output, e.g. a tar shard, and the boxes (a
+        ``_LabelArrays`` snapshot) when it builds a label cache
+    """
+    jobs = _WORKER_JOBS[task[0]:task[1]] if isinstance(task, tuple) else task
+    stats = ConversionStats(max_printed_warnings=_WORKER_WARNING_LIMIT, verbose=False)
+    sink = _CollectingSink() if _WORKER_COLLECT else None
+    arrays = _LabelArrays(_WORKER_OPTIONS['label_format']) if _WORKER_ARRAYS else None
+    writer = _LabelWriter(
+        _WORKER_CATEGORIES, stats=stats, sink=sink, arrays=arrays, **_WORKER_OPTIONS
+    )
+    try:
+        for job in jobs:
+            writer.add(*job)
+        writer.flush()
+    finally:
+        writer.close()
+    return (
+        writer.file_count, writer.annotation_count, stats.snapshot(),
+        sink and sink.items, arrays and arrays.snapshot()
+    )
+
+
+class _ShardedWriter:
+    """
+    Drop-in replacement for ``_LabelWriter`` that converts shards of images in
+    a process pool.
+    
+    The class mapping (and, for in-memory conversion, the full job list) is
+    handed to every worker once when the pool starts on the first submitted
+    shard; with the ``fork`` start method it is inherited without pickling.
+    Results are collected in submission order, so warnings, stage timings and
+    progress are merged into ``stats`` as the shards were queued and the
+    files written are identical to a serial run.
+    """
+    
+    def __init__(
+        self,
+        categories: Dict[int, int],
+        workers: int,
+        jobs: Optional[List[tuple]] = None,
+        shard_size: int = 256,
+        on_written: Optional[Callable[[Path], None]] = None,
+        sink=None,
+        stats: Optional[ConversionStats] = None,
+        arrays: Optional[_LabelArrays] = None,
+        **options
+    ):
+        self.categories = categories
+        self.jobs = jobs
+        self.stats = ConversionStats() if stats is None else stats
+        self.on_written = on_written
+        self.sink = sink
+        self.arrays = arrays
+        # Keyword arguments for the _LabelWriter of every worker
+        self.options = options
+        self.workers = workers
+        self.shard_size = shard_size
+        self.file_count = 0
+        self.annotation_count = 0
+        self._jobs = []
+        self._pending = deque()
+        self._pool = None
+    
+    def add(
+        self,
+        output_file: Path,
+        annotations: List[Dict[str, Any]],
+        image_width: int,
+        image_height: int,
+        mode: str = 'w'
+    ) -> None:
+        """Queue one image; full shards are sent to the pool."""
+        self._jobs.append((output_file, annotations, image_width, image_height, mode))
+        if len(self._jobs) >= self.shard_size:
+            self.submit(self._jobs)
+            self._jobs = []
+    
+    def submit(self, task) -> None:
+        """Send a shard (a job list or a range into the shared jobs) to the pool."""
+        if self._pool is None:
+            # Started late so that a streamed class mapping is complete
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            self._pool = context.Pool(
+                self.workers, initializer=_init_worker,
+                initargs=(
+                    self.categories, self.jobs, self.options, self.sink is not None,
+                    self.stats.max_printed_warnings, self.arrays is not None
+                )
+            )
+        self._pending.append((task, self._pool.apply_async(_convert_shard, (task,))))
+        # Bound the work in flight so streaming input is not buffered without limit
+        while len(self._pending) > 2 * self.workers:
+            self._collect()
+    
+    def _collect(self) -> None:
+        task, result = self._pending.popleft()
+        file_count, annotation_count, snapshot, outputs, boxes = result.get()
+        self.stats.merge(snapshot)
+        for output_file, data, mode in outputs or ():
+            self.sink.write(output_file, data, mode)
+        if boxes is not None:
+            self.arrays.add(*boxes)
+        if self.on_written is not None:
+            for job in self.jobs[task[0]:task[1]] if isinstance(task, tuple) else task:
+                self.on_written(job[0])
+        self.stats.files_written(file_count, annotation_count)
+        self.file_count += file_count
+        self.annotation_count += annotation_count
+    
+    def flush(self) -> None:
+        """Wait until every queued image has been written."""
+        if self._jobs:
+            self.submit(self._jobs)
+            self._jobs = []
+        while self._pending:
+            self._collect()
+    
+    def close(self) -> None:
+        """Shut the pool down, abandoning unfinished shards."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+def _resolve_workers(workers: Optional[int]) -> int:
+    """Number of worker processes to use (``0`` or ``None`` means one per CPU core)."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+# Ways of storing the label files of a conversion
+OUTPUT_BACKENDS = ('files', 'tar')
+
+SHARD_INDEX_NAME = 'labels.index.json'
+
+
+class _TarShardSink:
+    """
+    Label file sink that packs labels into size-bounded tar shards.
+    
+    Shards are named ``labels-00000.tar``, ``labels-00001.tar``, ... and a JSON
+    index (``SHARD_INDEX_NAME``) maps every label stem to the (shard, offset,
+    size) of its data, so a label can be read with a single seek. Data appended
+    to an existing label (out-of-order annotations in streaming mode) becomes an
+    extra member ``<stem>.txt.<n>`` and an extra index segment.
+    """
+    
+    def __init__(self, output_path: Path, max_shard_bytes: int = 256 << 20):
+        self.output_path = output_path
+        self.max_shard_bytes = max_shard_bytes
+        self.shards = []
+        self.index = {}
+        self._tar = None
+        self._mtime = int(time.time())
+    
+    def write(self, output_file: Path, data: str, mode: str) -> None:
+        payload = data.encode('utf-8')
+        stem = output_file.stem
+        if mode == 'w' or stem not in self.index:
+            self.index[stem] = []
+        segments = self.index[stem]
+        
+        if self._tar is None or (
+            self._tar.offset > 0 and self._tar.offset + len(payload) > self.max_shard_bytes
+        ):
+            self._next_shard()
+        name = output_file.name if not segments else f"{output_file.name}.{len(segments)}"
+        info = tarfile.TarInfo(name)
+        info.size = len(payload)
+        info.mtime = self._mtime
+        # Data follows the member header (which may span several blocks for long names)
+        header = info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors)
+        offset = self._tar.offset + len(header)
+        self._tar.addfile(info, io.BytesIO(payload))
+        segments.append([len(self.shards) - 1, offset, len(payload)])
+    
+    def _next_shard(self) -> None:
+        if self._tar is not None:
+            self._tar.close()
+        name = f"labels-{len(self.shards):05d}.tar"
+        self.shards.append(name)
+        self._tar = tarfile.open(self.output_path / name, 'w', format=tarfile.GNU_FORMAT)
+    
+    def close(self) -> None:
+        """Finish the last shard and write the index."""
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        temp_path = self.output_path / (SHARD_INDEX_NAME + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({'shards': self.shards, 'labels': self.index}, f, separators=(',', ':'))
+        os.replace(temp_path, self.output_path / SHARD_INDEX_NAME)
+
+
+class _SinkRouter:
+    """Label file sink that hands every file to the sink of its output directory."""
+    
+    def __init__(self, sinks: Dict[Path, Any]):
+        self.sinks = sinks
+    
+    def write(self, output_file: Path, data: str, mode: str) -> None:
+        self.sinks[output_file.parent].write(output_file, data, mode)
+
+
+class LabelShardReader:
+    """
+    Random access to labels stored in tar shards by ``output_backend='tar'``.
+    
+    Example:
+        >>> reader = LabelShardReader("labels")
+        >>> text = reader.read("image_001")
+    """
+    
+    def __init__(self, shard_dir: str):
+        self.shard_dir = Path(shard_dir)
+        with open(self.shard_dir / SHARD_INDEX_NAME, 'r') as f:
+            index = json.load(f)
+        self.shards = index['shards']
+        self.index = index['labels']
+        self._files = {}
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    def __contains__(self, stem: str) -> bool:
+        return stem in self.index
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+    
+    def read(self, stem: str) -> str:
+        """Contents of the label file of one image."""
+        parts = []
+        for shard, offset, size in self.index[stem]:
+            if shard not in self._files:
+                self._files[shard] = open(self.shard_dir / self.shards[shard], 'rb')
+            f = self._files[shard]
+            f.seek(offset)
+            parts.append(f.read(size))
+        return b"".join(parts).decode('utf-8')
+    
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class LabelCache:
+    """
+    Binary copy of the label files of an output directory for training loaders.
+    
+    ``convert_coco_to_yolo_obb(label_cache=True)`` writes it as ``labels.npz``
+    next to the label files in the same pass, so data loaders can load every
+    label at once instead of parsing each ``.txt`` file. The uncompressed
+    ``.npz`` holds:
+    
+    - ``name_bytes`` and ``name_offsets``: UTF-8 label file stems
+    - ``image_sizes``: (width, height) per image
+    - ``label_offsets``: start of the boxes of each image in the box columns
+    - ``class_ids`` and ``boxes``: class ID and float32 box values per box, as
+      rounded in the label files (8 corner coordinates, or cx cy w h angle)
+    - ``label_format``, ``version`` and ``hash``, a SHA-1 of all columns that
+      changes whenever any label changes
+    
+    Example:
+        >>> cache = LabelCache("labels")
+        >>> size, class_ids, boxes = cache.read("image_001")
+    """
+    
+    VERSION = 1
+    FILE_NAME = 'labels.npz'
+    COLUMNS = ('name_bytes', 'name_offsets', 'image_sizes', 'label_offsets', 'class_ids', 'boxes')
+    
+    def __init__(self, path: str):
+        path = Path(path)
+        if path.is_dir():
+            path = path / self.FILE_NAME
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != self.VERSION:
+                raise ValueError(f"unsupported label cache version: {int(data['version'])}")
+            for name in self.COLUMNS:
+                setattr(self, name, data[name])
+            self.label_format = str(data['label_format'])
+            self.hash = str(data['hash'])
+        offsets = self.name_offsets.tolist()
+        names = self.name_bytes.tobytes()
+        self.stems = [
+            names[start:stop].decode('utf-8') for start, stop in zip(offsets, offsets[1:])
+        ]
+        self.index = {stem: row for row, stem in enumerate(self.stems)}
+    
+    @classmethod
+    def write(
+        cls,
+        path: Path,
+        stems: List[str],
+        image_sizes: np.ndarray,
+        label_offsets: np.ndarray,
+        class_ids: np.ndarray,
+        boxes: np.ndarray,
+        label_format: str = 'corners'
+    ) -> None:
+        """Save the columns of a label cache, replacing ``path`` atomically."""
+        encoded = [stem.encode('utf-8') for stem in stems]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        columns = {
+            'name_bytes': np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            'name_offsets': name_offsets,
+            'image_sizes': np.asarray(image_sizes, dtype=np.int64).reshape(-1, 2),
+            'label_offsets': np.asarray(label_offsets, dtype=np.int64),
+            'class_ids': np.asarray(class_ids, dtype=np.int64),
+            'boxes': np.asarray(boxes, dtype=np.float32).reshape(-1, _LABEL_COLUMNS[label_format]),
+        }
+        digest = hashlib.sha1(label_format.encode('utf-8'))
+        for name in cls.COLUMNS:
+            digest.update(np.ascontiguousarray(columns[name]).tobytes())
+        
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez(
+                    f, version=np.array(cls.VERSION), label_format=np.array(label_format),
+                    hash=np.array(digest.hexdigest()), **columns
+                )
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+    
+    def __len__(self) -> int:
+        return len(self.stems)
+    
+    def __contains__(self, stem: str) -> bool:
+        return stem in self.index
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.stems)
+    
+    def read(self, stem: str) -> Tuple[Tuple[int, int], np.ndarray, np.ndarray]:
+        """(width, height) of the image, and the class IDs and boxes of its labels."""
+        row = self.index[stem]
+        start, stop = self.label_offsets[row], self.label_offsets[row + 1]
+        width, height = self.image_sizes[row].tolist()
+        return (width, height), self.class_ids[start:stop], self.boxes[start:stop]
+
+
+def unpack_label_shards(shard_dir: str, output_dir: str) -> int:
+    """
+    Expand tar label shards into the usual one ``.txt`` file per image layout.
+    
+    Args:
+        shard_dir: Directory with the shards and their index
+        output_dir: Directory for the label files
+        
+    Returns:
+        Number of label files written
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    reader = LabelShardReader(shard_dir)
+    try:
+        for stem in reader:
+            with open(output_path / f"{stem}.txt", 'w') as f:
+                f.write(reader.read(stem))
+    finally:
+        reader.close()
+    return len(reader)
+
+
+def _read_label_file(path: Path, columns: int) -> List[str]:
+    """Tokens of a label file with ``columns`` values after each class ID."""
+    with open(path, 'r') as f:
+        text = f.read()
+    tokens = text.split()
+    rows = sum(1 for line in text.splitlines() if line.strip())
+    if len(tokens) != rows * (columns + 1):
+        raise ValueError(f"expected {columns + 1} values per line")
+    return tokens
+
+
+def _convert_label_chunk(task) -> List[Tuple[str, Optional[str]]]:
+    """
+    Convert a chunk of label files to another label format.
+    
+    The boxes of all files in the chunk are parsed into one array and
+    converted together, then written file by file.
+    
+    Returns:
+        (file name, error message if the file was skipped) per file
+    """
+    files, label_format, precision, image_size = task
+    columns = _LABEL_COLUMNS[label_format]
+    source_columns = _LABEL_COLUMNS['xywha' if label_format == 'corners' else 'corners']
+    results = []
+    targets = []
+    counts = []
+    tokens = []
+    for source, target in files:
+        try:
+            file_tokens = _read_label_file(source, source_columns)
+        except (OSError, ValueError) as e:
+            results.append((source.name, str(e)))
+            continue
+        results.append((source.name, None))
+        targets.append(target)
+        counts.append(len(file_tokens) // (source_columns + 1))
+        tokens.extend(file_tokens)
+    
+    table = np.array(tokens, dtype=str).reshape(-1, source_columns + 1)
+    if label_format == 'corners':
+        boxes = xywha_to_corners(table[:, 1:].astype(np.float64), *image_size)
+    else:
+        boxes = corners_to_xywha(table[:, 1:].astype(np.float64), *image_size)
+    values = _label_values(table[:, 0].tolist(), boxes, False, columns)
+    line = _label_format(precision, 1, columns)
+    width = columns + 1
+    offset = 0
+    for target, count in zip(targets, counts):
+        with open(target, 'w') as f:
+            f.write((line * count) % tuple(values[width * offset:width * (offset + count)]))
+        offset += count
+    return results
+
+
+def convert_label_files(
+    input_dir: str,
+    output_dir: str,
+    label_format: str = 'corners',
+    workers: int = 1,
+    precision: int = 6,
+    image_size: Optional[Tuple[float, float]] = None
+) -> int:
+    """
+    Convert a directory of label files between the two label formats.
+    
+    The ``.txt`` files are parsed in chunks of up to 256 files into one array
+    each and converted with ``xywha_to_corners`` or ``corners_to_xywha``;
+    chunks are spread over a pool of worker processes. This replaces the legacy
+    second step, 2.convert_OBB.py.
+    
+    Args:
+        input_dir: Directory with label files in the other format
+        output_dir: Directory for the converted files (may be ``input_dir``)
+        label_format: Format to convert to (see ``LABEL_FORMATS``)
+        workers: Number of worker processes (0 uses one per CPU core)
+        precision: Number of decimals per value
+        image_size: (width, height) of the images when they all share one
+            size; rectangles are then converted in pixel space, otherwise in
+            normalized space like the legacy script (only equivalent for
+            square images)
+    
+    Returns:
+        Number of label files written
+    """
+    if label_format not in LABEL_FORMATS:
+        raise OptionError(f"Unknown label format: {label_format}")
+    input_path = Path(input_dir)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    image_size = (1.0, 1.0) if image_size is None else tuple(image_size)
+    files = [
+        (input_path / name, output_path / name)
+        for name in sorted(os.listdir(input_path)) if name.endswith('.txt')
+    ]
+    
+    workers = min(_resolve_workers(workers), max(1, len(files)))
+    chunk_size = max(1, min(256, -(-len(files) // (4 * workers))))
+    tasks = [
+        (files[start:start + chunk_size], label_format, precision, image_size)
+        for start in range(0, len(files), chunk_size)
+    ]
+    if workers > 1 and len(tasks) > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with context.Pool(workers) as pool:
+            results = list(itertools.chain.from_iterable(pool.imap(_convert_label_chunk, tasks)))
+    else:
+        results = list(itertools.chain.from_iterable(map(_convert_label_chunk, tasks)))
+    
+    written = 0
+    for name, error in results:
+        if error is None:
+            written += 1
+        else:
+            print(f"Warning: Skipping {name}: {error}")
+    return written
+
+
+# Start-of-frame markers of JPEG (C4, C8 and CC are DHT, JPG and DAC)
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(f) -> Tuple[int, int]:
+    """Skip the JPEG segments after SOI up to the start-of-frame header."""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ValueError("corrupt JPEG marker")
+        code = marker[1]
+        while code == 0xFF:
+            # Fill bytes before a marker
+            fill = f.read(1)
+            if not fill:
+                raise ValueError("corrupt JPEG marker")
+            code = fill[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            # Markers without a segment
+            continue
+        if code in (0xD9, 0xDA):
+            raise ValueError("JPEG image data starts before its frame header")
+        (length,) = struct.unpack('>H', f.read(2))
+        if code in _JPEG_SOF:
+            height, width = struct.unpack('>xHH', f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(path) -> Tuple[int, int]:
+    """
+    Read the size of a JPEG, PNG, GIF, BMP or WebP image from its header.
+    
+    No pixels are decoded: the fixed-position header fields are read, and
+    JPEG files are scanned segment by segment up to the frame header. The
+    size is the stored one, before any EXIF orientation is applied.
+    
+    Returns:
+        Tuple of (width, height) in pixels
+        
+    Raises:
+        ValueError: If the file is not in one of these formats or its header is cut short
+    """
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        try:
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if head[:2] == b'BM':
+                if struct.unpack('<I', head[14:18])[0] == 12:
+                    # OS/2 bitmap core header
+                    return struct.unpack('<HH', head[18:22])
+                width, height = struct.unpack('<ii', head[18:26])
+                # Top-down bitmaps store a negative height
+                return width, abs(height)
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                chunk = head[12:16]
+                if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+                    width, height = struct.unpack('<HH', head[26:30])
+                    return width & 0x3FFF, height & 0x3FFF
+                if chunk == b'VP8L' and head[20] == 0x2F:
+                    bits = int.from_bytes(head[21:25], 'little')
+                    return (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1
+                if chunk == b'VP8X':
+                    return (
+                        int.from_bytes(head[24:27], 'little') + 1,
+                        int.from_bytes(head[27:30], 'little') + 1
+                    )
+            if head[:2] == b'\xff\xd8':
+                return _jpeg_size(f)
+        except (struct.error, IndexError):
+            pass
+    raise ValueError(f"unsupported or truncated image header: {path}")
+
+
+class _ImageSizeProbe:
+    """
+    Image sizes read from the file headers under an image directory.
+    
+    Images are looked up by their COCO ``file_name`` relative to the
+    directory, on a pool of threads. Sizes are kept in a JSON cache (by
+    default ``.coco2yolo_sizes.json`` in the image directory) keyed by file
+    name and checked against the mtime and size of the file, so later runs
+    only stat the files.
+    """
+    
+    VERSION = 1
+    FILE_NAME = '.coco2yolo_sizes.json'
+    # Files probed per thread task
+    CHUNK_SIZE = 256
+    
+    def __init__(self, images_dir: str, cache_file: Optional[str] = None, threads: int = 16):
+        if not os.path.isdir(images_dir):
+            raise OptionError(f"Image directory not found: {images_dir}")
+        self.images_dir = Path(images_dir)
+        self.cache_path = Path(cache_file) if cache_file else self.images_dir / self.FILE_NAME
+        self.threads = threads
+        self.entries = {}
+        self.changed = False
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+            if cached.get('version') == self.VERSION:
+                self.entries = cached['images']
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+    
+    def _probe(self, file_name: str) -> Optional[Tuple[int, int]]:
+        path = self.images_dir / file_name
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        key = [info.st_mtime_ns, info.st_size]
+        entry = self.entries.get(file_name)
+        if entry is not None and entry[:2] == key:
+            return entry[2], entry[3]
+        try:
+            width, height = read_image_size(path)
+        except (OSError, ValueError):
+            return None
+        self.entries[file_name] = key + [width, height]
+        self.changed = True
+        return width, height
+    
+    def sizes(self, file_names: List[str]) -> np.ndarray:
+        """int64 array of shape (N, 2) with the width and height of each file, 0 if unreadable."""
+        sizes = np.zeros((len(file_names), 2), dtype=np.int64)
+        
+        def probe_chunk(start):
+            stop = min(start + self.CHUNK_SIZE, len(file_names))
+            probed = [self._probe(file_name) or (0, 0) for file_name in file_names[start:stop]]
+            if probed:
+                sizes[start:stop] = probed
+        
+        starts = range(0, len(file_names), self.CHUNK_SIZE)
+        if self.threads > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(self.threads) as pool:
+                list(pool.map(probe_chunk, starts))
+        else:
+            for start in starts:
+                probe_chunk(start)
+        return sizes
+    
+    def resolve(
+        self, file_names: List[str], listed: np.ndarray, stats: ConversionStats
+    ) -> np.ndarray:
+        """
+        Sizes from the file headers, falling back to the ``listed`` (width, height).
+        
+        Listed sizes of 0 stand for missing ones. Images whose files cannot be
+        read and listed sizes that differ from the files are warned about.
+        """
+        with stats.stage('probe', len(file_names)):
+            probed = self.sizes(file_names)
+        unreadable = probed[:, 0] == 0
+        stale = ~unreadable & (listed > 0).all(axis=1) & (probed != listed).any(axis=1)
+        
+        def warn(kind, rows, describe):
+            shown = rows[:stats.max_printed_warnings].tolist()
+            for row in shown:
+                stats.warn(kind, describe(row))
+            if len(rows) > len(shown):
+                stats.warn(kind, describe(int(rows[len(shown)])), len(rows) - len(shown))
+        
+        warn('unreadable_image', np.flatnonzero(unreadable), lambda row: (
+            f"Warning: Cannot read the size of {self.images_dir / file_names[row]}, "
+            f"using the listed {listed[row, 0]}x{listed[row, 1]}"
+        ))
+        warn('size_mismatch', np.flatnonzero(stale), lambda row: (
+            f"Warning: {file_names[row]} is {probed[row, 0]}x{probed[row, 1]} pixels, "
+            f"not {listed[row, 0]}x{listed[row, 1]} as listed"
+        ))
+        return np.where(unreadable[:, None], listed, probed)
+    
+    def save(self) -> None:
+        """Write the size cache if new files were probed."""
+        if not self.changed:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(self.cache_path, json.dumps(
+                {'version': self.VERSION, 'images': self.entries}, separators=(',', ':')
+            ))
+            self.changed = False
+        except OSError as e:
+            print(f"Warning: Cannot save the image size cache: {e}")
+
+
+def _annotation_digest(
+    annotations: List[Dict[str, Any]], image_width: int, image_height: int
+) -> str:
+    """
+    Content hash of everything that determines one label file.
+    
+    Only the fields the converter reads are hashed, with polygon coordinates
+    as float32 and RLE counts decoded, so annotations read from the JSON file
+    and from the annotation cache (see ``_CocoCache``) give the same digest.
+    """
+    digest = hashlib.sha1(f"{image_width},{image_height}".encode('ascii'))
+    for ann in annotations:
+        segmentation = ann.get('segmentation')
+        try:
+            if isinstance(segmentation, dict):
+                counts = _stored_rle_counts(segmentation.get('counts'))
+                size = segmentation.get('size')
+                size = size if isinstance(size, list) and len(size) == 2 else [-1, -1]
+                header = ['rle', ann.get('category_id'), size, len(counts)]
+                data = counts.astype('<i8').tobytes()
+            elif segmentation:
+                parts = segmentation if isinstance(segmentation[0], list) else [segmentation]
+                header = ['polygon', ann.get('category_id'), [len(part) for part in parts]]
+                data = np.array([value for part in parts for value in part], dtype='<f4').tobytes()
+            else:
+                header, data = ['empty', ann.get('category_id')], b""
+        except (TypeError, ValueError):
+            header, data = ['invalid', ann.get('category_id'), segmentation], b""
+        digest.update(json.dumps(header, separators=(',', ':')).encode('utf-8'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+# Label writer options that do not change the label files
+_RUNTIME_OPTIONS = ('io_threads',)
+
+
+class _Manifest:
+    """
+    Per-image content hashes of the label files in an output directory.
+    
+    The manifest stores one digest per label file stem together with a digest
+    of the conversion settings (the effective class mapping and the label
+    writer options); if the settings change, every file is considered stale.
+    While a run is in progress, each
+    written file is appended to a journal, so an interrupted run can resume
+    without rewriting the files it already finished.
+    """
+    
+    FILE_NAME = '.coco2yolo_manifest.json'
+    JOURNAL_NAME = '.coco2yolo_manifest.journal'
+    
+    def __init__(self, output_path: Path, categories: Dict[int, int], options: Dict[str, Any]):
+        self.path = output_path / self.FILE_NAME
+        self.journal_path = output_path / self.JOURNAL_NAME
+        options = {name: value for name, value in options.items() if name not in _RUNTIME_OPTIONS}
+        # Files written with another corner order are stale as well
+        options['corner_order'] = CORNER_ORDER
+        self.settings = hashlib.sha1(
+            json.dumps([sorted(categories.items()), sorted(options.items())]).encode('utf-8')
+        ).hexdigest()
+        self.previous = {}
+        self.digests = {}
+        
+        try:
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('settings') == self.settings:
+                self.previous = manifest.get('images', {})
+            else:
+                # Stems are still needed to remove files of images that disappeared
+                self.previous = {stem: None for stem in manifest.get('images', {})}
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        
+        resumed = 0
+        try:
+            with open(self.journal_path, 'r') as f:
+                header = f.readline()
+                if json.loads(header).get('settings') == self.settings:
+                    for line in f:
+                        stem, sep, digest = line.rstrip('\n').rpartition('\t')
+                        # Ignore a line cut short by the interruption
+                        if sep and len(digest) == 40:
+                            self.previous[stem] = digest
+                            resumed += 1
+        except (FileNotFoundError, ValueError):
+            pass
+        if resumed:
+            print(f"Resuming interrupted run ({resumed} files already written)")
+        
+        self._journal = open(self.journal_path, 'a' if resumed else 'w')
+        if not resumed:
+            self._journal.write(json.dumps({'settings': self.settings}) + '\n')
+            self._journal.flush()
+    
+    def unchanged(self, output_file: Path, digest: str) -> bool:
+        """Record the digest of a label file and tell whether it can be skipped."""
+        stem = output_file.stem
+        self.digests[stem] = digest
+        return self.previous.get(stem) == digest and output_file.exists()
+    
+    def record(self, output_file: Path) -> None:
+        """Journal a label file that has been written."""
+        self._journal.write(f"{output_file.stem}\t{self.digests[output_file.stem]}\n")
+        self._journal.flush()
+    
+    def commit(self, output_path: Path) -> int:
+        """
+        Remove label files of images that no longer exist and save the manifest.
+        
+        Returns:
+            Number of stale label files removed
+        """
+        removed = 0
+        for stem in self.previous:
+            if stem not in self.digests:
+                try:
+                    (output_path / f"{stem}.txt").unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({'settings': self.settings, 'images': self.digests}, f, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+        self.close()
+        os.remove(self.journal_path)
+        return removed
+    
+    def close(self) -> None:
+        self._journal.close()
+
+
+def _convert_streaming(
+    json_file: str,
+    output_path: Path,
+    class_mapping: Optional[Dict[int, int]] = None,
+    spill_dir: Optional[str] = None,
+    workers: int = 1,
+    options: Optional[Dict[str, Any]] = None,
+    sink=None,
+    stats: Optional[ConversionStats] = None,
+    writer=None,
+    labels: Optional[_LabelOwners] = None,
+    source: int = 0,
+    probe: Optional[_ImageSizeProbe] = None,
+    arrays: Optional[_LabelArrays] = None
+) -> Tuple[int, int]:
+    """
+    Convert a COCO file without loading it into memory.
+    
+    Only a compact (stem, width, height) tuple is kept per image. When the
+    ``images`` (and, without a class mapping, ``categories``) arrays precede
+    ``annotations`` and annotations are grouped by image, each label file is
+    written as soon as its group ends. Anything that arrives out of order is
+    spilled to hash-partitioned temporary files and written afterwards.
+    
+    A ``writer`` shared with other files (which needs a class mapping) is
+    flushed but not closed, otherwise the boxes written go to ``arrays`` too;
+    ``labels`` checks the label files of file number
+    ``source`` for collisions. With a ``probe``, image sizes are read from
+    the image files once the ``images`` array has been parsed.
+    
+    Returns:
+        Tuple of (files written, annotations written)
+    """
+    images = {}
+    # (id, file name, width, height) of the images until their files are probed
+    listed = []
+    categories = {} if class_mapping is None else class_mapping
+    num_categories = 0
+    completed = set()
+    flushed = set()
+    options = options or {}
+    stats = ConversionStats() if stats is None else stats
+    shared = writer is not None
+    if shared:
+        files_before, annotations_before = writer.file_count, writer.annotation_count
+    else:
+        files_before = annotations_before = 0
+        writer = _open_writer(categories, workers, None, None, sink, stats, options, arrays)
+    
+    def flush(image_id, annotations, mode):
+        if image_id not in images:
+            stats.warn('missing_image', f"Warning: Image ID {image_id} not found in images list")
+            return
+        stem, image_width, image_height = images[image_id]
+        if image_width <= 0 or image_height <= 0:
+            stats.warn('missing_size', f"Warning: Image ID {image_id} has no size, skipping it")
+            return
+        if labels is not None and mode == 'w':
+            labels.claim(output_path, stem, source, image_id)
+        writer.add(output_path / f"{stem}.txt", annotations, image_width, image_height, mode)
+    
+    try:
+        with tempfile.TemporaryDirectory(prefix="coco2yolo-spill-", dir=spill_dir) as tmp_dir:
+            spill = _SpillBuckets(tmp_dir)
+            current_id = None
+            current = []
+            if not shared:
+                stats.begin()
+            start = time.perf_counter()
+            
+            for key, item in _iter_coco_sections(json_file):
+                if item is _SECTION_END:
+                    completed.add(key)
+                    if key == 'images' and probe is not None:
+                        file_names = [image[1] for image in listed]
+                        sizes = np.array(
+                            [image[2:] for image in listed], dtype=np.int64
+                        ).reshape(-1, 2)
+                        sizes = probe.resolve(file_names, sizes, stats).tolist()
+                        for (image_id, file_name, _, _), (image_width, image_height) in zip(
+                            listed, sizes
+                        ):
+                            images[image_id] = (Path(file_name).stem, image_width, image_height)
+                        listed.clear()
+                elif key == 'images':
+                    image_size = item.get('width') or 0, item.get('height') or 0
+                    if probe is not None:
+                        listed.append((item['id'], item['file_name']) + image_size)
+                    else:
+                        images[item['id']] = (Path(item['file_name']).stem,) + image_size
+                elif key == 'categories':
+                    if class_mapping is None:
+                        categories[item['id']] = num_categories
+                        num_categories += 1
+                elif key == 'annotations':
+                    image_id = item['image_id']
+                    ready = 'images' in completed and (
+                        class_mapping is not None or 'categories' in completed
+                    )
+                    if ready and image_id == current_id:
+                        current.append(item)
+                    elif not ready or image_id in flushed:
+                        spill.add(item)
+                    else:
+                        if current:
+                            flush(current_id, current, 'w')
+                        flushed.add(image_id)
+                        current_id, current = image_id, [item]
+            if current:
+                flush(current_id, current, 'w')
+            # Every file must exist before spilled annotations are appended to it
+            writer.flush()
+            stats.add_stage('stream', time.perf_counter() - start, len(images))
+            
+            if spill.count:
+                print(f"Writing {spill.count} out-of-order annotations from spill files...")
+            with stats.stage('spill', spill.count):
+                for image_id, anns in spill.groups():
+                    if image_id in flushed:
+                        if image_id in images:
+                            flush(image_id, anns, 'a')
+                    else:
+                        flush(image_id, anns, 'w')
+                writer.flush()
+    finally:
+        if not shared:
+            writer.close()
+    
+    return writer.file_count - files_before, writer.annotation_count - annotations_before
 
 
-def calculate_obb_corners(segmentation: List[float], image_width: int, image_height: int) -> List[float]:
+def convert_coco_to_yolo_obb(
+    json_file: str,
+    output_dir: str = "labels",
+    class_mapping: Dict[int, int] = None,
+    streaming: bool = False,
+    spill_dir: Optional[str] = None,
+    workers: int = 1,
+    incremental: bool = False,
+    multi_part: str = 'first',
+    output_backend: str = 'files',
+    shard_bytes: int = 256 << 20,
+    precision: int = 6,
+    clamp: bool = False,
+    label_format: str = 'corners',
+    validate: bool = False,
+    min_fill: float = 0.25,
+    min_aspect: float = 0.02,
+    drop_invalid: bool = False,
+    validation_report: Optional[str] = None,
+    geometry_backend: str = 'auto',
+    io_threads: int = 4,
+    cache: bool = False,
+    cache_dir: Optional[str] = None,
+    on_collision: str = 'warn',
+    images_dir: Optional[str] = None,
+    size_cache: Optional[str] = None,
+    probe_threads: int = 16,
+    label_cache: bool = False,
+    tile_size: Optional[int] = None,
+    tile_stride: Optional[int] = None,
+    min_visible: float = 0.5,
+    views: Optional[List[Dict[str, Any]]] = None,
+    stats: Optional[ConversionStats] = None,
+    stats_json: Optional[str] = None
+) -> ConversionStats:
     """
-    Calculate oriented bounding box corners from segmentation polygon.
+    Convert COCO annotations to YOLO OBB format.
+    
+    Several annotation files (e.g. train, val and test splits) can be
+    converted as one job: they share the worker processes and one class
+    mapping, numbering the categories of all files in order of first
+    appearance, and ``output_dir`` becomes a layout template.
+    
+    Several label sets can be written from one pass with ``views``: the box of
+    every annotation is computed once and written to each view it belongs to.
     
     Args:
-        segmentation: List of polygon coordinates [x1, y1, x2, y2, ...]
-        image_width: Width of the image
-        image_height: Height of the image
-        
+        json_file: Path to COCO annotation JSON file, or a list of them
+        output_dir: Output directory for YOLO annotation files; ``{split}`` is
+            replaced by the annotation file name without extension and
+            ``{parent}`` by the name of its directory. With a list of files, a
+            directory without placeholders gets one subdirectory per file
+            (``<output_dir>/{split}``)
+        class_mapping: Optional mapping from COCO category IDs to YOLO class IDs
+        streaming: Parse the JSON incrementally instead of loading it whole,
+            keeping memory bounded on very large annotation files
+        spill_dir: Directory for temporary spill files in streaming mode
+            (defaults to the system temp directory)
+        workers: Number of worker processes converting shards of images in
+            parallel (0 uses one per CPU core)
+        incremental: Only rewrite label files whose annotations changed since
+            the previous incremental run into ``output_dir``, delete label files
+            of images that disappeared, and resume an interrupted run
+        multi_part: How annotations with several polygons are handled (see
+            ``MULTI_PART_POLICIES``): 'first' part only, 'union' of all parts,
+            or the 'largest' part
+        output_backend: 'files' writes one ``.txt`` per image; 'tar' packs the
+            labels into tar shards of at most ``shard_bytes`` bytes with an index
+            for random access (see ``LabelShardReader``, ``unpack_label_shards``)
+        shard_bytes: Maximum size of a tar shard
+        precision: Number of decimals written per coordinate
+        clamp: Clip corner coordinates to [0, 1]
+        label_format: 'corners' writes the 4 corners of each box; 'xywha'
+            writes its normalized center and size and its angle in degrees in
+            (0, 90], the format of the legacy first step (see ``LABEL_FORMATS``)
+        validate: Check how well every box fits its polygon (see ``FitReport``);
+            the results are in ``stats.validation``
+        min_fill: Flag boxes whose polygon covers less than this fraction of
+            the box (the polygon-box IoU)
+        min_aspect: Flag boxes whose short side is below this fraction of the long side
+        drop_invalid: Leave flagged boxes out of the label files (implies ``validate``)
+        validation_report: Path to write the fit summary and the flagged boxes
+            to as JSON (implies ``validate``)
+        geometry_backend: 'numpy' computes the rectangles of many polygons at
+            once; 'opencv' calls ``cv2.minAreaRect`` per polygon; 'auto' picks
+            OpenCV when it is installed (see ``GEOMETRY_BACKENDS``)
+        io_threads: Number of threads writing label files (per worker process)
+            while the next boxes are computed; 0 writes each file from the
+            converting thread. Label files are always written to a temporary
+            name and renamed into place (the 'tar' backend ignores this option)
+        cache: Keep a memory-mapped columnar copy of the parsed annotations
+            next to ``json_file`` and reuse it while the file is unchanged
+            (with ``streaming``, the cache is built without loading the file)
+        cache_dir: Directory of the cache (defaults to ``<json_file>.cache``);
+            a layout template like ``output_dir``
+        on_collision: What to do when images with the same file name stem
+            (e.g. ``a/001.jpg`` and ``b/001.png``) would write the same label
+            file: 'warn' and let the later image overwrite it, or 'error' to
+            raise a ``ConflictError`` (see ``COLLISION_POLICIES``)
+        images_dir: Directory of the image files (COCO ``file_name`` is relative
+            to it); their sizes are read from the file headers and replace the
+            listed ``width`` and ``height``, which may then be missing
+        size_cache: File caching the sizes read from the image files by file
+            name, mtime and file size (defaults to ``.coco2yolo_sizes.json`` in
+            ``images_dir``)
+        probe_threads: Number of threads reading image headers
+        label_cache: Also write the boxes of every output directory to a
+            ``labels.npz`` that training data loaders can load instead of
+            parsing the label files (see ``LabelCache``)
+        tile_size: Split every image into square tiles of this many pixels
+            and write one label file ``<stem>_<x>_<y>.txt`` per tile with
+            visible annotations, ``x`` and ``y`` being the tile's top left
+            corner in the image; polygons are clipped to the tiles before their
+            boxes are fit
+        tile_stride: Distance between tile origins (defaults to 80% of
+            ``tile_size``, i.e. tiles overlap by a fifth); the last tiles are
+            aligned with the image border
+        min_visible: Keep an annotation in a tile if at least this fraction
+            of its polygon area lies inside the tile
+        views: Output views to write instead of ``output_dir``, as dicts with
+            the keys of ``VIEW_OPTIONS``: 'output_dir' (a layout template like
+            ``output_dir``), a 'class_mapping' of its own, the COCO
+            'categories' to keep (numbered in the order listed unless the view
+            has a class mapping), 'min_area' to drop boxes smaller than this
+            many square pixels, and 'sample' to keep a fraction of the label
+            files chosen by a hash of their stem and 'seed'. Views without
+            'class_mapping' or 'categories' use ``class_mapping``
+        stats: ``ConversionStats`` collecting stage timings, counters and
+            warnings; pass one with a ``callback`` to follow the conversion
+        stats_json: Path to write the statistics report to as JSON
+    
     Returns:
-        List of 8 normalized corner coordinates [x1, y1, x2, y2, x3, y3, x4, y4]
+        The ``ConversionStats`` of the run
+    
+    Raises:
+        OptionError: If an option is invalid or cannot be combined with another
+        ConflictError: If files name a category ID differently, or if two
+            images would write the same label file with ``on_collision='error'``
     """
-    # Convert segmentation to numpy array
-    points = np.array(segmentation).reshape(-1, 2).astype(np.float32)
+    if multi_part not in MULTI_PART_POLICIES:
+        raise OptionError(f"Unknown multi-part policy: {multi_part}")
+    if output_backend not in OUTPUT_BACKENDS:
+        raise OptionError(f"Unknown output backend: {output_backend}")
+    if incremental and output_backend != 'files':
+        raise OptionError("incremental conversion needs the 'files' output backend")
+    if precision < 0:
+        raise OptionError(f"Precision must not be negative: {precision}")
+    if label_format not in LABEL_FORMATS:
+        raise OptionError(f"Unknown label format: {label_format}")
+    if clamp and label_format != 'corners':
+        raise OptionError("clamping applies to corner coordinates only")
+    geometry_backend = resolve_geometry_backend(geometry_backend)
+    if io_threads < 0:
+        raise OptionError(f"Number of I/O threads must not be negative: {io_threads}")
+    options = {
+        'multi_part': multi_part, 'precision': precision, 'clamp': clamp,
+        'label_format': label_format,
+        'io_threads': io_threads, 'geometry_backend': geometry_backend
+    }
+    workers = _resolve_workers(workers)
+    stats = ConversionStats() if stats is None else stats
+    if validate or drop_invalid or validation_report:
+        options['validation'] = {
+            'min_fill': min_fill, 'min_aspect': min_aspect, 'drop': drop_invalid
+        }
+        stats.validation = FitReport(**options['validation'])
+    if streaming and incremental and not cache:
+        raise OptionError(
+            "incremental conversion needs every image's annotations up front and cannot stream"
+        )
+    if on_collision not in COLLISION_POLICIES:
+        raise OptionError(f"Unknown collision policy: {on_collision}")
+    if probe_threads < 1:
+        raise OptionError(f"Number of probe threads must be positive: {probe_threads}")
+    if label_cache and incremental:
+        raise OptionError(
+            "the label cache needs every label file converted and cannot be built incrementally"
+        )
+    if tile_size is not None:
+        tile_stride = tile_size - tile_size // 5 if tile_stride is None else tile_stride
+        if tile_size < 1:
+            raise OptionError(f"Tile size must be positive: {tile_size}")
+        if not 0 < tile_stride <= tile_size:
+            raise OptionError(f"Tile stride must be between 1 and the tile size: {tile_stride}")
+        if not 0.0 <= min_visible <= 1.0:
+            raise OptionError(f"Minimum visible fraction must be between 0 and 1: {min_visible}")
+        if incremental:
+            raise OptionError("incremental conversion tracks whole images and cannot write tiles")
+        options['tiling'] = {'size': tile_size, 'stride': tile_stride, 'min_visible': min_visible}
+    elif tile_stride is not None:
+        raise OptionError("a tile stride needs a tile size")
+    if views is not None:
+        if not views:
+            raise OptionError("no output views given")
+        if incremental:
+            raise OptionError(
+                "incremental conversion tracks a single output directory and cannot write views"
+            )
     
-    # Calculate minimum area rectangle
-    rect = cv2.minAreaRect(points)
-    box_points = cv2.boxPoints(rect)
+    several = not isinstance(json_file, (str, os.PathLike))
+    json_files = [os.fspath(path) for path in json_file] if several else [os.fspath(json_file)]
+    if not json_files:
+        raise OptionError("no annotation files given")
+    output_paths = [Path(_expand_layout(output_dir, path, several)) for path in json_files]
+    labels = _LabelOwners(json_files, stats, on_collision)
+    probe = _ImageSizeProbe(images_dir, size_cache, probe_threads) if images_dir else None
+    arrays = _LabelArrays(label_format) if label_cache else None
     
-    # Normalize coordinates to [0, 1] range
-    normalized_corners = []
-    for point in box_points:
-        x_norm = point[0] / image_width
-        y_norm = point[1] / image_height
-        normalized_corners.extend([x_norm, y_norm])
+    datasets = [None] * len(json_files)
+    if cache:
+        for source, path in enumerate(json_files):
+            try:
+                with _reading(path), stats.stage('load'):
+                    datasets[source] = _CocoCache.open(
+                        path, cache_dir and _expand_layout(cache_dir, path, several), streaming
+                    )
+            except (ValueError, OSError) as e:
+                if streaming and incremental:
+                    raise
+                print(f"Warning: Converting without the annotation cache: {e}")
+    # Files parsed incrementally instead of being loaded
+    streamed = [source for source, dataset in enumerate(datasets) if streaming and dataset is None]
     
-    return normalized_corners
+    if not several and streamed and views is None:
+        output_path = output_paths[0]
+        output_path.mkdir(parents=True, exist_ok=True)
+        _discard_manifest(output_path)
+        sink = _TarShardSink(output_path, shard_bytes) if output_backend == 'tar' else None
+        print(f"Streaming annotations from {json_file}...")
+        try:
+            with _reading(json_file):
+                _convert_streaming(
+                    json_file, output_path, class_mapping, spill_dir, workers, options, sink,
+                    stats, labels=labels,
+                    probe=probe, arrays=arrays
+                )
+        finally:
+            if sink is not None:
+                sink.close()
+        if probe is not None:
+            probe.save()
+        _finish(stats, output_path, stats_json, validation_report, _save_label_cache(arrays, stats))
+        return stats
+    
+    # Load COCO annotations
+    coco_files = [None] * len(json_files)
+    for source, path in enumerate(json_files):
+        if datasets[source] is None and source not in streamed:
+            with _reading(path), stats.stage('load'), open(path, 'r') as f:
+                coco_files[source] = json.load(f)
+    
+    if probe is not None:
+        # The sizes in the image file headers replace the listed ones
+        for source, dataset in enumerate(datasets):
+            if dataset is not None:
+                dataset.image_sizes = probe.resolve(
+                    dataset.file_names(), dataset.image_sizes, stats
+                )
+            elif coco_files[source] is not None:
+                images = coco_files[source]['images']
+                listed = np.array(
+                    [(image.get('width') or 0, image.get('height') or 0) for image in images],
+                    dtype=np.int64
+                ).reshape(-1, 2)
+                sizes = probe.resolve([image['file_name'] for image in images], listed, stats)
+                for image, (image_width, image_height) in zip(images, sizes.tolist()):
+                    image['width'], image['height'] = image_width, image_height
+    
+    if (several or views is not None) and class_mapping is None:
+        # One numbering of the categories of all files (the default of every view)
+        category_lists = []
+        for source, path in enumerate(json_files):
+            if datasets[source] is not None:
+                category_lists.append([{'id': cat_id} for cat_id in datasets[source].category_ids])
+            elif coco_files[source] is not None:
+                category_lists.append(coco_files[source]['categories'])
+            else:
+                with _reading(path), stats.stage('load'):
+                    category_lists.append(read_coco_categories(path))
+        class_mapping = _merged_category_mapping(category_lists, json_files)
+    
+    written_paths = list(dict.fromkeys(output_paths))
+    if views is not None:
+        options['views'] = _resolve_views(views, class_mapping, json_files, output_paths, several)
+        # Boxes are fit once with their COCO category IDs as class IDs and mapped by each view
+        view_categories = {cat_id: cat_id for cat_id in class_mapping}
+        for view in options['views']:
+            view_categories.update((cat_id, cat_id) for cat_id in view['mapping'])
+        written_paths = list(dict.fromkeys(
+            Path(directory)
+            for view in options['views'] for directory in view['directories'].values()
+        ))
+    
+    # Create output directories
+    for output_path in written_paths:
+        output_path.mkdir(parents=True, exist_ok=True)
+        if views is not None:
+            _discard_manifest(output_path)
+    
+    manifests = {}
+    jobs = []
+    for source, path in enumerate(json_files):
+        if source in streamed:
+            continue
+        index_start = time.perf_counter()
+        output_path = output_paths[source]
+        if datasets[source] is None:
+            coco_data = coco_files[source]
+            categories = _category_mapping(coco_data, class_mapping)
+            # Group annotations by image
+            index = _AnnotationIndex(coco_data['annotations'])
+            image_annotations = _image_annotations(coco_data['images'], index, stats)
+            num_images, num_annotations = len(index), len(coco_data['annotations'])
+        else:
+            categories = datasets[source].categories(class_mapping)
+            image_annotations = datasets[source].image_annotations(stats)
+            num_images, num_annotations = len(datasets[source]), len(datasets[source].ann_ids)
+        
+        if several:
+            print(f"Processing {num_images} images from {path}...")
+        else:
+            print(f"Processing {num_images} images...")
+        
+        if incremental:
+            if output_path not in manifests:
+                manifests[output_path] = _Manifest(output_path, categories, options)
+            manifest = manifests[output_path]
+        else:
+            if views is None:
+                _discard_manifest(output_path)
+            manifest = None
+        skipped = 0
+        
+        for image_info, anns in image_annotations:
+            image_filename = Path(image_info['file_name']).stem
+            image_width = image_info.get('width') or 0
+            image_height = image_info.get('height') or 0
+            if image_width <= 0 or image_height <= 0:
+                stats.warn(
+                    'missing_size',
+                    f"Warning: Image {image_info['file_name']} has no size, skipping it"
+                )
+                continue
+            
+            # Create output file for this image
+            output_file = output_path / f"{image_filename}.txt"
+            labels.claim(output_path, image_filename, source, image_info['id'])
+            if manifest is not None and manifest.unchanged(
+                output_file, _annotation_digest(anns, image_width, image_height)
+            ):
+                skipped += 1
+                continue
+            jobs.append((output_file, anns, image_width, image_height))
+        
+        stats.add_stage('index', time.perf_counter() - index_start, num_annotations)
+        stats.skipped_count += skipped
+        if skipped:
+            print(f"Skipping {skipped} unchanged images")
+    
+    if len(manifests) > 1:
+        def on_written(output_file):
+            manifests[output_file.parent].record(output_file)
+    else:
+        on_written = next((manifest.record for manifest in manifests.values()), None)
+    
+    # Process annotations
+    if output_backend == 'tar':
+        sinks = {
+            output_path: _TarShardSink(output_path, shard_bytes) for output_path in written_paths
+        }
+        sink = _SinkRouter(sinks) if len(sinks) > 1 else sinks[written_paths[0]]
+    else:
+        sinks = {}
+        sink = None
+    # Tiles are only known once their images are split, so there is no ETA then
+    stats.begin(len(jobs) if not streamed and tile_size is None else None)
+    if views is not None:
+        categories = view_categories
+    elif several:
+        categories = class_mapping
+    writer = _open_writer(
+        categories, workers if len(jobs) > 1 or streamed else 1,
+        jobs, on_written, sink, stats, options, arrays
+    )
+    try:
+        with stats.stage('convert', len(jobs)):
+            _write_jobs(writer, jobs)
+        for source in streamed:
+            print(f"Streaming annotations from {json_files[source]}...")
+            with _reading(json_files[source]):
+                _convert_streaming(
+                    json_files[source], output_paths[source], class_mapping, spill_dir, stats=stats,
+                    writer=writer, labels=labels, source=source, probe=probe
+                )
+    finally:
+        writer.close()
+        for manifest in manifests.values():
+            manifest.close()
+        for tar_sink in sinks.values():
+            tar_sink.close()
+    
+    for output_path, manifest in manifests.items():
+        removed = manifest.commit(output_path)
+        if removed:
+            print(f"Removed {removed} label files of deleted images")
+    if probe is not None:
+        probe.save()
+    
+    _finish(
+        stats, written_paths if several or views is not None else written_paths[0], stats_json,
+        validation_report,
+        _save_label_cache(arrays, stats)
+    )
+    return stats
 
 
-def convert_coco_to_yolo_obb(
-    json_file: str, 
-    output_dir: str = "labels", 
-    class_mapping: Dict[int, int] = None
-) -> None:
+def iter_yolo_obb(
+    source,
+    class_mapping: Optional[Dict[int, int]] = None,
+    multi_part: str = 'first',
+    label_format: str = 'corners',
+    geometry_backend: str = 'auto',
+    batch_size: int = 4096,
+    cache: bool = False,
+    cache_dir: Optional[str] = None,
+    stats: Optional[ConversionStats] = None
+) -> Iterator[Tuple[Dict[str, Any], np.ndarray]]:
     """
-    Convert COCO annotations to YOLO OBB format.
+    Convert COCO annotations to YOLO OBB boxes in memory.
+    
+    Images are yielded lazily, in the same order and with the same boxes as
+    the label files ``convert_coco_to_yolo_obb`` writes; the rectangles are
+    computed in batches of about ``batch_size`` polygons. Like there, images
+    without a width or height are skipped with a ``missing_size`` warning.
     
     Args:
-        json_file: Path to COCO annotation JSON file
-        output_dir: Output directory for YOLO annotation files
+        source: Path to a COCO annotation JSON file or the loaded COCO dict
         class_mapping: Optional mapping from COCO category IDs to YOLO class IDs
+        multi_part: How annotations with several polygons are handled (see
+            ``MULTI_PART_POLICIES``)
+        label_format: Box representation (see ``LABEL_FORMATS``)
+        geometry_backend: How the rectangles are computed (see ``GEOMETRY_BACKENDS``)
+        batch_size: Number of polygons converted together
+        cache: Read a JSON ``source`` through the columnar annotation cache
+            (see ``convert_coco_to_yolo_obb``)
+        cache_dir: Directory of the cache (defaults to ``<source>.cache``)
+        stats: ``ConversionStats`` collecting stage timings and warnings
+        
+    Yields:
+        Tuple of (COCO image dict, float64 array of shape (N, 9) with the class
+        ID and the normalized corners x1 y1 ... x4 y4 of each box, or of shape
+        (N, 6) with the class ID and cx cy w h angle for 'xywha')
     """
-    # Load COCO annotations
+    if multi_part not in MULTI_PART_POLICIES:
+        raise OptionError(f"Unknown multi-part policy: {multi_part}")
+    if label_format not in LABEL_FORMATS:
+        raise OptionError(f"Unknown label format: {label_format}")
+    geometry_backend = resolve_geometry_backend(geometry_backend)
+    stats = ConversionStats() if stats is None else stats
+    if cache and not isinstance(source, dict):
+        with stats.stage('load'):
+            dataset = _CocoCache.open(source, cache_dir)
+        categories = dataset.categories(class_mapping)
+        image_annotations = dataset.image_annotations(stats)
+    else:
+        if isinstance(source, dict):
+            coco_data = source
+        else:
+            with stats.stage('load'), open(source, 'r') as f:
+                coco_data = json.load(f)
+        categories = _category_mapping(coco_data, class_mapping)
+        index = _AnnotationIndex(coco_data['annotations'])
+        image_annotations = _image_annotations(coco_data['images'], index, stats)
+    
+    batch = _BoxBatch(
+        categories, multi_part, stats, label_format, geometry_backend=geometry_backend
+    )
+    for image_info, anns in image_annotations:
+        image_width = image_info.get('width') or 0
+        image_height = image_info.get('height') or 0
+        if image_width <= 0 or image_height <= 0:
+            stats.warn(
+                'missing_size',
+                f"Warning: Image {image_info['file_name']} has no size, skipping it"
+            )
+            continue
+        batch.add(image_info, anns, image_width, image_height)
+        if len(batch) >= batch_size:
+            yield from _split_labels(*batch.convert())
+    yield from _split_labels(*batch.convert())
+
+
+def to_arrays(source, **kwargs) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+    """
+    Convert COCO annotations to one contiguous array of YOLO OBB boxes.
+    
+    Takes the arguments of ``iter_yolo_obb``.
+    
+    Returns:
+        Tuple of (COCO image dicts, float64 array of shape (N, 9) with the class
+        ID and corners of every box (or (N, 6) for 'xywha'), offsets of shape
+        (images + 1,)); the boxes of image ``i`` are ``labels[offsets[i]:offsets[i + 1]]``
+    """
+    images = []
+    chunks = []
+    for image_info, labels in iter_yolo_obb(source, **kwargs):
+        images.append(image_info)
+        chunks.append(labels)
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(labels) for labels in chunks], out=offsets[1:])
+    columns = _LABEL_COLUMNS[kwargs.get('label_format', 'corners')]
+    labels = np.concatenate(chunks) if chunks else np.empty((0, columns + 1))
+    return images, labels, offsets
+
+
+def _split_labels(keys: list, class_ids: list, corners: np.ndarray, counts: List[int]):
+    """Per-key (class ID + box) arrays of a converted ``_BoxBatch``."""
+    labels = np.empty((len(corners), corners.shape[1] + 1))
+    labels[:, 0] = class_ids
+    labels[:, 1:] = corners
+    offset = 0
+    for key, count in zip(keys, counts):
+        yield key, labels[offset:offset + count]
+        offset += count
+
+
+def _open_writer(
+    categories: Dict[int, int],
+    workers: int,
+    jobs: Optional[List[tuple]],
+    on_written: Optional[Callable[[Path], None]],
+    sink,
+    stats: ConversionStats,
+    options: Dict[str, Any],
+    arrays: Optional[_LabelArrays] = None
+):
+    """A label writer for ``jobs`` and later images, with a process pool if ``workers > 1``."""
+    if workers > 1:
+        return _ShardedWriter(
+            categories, workers, jobs, on_written=on_written, sink=sink, stats=stats,
+            arrays=arrays, **options
+        )
+    return _LabelWriter(
+        categories, on_written=on_written, sink=sink, stats=stats, arrays=arrays, **options
+    )
+
+
+def _write_jobs(writer, jobs: List[tuple]) -> None:
+    """Write the label files of all jobs (the jobs a ``_ShardedWriter`` was opened with)."""
+    if isinstance(writer, _ShardedWriter):
+        shard_size = max(1, min(1024, -(-len(jobs) // (4 * writer.workers))))
+        for start in range(0, len(jobs), shard_size):
+            writer.submit((start, min(start + shard_size, len(jobs))))
+    else:
+        for job in jobs:
+            writer.add(*job)
+    writer.flush()
+
+
+@contextlib.contextmanager
+def _reading(json_file: str):
+    """Exit with an error message if ``json_file`` is missing or not valid JSON."""
     try:
-        with open(json_file, 'r') as f:
-            coco_data = json.load(f)
+        yield
     except FileNotFoundError:
         print(f"Error: Could not find JSON file: {json_file}")
         sys.exit(1)
     except json.JSONDecodeError:
         print(f"Error: Invalid JSON file: {json_file}")
         sys.exit(1)
+
+
+def _expand_layout(template: str, json_file: str, several: bool = False) -> str:
+    """
+    Directory of one annotation file's labels (or cache) in a layout template.
     
-    # Create output directory
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+    ``{split}`` is replaced by the file name without extension and ``{parent}``
+    by the name of the file's directory; when ``several`` files are converted,
+    a template without placeholders gets a ``{split}`` subdirectory.
+    """
+    if several and '{split}' not in template and '{parent}' not in template:
+        template = os.path.join(template, '{split}')
+    path = Path(json_file)
+    return template.replace('{split}', path.stem).replace('{parent}', path.absolute().parent.name)
+
+
+def _category_mapping(
+    coco_data: Dict[str, Any], class_mapping: Optional[Dict[int, int]]
+) -> Dict[int, int]:
+    """The class mapping, or COCO category IDs numbered in order if none is given."""
+    if class_mapping is None:
+        return {cat['id']: idx for idx, cat in enumerate(coco_data['categories'])}
+    return class_mapping
+
+
+def read_coco_categories(json_file: str) -> List[Dict[str, Any]]:
+    """
+    The ``categories`` of a COCO annotation file.
     
-    # Create image lookup dictionary
-    images_dict = {img['id']: img for img in coco_data['images']}
+    The file is parsed incrementally up to the end of that array, so this is
+    cheap for files that list their categories before the annotations.
+    """
+    categories = []
+    for section, item in _iter_coco_sections(json_file):
+        if section == 'categories':
+            if item is _SECTION_END:
+                break
+            categories.append(item)
+    return categories
+
+
+def _merged_category_mapping(
+    category_lists: List[List[Dict[str, Any]]], json_files: List[str]
+) -> Dict[int, int]:
+    """
+    One class mapping for the categories of several annotation files.
     
-    # Create class mapping if not provided
-    if class_mapping is None:
-        categories = {cat['id']: idx for idx, cat in enumerate(coco_data['categories'])}
-    else:
-        categories = class_mapping
+    Category IDs are numbered in order of first appearance, so the first file
+    gets the mapping a conversion of it alone would use, and later files only
+    add the IDs it lacks. An ID named differently in two files raises a
+    ``ConflictError``, since its labels would mix two classes.
+    """
+    mapping = {}
+    names = {}
+    for json_file, categories in zip(json_files, category_lists):
+        for cat in categories:
+            mapping.setdefault(cat['id'], len(mapping))
+            if cat.get('name') is None:
+                continue
+            name, first_file = names.setdefault(cat['id'], (cat['name'], json_file))
+            if name != cat['name']:
+                raise ConflictError(
+                    f"Category ID {cat['id']} is '{name}' in {first_file} "
+                    f"but '{cat['name']}' in {json_file}; "
+                    f"pass a class mapping to convert these files together"
+                )
+    return mapping
+
+
+# Keys of an output view (see ``convert_coco_to_yolo_obb``)
+VIEW_OPTIONS = ('output_dir', 'class_mapping', 'categories', 'min_area', 'sample', 'seed')
+
+
+def _resolve_views(
+    views: List[Dict[str, Any]],
+    class_mapping: Dict[int, int],
+    json_files: List[str],
+    output_paths: List[Path],
+    several: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    The ``_View`` arguments of output views declared as in ``convert_coco_to_yolo_obb``.
     
-    # Process annotations
-    annotation_count = 0
-    file_count = 0
-    
-    # Group annotations by image
-    annotations_by_image = {}
-    for ann in coco_data['annotations']:
-        image_id = ann['image_id']
-        if image_id not in annotations_by_image:
-            annotations_by_image[image_id] = []
-        annotations_by_image[image_id].append(ann)
-    
-    print(f"Processing {len(annotations_by_image)} images...")
-    
-    for image_id, annotations in annotations_by_image.items():
-        if image_id not in images_dict:
-            print(f"Warning: Image ID {image_id} not found in images list")
-            continue
-            
-        image_info = images_dict[image_id]
-        image_filename = Path(image_info['file_name']).stem
-        image_width = image_info['width']
-        image_height = image_info['height']
-        
-        # Create output file for this image
-        output_file = output_path / f"{image_filename}.txt"
-        
-        with open(output_file, 'w') as f:
-            for ann in annotations:
-                # Skip annotations without segmentation
-                if 'segmentation' not in ann or not ann['segmentation']:
-                    continue
-                
-                category_id = ann['category_id']
-                if category_id not in categories:
-                    print(f"Warning: Category ID {category_id} not found in mapping")
-                    continue
-                
-                class_id = categories[category_id]
-                
-                # Handle multiple polygons (take the first one)
-                segmentation = ann['segmentation'][0] if isinstance(ann['segmentation'][0], list) else ann['segmentation']
-                
-                # Skip if segmentation has less than 6 points (3 vertices minimum)
-                if len(segmentation) < 6:
-                    continue
-                
-                try:
-                    # Calculate OBB corners
-                    corners = calculate_obb_corners(segmentation, image_width, image_height)
-                    
-                    # Format: class_id x1 y1 x2 y2 x3 y3 x4 y4
-                    line = f"{class_id} " + " ".join(f"{coord:.6f}" for coord in corners)
-                    f.write(line + "\n")
-                    annotation_count += 1
-                    
-                except Exception as e:
-                    print(f"Warning: Failed to process annotation {ann['id']}: {e}")
-                    continue
+    A view without a class mapping of its own uses ``class_mapping``, and one
+    with only ``categories`` numbers them in the order listed. Every output
+    directory of the conversion must map to one directory per view, and no two
+    views may share a directory.
+    """
+    resolved = []
+    owners = {}
+    for number, view in enumerate(views, 1):
+        unknown = sorted(set(view) - set(VIEW_OPTIONS))
+        if unknown:
+            raise OptionError(f"Unknown option(s) of view {number}: {', '.join(unknown)}")
+        if not view.get('output_dir'):
+            raise OptionError(f"View {number} has no output_dir")
+        # Keys of a mapping read from JSON are strings
+        mapping = {
+            int(cat_id): int(class_id)
+            for cat_id, class_id in (view.get('class_mapping') or {}).items()
+        }
+        if view.get('categories') is not None:
+            categories = [int(cat_id) for cat_id in view['categories']]
+            if view.get('class_mapping') is None:
+                mapping = {cat_id: class_id for class_id, cat_id in enumerate(categories)}
+            else:
+                mapping = {cat_id: mapping[cat_id] for cat_id in categories if cat_id in mapping}
+        elif view.get('class_mapping') is None:
+            mapping = dict(class_mapping)
+        min_area = float(view.get('min_area', 0.0))
+        if min_area < 0:
+            raise OptionError(f"Minimum area of view {number} must not be negative: {min_area}")
+        sample = float(view.get('sample', 1.0))
+        if not 0.0 < sample <= 1.0:
+            raise OptionError(f"Sample of view {number} must be in (0, 1]: {sample}")
         
-        file_count += 1
-        if file_count % 100 == 0:
-            print(f"Processed {file_count} files...")
+        directories = {}
+        for path, output_path in zip(json_files, output_paths):
+            directory = Path(_expand_layout(view['output_dir'], path, several))
+            if directories.setdefault(str(output_path), str(directory)) != str(directory):
+                raise OptionError(
+                    f"View {number} splits the labels of {output_path} over several directories; "
+                    f"use the same placeholders in output_dir and the view's output_dir"
+                )
+            owner = owners.setdefault(directory, number)
+            if owner != number:
+                raise OptionError(f"Views {owner} and {number} both write to {directory}")
+        resolved.append({
+            'directories': directories, 'mapping': mapping, 'min_area': min_area, 'sample': sample,
+            'seed': int(view.get('seed', 0))
+        })
+    return resolved
+
+
+# What to do when two images would write the same label file
+COLLISION_POLICIES = ('warn', 'error')
+
+
+class ConflictError(ValueError):
+    """Annotation files or images whose labels cannot be written together."""
+
+
+class _LabelOwners:
+    """
+    The image each label file is written for.
+    
+    Label files are named after the file name stem of their image, so images
+    like ``a/001.jpg`` and ``b/001.png`` (or two splits sharing an output
+    directory) would write the same file, and the later one would silently
+    replace the labels of the earlier one.
+    """
+    
+    def __init__(self, json_files: List[str], stats: ConversionStats, on_collision: str = 'warn'):
+        self.json_files = json_files
+        self.stats = stats
+        self.on_collision = on_collision
+        self._owners = {}
+    
+    def claim(self, output_path: Path, stem: str, source: int, image_id) -> None:
+        """Record that image ``image_id`` of file ``source`` writes ``stem`` to ``output_path``."""
+        owner = (source, image_id)
+        previous = self._owners.setdefault((output_path, stem), owner)
+        if previous == owner:
+            return
+        self._owners[output_path, stem] = owner
+        output_file = output_path / f"{stem}.txt"
+        message = (
+            f"Image {self._describe(owner)} overwrites the label file {output_file} "
+            f"of image {self._describe(previous)}"
+        )
+        if self.on_collision == 'error':
+            raise ConflictError(message)
+        self.stats.warn('stem_collision', f"Warning: {message}")
+    
+    def _describe(self, owner: Tuple[int, Any]) -> str:
+        source, image_id = owner
+        if len(self.json_files) > 1:
+            return f"{image_id} of {self.json_files[source]}"
+        return str(image_id)
+
+
+class _AnnotationIndex:
+    """
+    Annotations grouped by image in order of first appearance, as a CSR index.
+    
+    Instead of a list per image, one stable sort of the annotations' image IDs
+    gives ``order``, the annotation indices grouped by image, and ``offsets``,
+    where each image's group starts in it. ``order`` is None when the
+    annotations are already grouped by image.
+    """
     
-    print(f"\nConversion completed!")
-    print(f"- Processed {file_count} images")
-    print(f"- Generated {annotation_count} annotations")
-    print(f"- Output saved to: {output_path.absolute()}")
+    __slots__ = ('annotations', 'image_ids', 'order', 'offsets')
+    
+    def __init__(self, annotations: List[Dict[str, Any]]):
+        self.annotations = annotations
+        keys = _as_int64(map(operator.itemgetter('image_id'), annotations))
+        if keys is None:
+            # Other hashable IDs: number them in order of first appearance
+            ranks = {}
+            keys = np.array(
+                [ranks.setdefault(ann['image_id'], len(ranks)) for ann in annotations],
+                dtype=np.int64
+            )
+            _, self.order, self.offsets = _first_appearance_groups(keys)
+            self.image_ids = list(ranks)
+        else:
+            self.image_ids, self.order, self.offsets = _first_appearance_groups(keys)
+    
+    def __len__(self) -> int:
+        """Number of annotated images."""
+        return len(self.offsets) - 1
+
+
+class _AnnotationSlice:
+    """The annotations of one image in an ``_AnnotationIndex``, looked up when iterated."""
+    
+    __slots__ = ('index', 'start', 'stop')
+    
+    def __init__(self, index: _AnnotationIndex, start: int, stop: int):
+        self.index = index
+        self.start = start
+        self.stop = stop
+    
+    def __len__(self) -> int:
+        return self.stop - self.start
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        annotations, order = self.index.annotations, self.index.order
+        if order is None:
+            return iter(annotations[self.start:self.stop])
+        return map(annotations.__getitem__, order[self.start:self.stop].tolist())
+
+
+def _image_annotations(
+    images: List[Dict[str, Any]],
+    index: _AnnotationIndex,
+    stats: ConversionStats
+) -> Iterator[Tuple[Dict[str, Any], _AnnotationSlice]]:
+    """(image dict, annotations) of every annotated image, warning about unknown image IDs."""
+    image_keys = _as_int64(map(operator.itemgetter('id'), images))
+    if image_keys is not None and isinstance(index.image_ids, np.ndarray):
+        rows = _lookup_rows(image_keys, index.image_ids).tolist()
+    else:
+        image_rows = {img['id']: row for row, img in enumerate(images)}
+        rows = [image_rows.get(image_id, -1) for image_id in index.image_ids]
+    
+    offsets = index.offsets.tolist()
+    for group, (row, start, stop) in enumerate(zip(rows, offsets, offsets[1:])):
+        if row < 0:
+            stats.warn(
+                'missing_image',
+                f"Warning: Image ID {index.image_ids[group]} not found in images list"
+            )
+            continue
+        yield images[row], _AnnotationSlice(index, start, stop)
+
+
+def _discard_manifest(output_path: Path) -> None:
+    """Forget incremental state once a full run may have changed the label files."""
+    for name in (_Manifest.FILE_NAME, _Manifest.JOURNAL_NAME):
+        try:
+            os.remove(output_path / name)
+        except FileNotFoundError:
+            pass
+
+
+def _save_label_cache(arrays: Optional[_LabelArrays], stats: ConversionStats) -> List[Path]:
+    """Write the label caches of a conversion, if requested."""
+    if arrays is None:
+        return []
+    with stats.stage('label_cache', sum(arrays.counts)):
+        return arrays.save()
+
+
+def _finish(
+    stats: ConversionStats,
+    output_path,
+    stats_json: Optional[str] = None,
+    validation_report: Optional[str] = None,
+    label_caches: List[Path] = ()
+) -> None:
+    """Print the summary of a conversion into ``output_path`` (a directory or a list of them)."""
+    stats.finish()
+    report = stats.as_dict()
+    print("\nConversion completed!")
+    print(f"- Processed {stats.file_count} images")
+    print(f"- Generated {stats.annotation_count} annotations")
+    if stats.warnings:
+        counts = ", ".join(
+            f"{count} {kind.replace('_', ' ')}" for kind, count in stats.warnings.items()
+        )
+        print(f"- Warnings: {counts}")
+    print(f"- Time: {report['elapsed_seconds']:.2f}s ({report['files_per_second']:.0f} files/s)")
+    if stats.validation is not None:
+        summary = stats.validation.summary()
+        issues = ", ".join(
+            f"{count} {name.replace('_', ' ')}"
+            for name, count in summary['issues'].items() if count
+        )
+        line = f"- Validation: {summary['flagged']} of {summary['checked']} boxes flagged"
+        if issues:
+            line += f" ({issues})"
+        if summary['dropped']:
+            line += f", {summary['dropped']} dropped"
+        print(line)
+    for path in output_path if isinstance(output_path, list) else [output_path]:
+        print(f"- Output saved to: {path.absolute()}")
+    for path in label_caches:
+        print(f"- Label cache written to: {path.absolute()}")
+    if stats_json:
+        stats.write_json(stats_json)
+        print(f"- Statistics written to: {Path(stats_json).absolute()}")
+    if validation_report and stats.validation is not None:
+        stats.validation.write_json(validation_report)
+        print(f"- Validation report written to: {Path(validation_report).absolute()}")
 
 
 def main():
@@ -173,18 +4714,38 @@ Examples:
   %(prog)s annotations.json
   %(prog)s annotations.json --output-dir yolo_labels
   %(prog)s annotations.json --output-dir labels --class-mapping 1:0 2:1 3:2
+  %(prog)s huge_annotations.json --streaming
+  %(prog)s annotations.json --workers 8
+  %(prog)s train.json val.json test.json --output-dir "dataset/{split}/labels"
+  %(prog)s annotations.json --incremental
+  %(prog)s annotations.json --cache
+  %(prog)s annotations.json --images-dir images
+  %(prog)s annotations.json --output-backend tar
+  %(prog)s annotations.json --label-cache
+  %(prog)s aerial.json --tile-size 1024 --tile-stride 824
+  %(prog)s annotations.json --views views.json
+  %(prog)s annotations.json --stats-json stats.json
+  %(prog)s annotations.json --format xywha
+  %(prog)s annotations.json --geometry-backend opencv
+  %(prog)s annotations.json --validate --validation-report fit.json
+  %(prog)s --unpack-shards labels --output-dir labels_txt
+  %(prog)s --convert-labels labels_xywha --format corners --output-dir labels
         """
     )
     
     parser.add_argument(
         'json_file',
-        help='Path to COCO annotation JSON file'
+        nargs='*',
+        help='Path to COCO annotation JSON file; several files (e.g. train.json val.json) are '
+             'converted as one job with one class mapping'
     )
     
     parser.add_argument(
         '--output-dir', '-o',
         default='labels',
-        help='Output directory for YOLO annotation files (default: labels)'
+        help='Output directory for YOLO annotation files; {split} and {parent} are replaced by the '
+             'name and the directory name of the annotation file, and with several files a '
+             'directory without them gets one subdirectory per file (default: labels)'
     )
     
     parser.add_argument(
@@ -192,6 +4753,239 @@ Examples:
         help='Class mapping in format "coco_id:yolo_id coco_id:yolo_id" (optional)'
     )
     
+    parser.add_argument(
+        '--multi-part',
+        choices=MULTI_PART_POLICIES,
+        default='first',
+        help='How to handle annotations with several polygons: keep the first part, '
+             'fit one box around all parts (union), or keep the largest part (default: first)'
+    )
+    
+    parser.add_argument(
+        '--precision',
+        type=int,
+        default=6,
+        help='Number of decimals per coordinate (default: 6)'
+    )
+    
+    parser.add_argument(
+        '--clamp',
+        action='store_true',
+        help='Clip corner coordinates to [0, 1]'
+    )
+    
+    parser.add_argument(
+        '--format',
+        dest='label_format',
+        choices=LABEL_FORMATS,
+        default='corners',
+        help='Write each box as its 4 corners, or as center, size and angle (xywha) '
+             '(default: corners)'
+    )
+    
+    parser.add_argument(
+        '--geometry-backend',
+        choices=GEOMETRY_BACKENDS,
+        default='auto',
+        help='Compute the boxes with vectorized NumPy code (no OpenCV needed), or with '
+             'cv2.minAreaRect per polygon; auto uses OpenCV when it is installed (default: auto)'
+    )
+    
+    parser.add_argument(
+        '--validate',
+        action='store_true',
+        help='Check how well every box fits its polygon (fill ratio/IoU, degenerate, thin and '
+             'self-intersecting shapes) and summarize the results'
+    )
+    
+    parser.add_argument(
+        '--min-fill',
+        type=float,
+        default=0.25,
+        help='With --validate, flag boxes whose polygon covers less than this fraction of the '
+             'box (default: 0.25)'
+    )
+    
+    parser.add_argument(
+        '--min-aspect',
+        type=float,
+        default=0.02,
+        help='With --validate, flag boxes whose short side is below this fraction of the long '
+             'side (default: 0.02)'
+    )
+    
+    parser.add_argument(
+        '--drop-invalid',
+        action='store_true',
+        help='Leave boxes flagged by validation out of the label files (implies --validate)'
+    )
+    
+    parser.add_argument(
+        '--validation-report',
+        metavar='FILE',
+        help='Write the validation summary and the flagged boxes to FILE as JSON '
+             '(implies --validate)'
+    )
+    
+    parser.add_argument(
+        '--tile-size',
+        type=int,
+        metavar='PIXELS',
+        help='Split every image into square tiles of PIXELS and write one label file '
+             '<stem>_<x>_<y>.txt per tile, clipping the polygons to each tile'
+    )
+    
+    parser.add_argument(
+        '--tile-stride',
+        type=int,
+        metavar='PIXELS',
+        help='Distance between tile origins (default: 80%% of --tile-size)'
+    )
+    
+    parser.add_argument(
+        '--min-visible',
+        type=float,
+        default=0.5,
+        help='Keep an annotation in a tile if at least this fraction of its area is inside it '
+             '(default: 0.5)'
+    )
+    
+    parser.add_argument(
+        '--views',
+        metavar='FILE',
+        help='JSON file declaring several output views written from one pass instead of '
+             '--output-dir: a list (or {"views": [...]}) of objects with output_dir and '
+             'optionally class_mapping, categories, min_area, sample and seed'
+    )
+    
+    parser.add_argument(
+        '--output-backend',
+        choices=OUTPUT_BACKENDS,
+        default='files',
+        help='Write one .txt file per image (files) or size-bounded tar shards with an index (tar)'
+    )
+    
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=256,
+        help='Maximum size of a tar shard in MB (default: 256)'
+    )
+    
+    parser.add_argument(
+        '--label-cache',
+        action='store_true',
+        help='Also write the boxes of all label files to labels.npz for training data loaders'
+    )
+    
+    parser.add_argument(
+        '--unpack-shards',
+        metavar='SHARD_DIR',
+        help='Unpack tar label shards from SHARD_DIR into --output-dir and exit'
+    )
+    
+    parser.add_argument(
+        '--convert-labels',
+        metavar='LABEL_DIR',
+        help='Convert the label files in LABEL_DIR to --format, write them to --output-dir and exit'
+    )
+    
+    parser.add_argument(
+        '--image-size',
+        nargs=2,
+        type=float,
+        metavar=('WIDTH', 'HEIGHT'),
+        help='Image size shared by all labels of --convert-labels '
+             '(default: convert in normalized space)'
+    )
+    
+    parser.add_argument(
+        '--images-dir',
+        metavar='DIR',
+        help='Read the image sizes from the headers of the image files in DIR instead of trusting '
+             'the width and height in the JSON'
+    )
+    
+    parser.add_argument(
+        '--size-cache',
+        metavar='FILE',
+        help='Cache of the image sizes read with --images-dir (default: DIR/.coco2yolo_sizes.json)'
+    )
+    
+    parser.add_argument(
+        '--probe-threads',
+        type=int,
+        default=16,
+        help='Number of threads reading image headers (default: 16)'
+    )
+    
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        help='Parse the JSON incrementally to bound memory use on very large files'
+    )
+    
+    parser.add_argument(
+        '--spill-dir',
+        help='Directory for temporary spill files in streaming mode (default: system temp)'
+    )
+    
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='Keep a memory-mapped columnar cache of the parsed annotations next to the JSON '
+             'file and reuse it while the file is unchanged'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        help='Directory of the annotation cache, a template like --output-dir '
+             '(default: <json_file>.cache; implies --cache)'
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only rewrite label files whose annotations changed since the last incremental run'
+    )
+    
+    parser.add_argument(
+        '--workers', '-j',
+        type=int,
+        default=1,
+        help='Number of worker processes (default: 1, 0 = one per CPU core)'
+    )
+    
+    parser.add_argument(
+        '--io-threads',
+        type=int,
+        default=4,
+        help='Number of threads writing label files (per worker) while boxes are computed; '
+             '0 writes each file directly (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--stats-json',
+        metavar='FILE',
+        help='Write per-stage timings, counters and warning counts to FILE as JSON'
+    )
+    
+    parser.add_argument(
+        '--on-collision',
+        choices=COLLISION_POLICIES,
+        default='warn',
+        help='When images with the same file name stem would write the same label file: '
+             'warn (the later image wins) or stop with an error (default: warn)'
+    )
+    
+    parser.add_argument(
+        '--max-warnings',
+        type=int,
+        default=10,
+        help='Print at most this many warnings of each kind; the rest are only counted '
+             '(default: 10)'
+    )
+    
     parser.add_argument(
         '--version',
         action='version',
@@ -199,6 +4993,27 @@ Examples:
     )
     
     args = parser.parse_args()
+    if args.unpack_shards:
+        count = unpack_label_shards(args.unpack_shards, args.output_dir)
+        print(f"Unpacked {count} label files to {Path(args.output_dir).absolute()}")
+        return
+    # NumPy (and OpenCV for its backend) are imported on first use; report them missing up front
+    try:
+        np.ndarray
+        if args.geometry_backend == 'opencv':
+            cv2.minAreaRect
+    except ImportError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.convert_labels:
+        count = convert_label_files(
+            args.convert_labels, args.output_dir, args.label_format,
+            workers=args.workers, precision=args.precision, image_size=args.image_size
+        )
+        print(f"Converted {count} label files to {Path(args.output_dir).absolute()}")
+        return
+    if not args.json_file:
+        parser.error("the following arguments are required: json_file")
     
     # Parse class mapping if provided
     class_mapping = None
@@ -212,9 +5027,48 @@ Examples:
             print("Error: Invalid class mapping format. Use 'coco_id:yolo_id coco_id:yolo_id'")
             sys.exit(1)
     
+    views = None
+    if args.views:
+        try:
+            with open(args.views, 'r') as f:
+                views = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Cannot read the views from {args.views}: {e}")
+            sys.exit(1)
+        views = views.get('views') if isinstance(views, dict) else views
+        if not isinstance(views, list) or not all(isinstance(view, dict) for view in views):
+            print(
+                f"Error: {args.views} must hold a list of views "
+                f"(or an object with one under 'views')"
+            )
+            sys.exit(1)
+    
     # Run conversion
-    convert_coco_to_yolo_obb(args.json_file, args.output_dir, class_mapping)
+    try:
+        convert_coco_to_yolo_obb(
+            args.json_file[0] if len(args.json_file) == 1 else args.json_file,
+            args.output_dir, class_mapping,
+            streaming=args.streaming, spill_dir=args.spill_dir, workers=args.workers,
+            incremental=args.incremental, multi_part=args.multi_part,
+            output_backend=args.output_backend, shard_bytes=args.shard_size << 20,
+            precision=args.precision, clamp=args.clamp, label_format=args.label_format,
+            validate=args.validate, min_fill=args.min_fill, min_aspect=args.min_aspect,
+            drop_invalid=args.drop_invalid, validation_report=args.validation_report,
+            geometry_backend=args.geometry_backend, io_threads=args.io_threads,
+            cache=args.cache or args.cache_dir is not None,
+            cache_dir=args.cache_dir, on_collision=args.on_collision, images_dir=args.images_dir,
+            size_cache=args.size_cache, probe_threads=args.probe_threads,
+            label_cache=args.label_cache,
+            tile_size=args.tile_size, tile_stride=args.tile_stride, min_visible=args.min_visible,
+            views=views,
+            stats=ConversionStats(max_printed_warnings=args.max_warnings),
+            stats_json=args.stats_json
+        )
+    except (OptionError, ConflictError) as e:
+        # Invalid options and clashing inputs; anything else is a bug and keeps its traceback
+        print(f"Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
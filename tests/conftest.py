@@ -0,0 +1,122 @@
+"""Shared fixtures: a small synthetic COCO dataset and helpers to compare label outputs."""
+
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmark import encode_rle_counts  # noqa: E402
+from coco2yolo_obb import convert_coco_to_yolo_obb  # noqa: E402
+
+
+def mask_to_counts(mask: np.ndarray) -> list:
+    """COCO RLE run lengths of a binary mask (column-major, starting with background)."""
+    flat = np.asarray(mask, dtype=np.uint8).ravel(order='F')
+    changes = np.flatnonzero(np.diff(flat)) + 1
+    bounds = np.concatenate(([0], changes, [len(flat)]))
+    counts = np.diff(bounds).tolist()
+    if flat[0]:
+        counts.insert(0, 0)
+    return counts
+
+
+def random_mask(rng: np.random.Generator, height: int, width: int) -> np.ndarray:
+    """A rotated elliptical blob with a few holes punched in it."""
+    rows, columns = np.mgrid[:height, :width]
+    cy, cx = rng.uniform(0.3, 0.7) * height, rng.uniform(0.3, 0.7) * width
+    ry, rx = rng.uniform(0.1, 0.3) * height, rng.uniform(0.1, 0.3) * width
+    angle = rng.uniform(0, np.pi)
+    u = (columns - cx) * np.cos(angle) + (rows - cy) * np.sin(angle)
+    v = (rows - cy) * np.cos(angle) - (columns - cx) * np.sin(angle)
+    mask = (u / rx) ** 2 + (v / ry) ** 2 <= 1
+    return mask & (rng.random((height, width)) > 0.05)
+
+
+def random_polygon(rng: random.Random, cx: float, cy: float, radius: float) -> list:
+    """A simple (star-shaped) polygon around (cx, cy)."""
+    angles = sorted(rng.uniform(0, 2 * np.pi) for _ in range(rng.randint(3, 16)))
+    polygon = []
+    for angle in angles:
+        distance = radius * rng.uniform(0.4, 1.0)
+        polygon.extend([cx + distance * np.cos(angle), cy + distance * np.sin(angle)])
+    return [round(value, 2) for value in polygon]
+
+
+def make_coco(num_images: int = 24, annotations_per_image: int = 6, seed: int = 0) -> dict:
+    """
+    A COCO dataset with single- and multi-part polygons and RLE masks (as run
+    lengths and as compressed strings), its annotations in shuffled order so
+    streaming conversion has to spill.
+    """
+    rng = random.Random(seed)
+    mask_rng = np.random.default_rng(seed)
+    images, annotations = [], []
+    for image_id in range(1, num_images + 1):
+        width, height = rng.choice([(320, 240), (400, 300), (97, 61)])
+        images.append({
+            'id': image_id, 'file_name': f"image_{image_id:04d}.jpg",
+            'width': width, 'height': height
+        })
+        for _ in range(annotations_per_image):
+            ann = {
+                'id': len(annotations) + 1, 'image_id': image_id,
+                'category_id': rng.choice([1, 2, 5]), 'iscrowd': 0
+            }
+            kind = rng.random()
+            if kind < 0.15:
+                counts = mask_to_counts(random_mask(mask_rng, height, width))
+                ann['iscrowd'] = 1
+                ann['segmentation'] = {
+                    'size': [height, width],
+                    'counts': encode_rle_counts(counts) if rng.random() < 0.5 else counts
+                }
+            else:
+                parts = 2 if kind < 0.3 else 1
+                ann['segmentation'] = [
+                    random_polygon(
+                        rng, rng.uniform(0, width), rng.uniform(0, height),
+                        rng.uniform(5, 0.4 * min(width, height))
+                    )
+                    for _ in range(parts)
+                ]
+            annotations.append(ann)
+    rng.shuffle(annotations)
+    categories = [{'id': cat_id, 'name': f"class_{cat_id}"} for cat_id in (1, 2, 5)]
+    return {'images': images, 'categories': categories, 'annotations': annotations}
+
+
+def read_labels(directory) -> dict:
+    """Every ``.txt`` label file below ``directory`` by relative path."""
+    root = Path(directory)
+    return {
+        path.relative_to(root).as_posix(): path.read_text()
+        for path in sorted(root.rglob('*.txt'))
+    }
+
+
+@pytest.fixture
+def coco_data():
+    return make_coco()
+
+
+@pytest.fixture
+def coco_file(tmp_path, coco_data):
+    path = tmp_path / 'annotations.json'
+    path.write_text(json.dumps(coco_data))
+    return str(path)
+
+
+@pytest.fixture
+def expected(tmp_path, coco_file):
+    """Labels of a plain in-memory conversion of ``coco_file``."""
+    output_dir = tmp_path / 'expected'
+    convert_coco_to_yolo_obb(coco_file, str(output_dir))
+    labels = read_labels(output_dir)
+    assert labels
+    return labels
@@ -0,0 +1,36 @@
+"""The annotation cache yields the same label files as the JSON file it was built from."""
+
+import json
+
+import pytest
+
+from coco2yolo_obb import convert_coco_to_yolo_obb
+from conftest import read_labels
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_cache_matches_json(tmp_path, coco_file, expected, streaming):
+    cache_dir = tmp_path / 'cache'
+    # The first run builds the cache, the second reads it
+    for run in range(2):
+        output_dir = tmp_path / f"cached_{run}"
+        convert_coco_to_yolo_obb(
+            coco_file, str(output_dir), streaming=streaming, cache=True, cache_dir=str(cache_dir)
+        )
+        assert read_labels(output_dir) == expected
+    assert any(cache_dir.iterdir())
+
+
+def test_cache_is_rebuilt_when_the_file_changes(tmp_path, coco_data, coco_file):
+    cache_dir = tmp_path / 'cache'
+    convert_coco_to_yolo_obb(
+        coco_file, str(tmp_path / 'before'), cache=True, cache_dir=str(cache_dir)
+    )
+    coco_data['images'] = coco_data['images'][::2]
+    with open(coco_file, 'w') as f:
+        json.dump(coco_data, f)
+    output_dir = tmp_path / 'after'
+    convert_coco_to_yolo_obb(coco_file, str(output_dir), cache=True, cache_dir=str(cache_dir))
+    expected_dir = tmp_path / 'expected'
+    convert_coco_to_yolo_obb(coco_file, str(expected_dir))
+    assert read_labels(output_dir) == read_labels(expected_dir)
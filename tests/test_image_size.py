@@ -0,0 +1,83 @@
+"""Image sizes read from file headers, and conversion with sizes taken from the image files."""
+
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from coco2yolo_obb import ConversionStats, convert_coco_to_yolo_obb, read_image_size
+from conftest import read_labels
+
+
+def png_header(width: int, height: int) -> bytes:
+    """The signature and IHDR chunk of a PNG file; no pixels are needed to read its size."""
+    return (
+        b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR'
+        + struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00' + b'\x00' * 4
+    )
+
+
+@pytest.mark.parametrize('extension', ['.png', '.jpg', '.bmp', '.webp'])
+def test_encoded_images(tmp_path, extension):
+    cv2 = pytest.importorskip('cv2')
+    path = tmp_path / f"image{extension}"
+    assert cv2.imwrite(str(path), np.zeros((23, 37, 3), dtype=np.uint8))
+    assert read_image_size(path) == (37, 23)
+
+
+def test_handwritten_headers(tmp_path):
+    headers = {
+        'a.png': png_header(640, 480),
+        'b.gif': b'GIF89a' + struct.pack('<HH', 33, 17) + b'\x00' * 8,
+        # A bottom-up Windows bitmap and a top-down one with a negative height
+        'c.bmp': b'BM' + b'\x00' * 12 + struct.pack('<Iii', 40, 21, 13) + b'\x00' * 8,
+        'd.bmp': b'BM' + b'\x00' * 12 + struct.pack('<Iii', 40, 21, -13) + b'\x00' * 8,
+    }
+    for name, header in headers.items():
+        (tmp_path / name).write_bytes(header)
+    assert read_image_size(tmp_path / 'a.png') == (640, 480)
+    assert read_image_size(tmp_path / 'b.gif') == (33, 17)
+    assert read_image_size(tmp_path / 'c.bmp') == (21, 13)
+    assert read_image_size(tmp_path / 'd.bmp') == (21, 13)
+
+
+@pytest.mark.parametrize('data', [b'', b'not an image', png_header(1, 1)[:20], b'\xff\xd8\xff'])
+def test_unreadable_headers_raise(tmp_path, data):
+    path = tmp_path / 'broken.jpg'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        read_image_size(path)
+
+
+def test_sizes_from_image_files(tmp_path, coco_data, expected):
+    images_dir = tmp_path / 'images'
+    images_dir.mkdir()
+    images = coco_data['images']
+    for image in images[1:]:
+        (images_dir / image['file_name']).write_bytes(png_header(image['width'], image['height']))
+    # The first image has no file and keeps its listed size; the others have
+    # a missing or a wrong size listed
+    for image in images[1::2]:
+        del image['width'], image['height']
+    for image in images[2::2]:
+        image['width'] += 1
+    coco_file = tmp_path / 'unsized.json'
+    coco_file.write_text(json.dumps(coco_data))
+
+    output_dir = tmp_path / 'labels'
+    stats = ConversionStats()
+    convert_coco_to_yolo_obb(
+        str(coco_file), str(output_dir), images_dir=str(images_dir), probe_threads=2, stats=stats
+    )
+    assert read_labels(output_dir) == expected
+    assert stats.warnings['unreadable_image'] == 1
+    assert stats.warnings['size_mismatch'] == len(images[2::2])
+
+    # The sizes are cached by file name, so the next run only stats the files
+    cache = json.loads((images_dir / '.coco2yolo_sizes.json').read_text())
+    assert sorted(cache['images']) == sorted(image['file_name'] for image in images[1:])
+    convert_coco_to_yolo_obb(
+        str(coco_file), str(tmp_path / 'cached'), images_dir=str(images_dir), streaming=True
+    )
+    assert read_labels(tmp_path / 'cached') == expected
@@ -0,0 +1,72 @@
+"""Incremental conversion rewrites only changed label files and resumes interrupted runs."""
+
+import json
+
+import pytest
+
+import coco2yolo_obb
+from coco2yolo_obb import convert_coco_to_yolo_obb
+from conftest import read_labels
+
+
+def test_unchanged_images_are_skipped(tmp_path, coco_file, expected):
+    output_dir = tmp_path / 'labels'
+    convert_coco_to_yolo_obb(coco_file, str(output_dir), incremental=True)
+    stats = convert_coco_to_yolo_obb(coco_file, str(output_dir), incremental=True)
+    assert stats.skipped_count == len(expected)
+    assert read_labels(output_dir) == expected
+
+
+def test_changed_and_deleted_images(tmp_path, coco_data, coco_file):
+    output_dir = tmp_path / 'labels'
+    convert_coco_to_yolo_obb(coco_file, str(output_dir), incremental=True)
+
+    # Move every annotation of the first image to the second and drop the third image
+    first, second, third = (image['id'] for image in coco_data['images'][:3])
+    for ann in coco_data['annotations']:
+        if ann['image_id'] == first:
+            ann['image_id'] = second
+    coco_data['images'] = [image for image in coco_data['images'] if image['id'] != third]
+    coco_data['annotations'] = [ann for ann in coco_data['annotations'] if ann['image_id'] != third]
+    changed_file = tmp_path / 'changed.json'
+    changed_file.write_text(json.dumps(coco_data))
+
+    stats = convert_coco_to_yolo_obb(str(changed_file), str(output_dir), incremental=True)
+    # An image without annotations still gets an (empty) label file
+    assert stats.skipped_count == len(coco_data['images']) - 2
+    expected_dir = tmp_path / 'expected'
+    convert_coco_to_yolo_obb(str(changed_file), str(expected_dir))
+    assert read_labels(output_dir) == read_labels(expected_dir)
+
+
+def test_changed_settings_rewrite_everything(tmp_path, coco_file):
+    output_dir = tmp_path / 'labels'
+    convert_coco_to_yolo_obb(coco_file, str(output_dir), incremental=True)
+    stats = convert_coco_to_yolo_obb(coco_file, str(output_dir), incremental=True, precision=4)
+    assert stats.skipped_count == 0
+    expected_dir = tmp_path / 'expected'
+    convert_coco_to_yolo_obb(coco_file, str(expected_dir), precision=4)
+    assert read_labels(output_dir) == read_labels(expected_dir)
+
+
+def test_interrupted_run_resumes(tmp_path, coco_file, expected, monkeypatch, capsys):
+    output_dir = tmp_path / 'labels'
+
+    def interrupted(self, output_path):
+        self.close()
+        raise KeyboardInterrupt
+
+    # Every label file is written and journaled, but the manifest is never saved
+    with monkeypatch.context() as patch:
+        patch.setattr(coco2yolo_obb._Manifest, 'commit', interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            convert_coco_to_yolo_obb(coco_file, str(output_dir), incremental=True)
+    assert not (output_dir / coco2yolo_obb._Manifest.FILE_NAME).exists()
+    capsys.readouterr()
+
+    stats = convert_coco_to_yolo_obb(coco_file, str(output_dir), incremental=True)
+    assert f"({len(expected)} files already written)" in capsys.readouterr().out
+    assert stats.skipped_count == len(expected)
+    assert read_labels(output_dir) == expected
+    assert (output_dir / coco2yolo_obb._Manifest.FILE_NAME).exists()
+    assert not (output_dir / coco2yolo_obb._Manifest.JOURNAL_NAME).exists()
@@ -0,0 +1,52 @@
+"""The training label cache holds the same boxes as the label files written with it."""
+
+import numpy as np
+import pytest
+
+from coco2yolo_obb import LabelCache, convert_coco_to_yolo_obb
+from conftest import read_labels
+
+
+def check_cache(output_dir, coco_data, label_format='corners') -> LabelCache:
+    cache = LabelCache(str(output_dir))
+    labels = read_labels(output_dir)
+    assert sorted(f"{stem}.txt" for stem in cache) == sorted(labels)
+    assert cache.label_format == label_format
+    sizes = {
+        image['file_name'].rsplit('.', 1)[0]: (image['width'], image['height'])
+        for image in coco_data['images']
+    }
+    for name, text in labels.items():
+        stem = name[:-len('.txt')]
+        size, class_ids, boxes = cache.read(stem)
+        assert size == sizes[stem]
+        lines = [line.split() for line in text.splitlines()]
+        assert class_ids.tolist() == [int(line[0]) for line in lines]
+        np.testing.assert_array_equal(
+            boxes, np.array([line[1:] for line in lines], dtype=np.float32).reshape(boxes.shape)
+        )
+    return cache
+
+
+@pytest.mark.parametrize('label_format', ['corners', 'xywha'])
+def test_cache_matches_label_files(tmp_path, coco_data, coco_file, label_format):
+    output_dir = tmp_path / 'labels'
+    convert_coco_to_yolo_obb(
+        coco_file, str(output_dir), label_cache=True, label_format=label_format
+    )
+    check_cache(output_dir, coco_data, label_format)
+
+
+def test_cache_hash_follows_the_labels(tmp_path, coco_data, coco_file):
+    plain_dir, parallel_dir = tmp_path / 'plain', tmp_path / 'parallel'
+    convert_coco_to_yolo_obb(coco_file, str(plain_dir), label_cache=True)
+    convert_coco_to_yolo_obb(
+        coco_file, str(parallel_dir), label_cache=True, workers=2, streaming=True
+    )
+    plain = check_cache(plain_dir, coco_data)
+    # Labels are hashed by content, whatever order the images were converted in
+    assert check_cache(parallel_dir, coco_data).hash == plain.hash
+
+    rounded_dir = tmp_path / 'rounded'
+    convert_coco_to_yolo_obb(coco_file, str(rounded_dir), label_cache=True, precision=3)
+    assert check_cache(rounded_dir, coco_data).hash != plain.hash
@@ -0,0 +1,99 @@
+"""RLE mask boxes agree with OpenCV's minimum-area rectangle of the mask pixels."""
+
+import json
+
+import numpy as np
+import pytest
+
+from coco2yolo_obb import convert_coco_to_yolo_obb, rle_to_polygon_points
+from benchmark import encode_rle_counts
+from conftest import mask_to_counts, random_mask, read_labels
+
+cv2 = pytest.importorskip('cv2')
+
+
+def mask_pixels(mask: np.ndarray) -> np.ndarray:
+    rows, columns = np.nonzero(mask)
+    return np.stack([columns, rows], axis=1).astype(np.float32)
+
+
+def pixel_box(mask: np.ndarray) -> np.ndarray:
+    """Corners of OpenCV's minimum-area rectangle of every foreground pixel, normalized."""
+    corners = cv2.boxPoints(cv2.minAreaRect(mask_pixels(mask)))
+    return corners / [mask.shape[1], mask.shape[0]]
+
+
+def box_area(corners: np.ndarray) -> float:
+    return float(np.linalg.norm(corners[1] - corners[0]) * np.linalg.norm(corners[2] - corners[1]))
+
+
+def contains(corners: np.ndarray, points: np.ndarray, tolerance: float = 1e-3) -> bool:
+    """Whether the points lie inside the (convex) box, with a little slack for rounding."""
+    edges = np.roll(corners, -1, axis=0) - corners
+    offsets = points[:, None, :] - corners[None, :, :]
+    cross = edges[None, :, 0] * offsets[..., 1] - edges[None, :, 1] * offsets[..., 0]
+    distance = cross / np.linalg.norm(edges, axis=1)[None, :]
+    # Inside a convex polygon, a point is on the same side of every edge
+    inside = (distance <= tolerance).all(axis=1) | (distance >= -tolerance).all(axis=1)
+    return bool(inside.all())
+
+
+def same_corners(a: np.ndarray, b: np.ndarray, tolerance: float = 1e-5) -> bool:
+    """Whether two boxes have the same corners, in any order."""
+    distances = np.abs(a[:, None, :] - b[None, :, :]).max(axis=2)
+    nearest = np.concatenate([distances.min(axis=1), distances.min(axis=0)])
+    return bool((nearest <= tolerance).all())
+
+
+def test_compressed_counts_match_run_lengths():
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        mask = random_mask(rng, 50, 70)
+        counts = mask_to_counts(mask)
+        points = rle_to_polygon_points({'size': [50, 70], 'counts': counts})
+        compressed = rle_to_polygon_points({'size': [50, 70], 'counts': encode_rle_counts(counts)})
+        np.testing.assert_array_equal(points, compressed)
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'opencv'])
+def test_rle_boxes_match_opencv_on_mask_pixels(tmp_path, backend):
+    rng = np.random.default_rng(2)
+    images, annotations, masks = [], [], []
+    for image_id in range(1, 41):
+        height, width = (int(side) for side in rng.integers(8, 120, size=2))
+        mask = random_mask(rng, height, width)
+        if not mask.any():
+            continue
+        counts = mask_to_counts(mask)
+        images.append({
+            'id': image_id, 'file_name': f"mask_{image_id}.png", 'width': width, 'height': height
+        })
+        annotations.append({
+            'id': image_id, 'image_id': image_id, 'category_id': 1, 'iscrowd': 1,
+            'segmentation': {
+                'size': [height, width],
+                'counts': encode_rle_counts(counts) if image_id % 2 else counts
+            }
+        })
+        masks.append(mask)
+    coco_file = tmp_path / 'masks.json'
+    coco_file.write_text(json.dumps({
+        'images': images, 'annotations': annotations, 'categories': [{'id': 1, 'name': 'blob'}]
+    }))
+
+    output_dir = tmp_path / 'labels'
+    convert_coco_to_yolo_obb(str(coco_file), str(output_dir), geometry_backend=backend)
+    labels = read_labels(output_dir)
+    for image, mask in zip(images, masks):
+        line = labels[f"mask_{image['id']}.txt"].split()
+        corners = np.array(line[1:], dtype=np.float64).reshape(4, 2)
+        expected = pixel_box(mask)
+        if backend == 'opencv':
+            assert same_corners(corners, expected), image['file_name']
+        else:
+            # Pixel grids often have several rectangles of the minimum area, and
+            # the NumPy backend may pick another one than OpenCV
+            scale = [image['width'], image['height']]
+            corners, expected = corners * scale, expected * scale
+            assert box_area(corners) == pytest.approx(box_area(expected), rel=1e-4, abs=1e-3)
+            assert contains(corners, mask_pixels(mask)), image['file_name']
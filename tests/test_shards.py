@@ -0,0 +1,32 @@
+"""Tar label shards unpack to the same label files as the 'files' backend writes."""
+
+import pytest
+
+from coco2yolo_obb import LabelShardReader, convert_coco_to_yolo_obb, unpack_label_shards
+from conftest import read_labels
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_unpacked_tar_shards_match_files(tmp_path, coco_file, expected, streaming):
+    shard_dir = tmp_path / 'shards'
+    # Small shards, so the labels are spread over several of them
+    convert_coco_to_yolo_obb(
+        coco_file, str(shard_dir), streaming=streaming, output_backend='tar', shard_bytes=2048
+    )
+    assert len(list(shard_dir.glob('*.tar'))) > 1
+    output_dir = tmp_path / 'unpacked'
+    assert unpack_label_shards(str(shard_dir), str(output_dir)) == len(expected)
+    assert read_labels(output_dir) == expected
+
+
+def test_shard_reader_reads_every_label(tmp_path, coco_file, expected):
+    shard_dir = tmp_path / 'shards'
+    convert_coco_to_yolo_obb(coco_file, str(shard_dir), output_backend='tar', shard_bytes=2048)
+    reader = LabelShardReader(str(shard_dir))
+    try:
+        assert sorted(f"{stem}.txt" for stem in reader) == sorted(expected)
+        # In reverse order, so the reads jump between shards
+        for name in sorted(expected, reverse=True):
+            assert reader.read(name[:-len('.txt')]) == expected[name]
+    finally:
+        reader.close()
@@ -0,0 +1,129 @@
+"""Several annotation files converted as one job, and label files two images would share."""
+
+import json
+import sys
+
+import pytest
+
+import coco2yolo_obb
+from coco2yolo_obb import ConflictError, ConversionStats, OptionError, convert_coco_to_yolo_obb
+from conftest import make_coco, read_labels
+
+BOX = [[10, 10, 40, 12, 35, 30, 12, 28]]
+
+
+def write_coco(path, images, categories, annotations=None) -> str:
+    if annotations is None:
+        annotations = [
+            {'id': image['id'], 'image_id': image['id'], 'category_id': categories[-1]['id'],
+             'segmentation': BOX}
+            for image in images
+        ]
+    path.write_text(json.dumps({
+        'images': images, 'annotations': annotations, 'categories': categories
+    }))
+    return str(path)
+
+
+def image(image_id: int, file_name: str) -> dict:
+    return {'id': image_id, 'file_name': file_name, 'width': 100, 'height': 100}
+
+
+def test_splits_share_one_class_mapping(tmp_path):
+    train, val = make_coco(num_images=6, seed=1), make_coco(num_images=4, seed=2)
+    # The validation split only has category 5, and one the training split lacks
+    val['categories'] = [{'id': 9, 'name': 'class_9'}, {'id': 5, 'name': 'class_5'}]
+    for ann in val['annotations']:
+        ann['category_id'] = 5 if ann['id'] % 2 else 9
+    files = []
+    for name, data in (('train', train), ('val', val)):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(data))
+        files.append(str(path))
+    output_dir = tmp_path / 'labels'
+    convert_coco_to_yolo_obb(files, str(output_dir))
+
+    # The training split gets the mapping of a conversion of it alone
+    train_dir = tmp_path / 'train_alone'
+    convert_coco_to_yolo_obb(files[0], str(train_dir))
+    assert read_labels(output_dir / 'train') == read_labels(train_dir)
+    # and categories first seen in later splits are numbered after its own
+    val_dir = tmp_path / 'val_alone'
+    convert_coco_to_yolo_obb(files[1], str(val_dir), class_mapping={1: 0, 2: 1, 5: 2, 9: 3})
+    assert read_labels(output_dir / 'val') == read_labels(val_dir)
+
+
+def test_conflicting_category_names_raise(tmp_path):
+    first = write_coco(tmp_path / 'a.json', [image(1, 'a.jpg')], [{'id': 1, 'name': 'car'}])
+    second = write_coco(tmp_path / 'b.json', [image(1, 'b.jpg')], [{'id': 1, 'name': 'boat'}])
+    with pytest.raises(ConflictError):
+        convert_coco_to_yolo_obb([first, second], str(tmp_path / 'labels'))
+    # With a class mapping the names do not matter
+    convert_coco_to_yolo_obb([first, second], str(tmp_path / 'labels'), class_mapping={1: 0})
+
+
+def test_same_stem_in_one_file(tmp_path):
+    categories = [{'id': 1, 'name': 'car'}, {'id': 2, 'name': 'boat'}]
+    annotations = [
+        {'id': 1, 'image_id': 1, 'category_id': 1, 'segmentation': BOX},
+        {'id': 2, 'image_id': 2, 'category_id': 2, 'segmentation': BOX},
+    ]
+    coco_file = write_coco(
+        tmp_path / 'a.json', [image(1, 'a/001.jpg'), image(2, 'b/001.png')], categories,
+        annotations
+    )
+    stats = ConversionStats()
+    output_dir = tmp_path / 'labels'
+    convert_coco_to_yolo_obb(coco_file, str(output_dir), stats=stats)
+    assert stats.warnings['stem_collision'] == 1
+    # The later image wins
+    assert read_labels(output_dir)['001.txt'].startswith('1 ')
+
+    with pytest.raises(ConflictError):
+        convert_coco_to_yolo_obb(coco_file, str(tmp_path / 'strict'), on_collision='error')
+
+
+@pytest.mark.parametrize('on_collision', ['warn', 'error'])
+def test_same_stem_in_splits_sharing_a_directory(tmp_path, on_collision):
+    categories = [{'id': 1, 'name': 'car'}]
+    first = write_coco(
+        tmp_path / 'train.json', [image(1, '001.jpg'), image(2, '002.jpg')], categories
+    )
+    second = write_coco(tmp_path / 'val.json', [image(1, '002.jpg')], categories)
+    # '{parent}' is the same for both files, so they share one output directory
+    output_dir = str(tmp_path / 'labels' / '{parent}')
+    if on_collision == 'error':
+        with pytest.raises(ConflictError, match='val.json'):
+            convert_coco_to_yolo_obb([first, second], output_dir, on_collision=on_collision)
+    else:
+        stats = convert_coco_to_yolo_obb([first, second], output_dir, on_collision=on_collision)
+        assert stats.warnings['stem_collision'] == 1
+        assert sorted(read_labels(tmp_path / 'labels' / tmp_path.name)) == ['001.txt', '002.txt']
+
+
+def run_cli(monkeypatch, *args) -> None:
+    monkeypatch.setattr(sys, 'argv', ['coco2yolo_obb.py', *args])
+    coco2yolo_obb.main()
+
+
+def test_cli_reports_option_and_conflict_errors(tmp_path, monkeypatch, capsys):
+    first = write_coco(tmp_path / 'a.json', [image(1, 'a.jpg')], [{'id': 1, 'name': 'car'}])
+    second = write_coco(tmp_path / 'b.json', [image(1, 'b.jpg')], [{'id': 1, 'name': 'boat'}])
+    with pytest.raises(OptionError):
+        convert_coco_to_yolo_obb(first, str(tmp_path / 'labels'), tile_stride=10)
+    for args in ([first, '--tile-stride', '10'], [first, second]):
+        with pytest.raises(SystemExit) as exit_info:
+            run_cli(monkeypatch, *args, '--output-dir', str(tmp_path / 'labels'))
+        assert exit_info.value.code == 1
+        assert capsys.readouterr().out.startswith('Error: ')
+
+
+def test_cli_keeps_tracebacks_of_other_errors(tmp_path, monkeypatch):
+    coco_file = write_coco(tmp_path / 'a.json', [image(1, 'a.jpg')], [{'id': 1, 'name': 'car'}])
+
+    def broken(*args, **kwargs):
+        raise ValueError('not a user error')
+
+    monkeypatch.setattr(coco2yolo_obb, 'convert_coco_to_yolo_obb', broken)
+    with pytest.raises(ValueError, match='not a user error'):
+        run_cli(monkeypatch, coco_file, '--output-dir', str(tmp_path / 'labels'))
@@ -0,0 +1,23 @@
+"""Streaming conversion writes the same label files as an in-memory conversion."""
+
+import json
+
+import pytest
+
+from coco2yolo_obb import convert_coco_to_yolo_obb
+from conftest import read_labels
+
+
+@pytest.mark.parametrize('annotations_first', [False, True])
+def test_streaming_matches_in_memory(tmp_path, coco_data, coco_file, expected, annotations_first):
+    if annotations_first:
+        # Nothing can be written before the images are known: every annotation is spilled
+        coco_file = tmp_path / 'annotations_first.json'
+        coco_file.write_text(json.dumps(dict(reversed(list(coco_data.items())))))
+    output_dir = tmp_path / 'streaming'
+    spill_dir = tmp_path / 'spill'
+    spill_dir.mkdir()
+    convert_coco_to_yolo_obb(
+        str(coco_file), str(output_dir), streaming=True, spill_dir=str(spill_dir)
+    )
+    assert read_labels(output_dir) == expected
@@ -0,0 +1,132 @@
+"""Tiled conversion agrees with a brute-force clip of every annotation to every tile."""
+
+import json
+
+import numpy as np
+import pytest
+
+from coco2yolo_obb import (
+    calculate_obb_corners,
+    clip_polygon,
+    convert_coco_to_yolo_obb,
+    merge_polygon_parts,
+    rle_to_polygon_points,
+)
+from conftest import read_labels
+
+
+def tile_origins(length: int, size: int, stride: int) -> list:
+    """Tiles every ``stride`` pixels, plus a last one flush with the border."""
+    if length <= size:
+        return [0]
+    origins = list(range(0, length - size + 1, stride))
+    if origins[-1] + size < length:
+        origins.append(length - size)
+    return origins
+
+
+def polygon_area(polygon: list) -> float:
+    x, y = np.asarray(polygon[0::2]), np.asarray(polygon[1::2])
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def convex_hull(points: np.ndarray) -> list:
+    """Convex hull of flat points (monotone chain), as a flat polygon."""
+    pairs = sorted(set(zip(points[0::2].tolist(), points[1::2].tolist())))
+
+    def chain(pairs):
+        hull = []
+        for p in pairs:
+            while len(hull) >= 2 and (
+                (hull[-1][0] - hull[-2][0]) * (p[1] - hull[-2][1])
+                - (hull[-1][1] - hull[-2][1]) * (p[0] - hull[-2][0])
+            ) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull[:-1]
+
+    return [value for point in chain(pairs) + chain(pairs[::-1]) for value in point]
+
+
+def reference_tiles(coco_data: dict, size: int, stride: int, min_visible: float, policy: str):
+    """Label lines of every tile with visible annotations, one tile and annotation at a time."""
+    categories = {cat['id']: index for index, cat in enumerate(coco_data['categories'])}
+    by_image = {}
+    for ann in coco_data['annotations']:
+        by_image.setdefault(ann['image_id'], []).append(ann)
+    tiles = {}
+    for image in coco_data['images']:
+        width, height = image['width'], image['height']
+        tile_width, tile_height = min(size, width), min(size, height)
+        stem = image['file_name'].rsplit('.', 1)[0]
+        for y0 in tile_origins(height, size, stride):
+            for x0 in tile_origins(width, size, stride):
+                lines = []
+                for ann in by_image.get(image['id'], []):
+                    segmentation = ann['segmentation']
+                    if isinstance(segmentation, dict):
+                        parts = [convex_hull(rle_to_polygon_points(segmentation))]
+                    else:
+                        parts = segmentation
+                    fragments = []
+                    for part in parts:
+                        shifted = np.array(part, dtype=np.float64).reshape(-1, 2) - [x0, y0]
+                        fragment = clip_polygon(
+                            shifted.ravel().tolist(), 0, 0, tile_width, tile_height
+                        )
+                        if len(fragment) >= 6:
+                            fragments.append(fragment)
+                    if not fragments:
+                        continue
+                    if policy == 'first':
+                        fragments = fragments[:1]
+                    elif policy == 'largest':
+                        fragments = [max(fragments, key=polygon_area)]
+                    total = sum(polygon_area(part) for part in parts)
+                    if sum(polygon_area(fragment) for fragment in fragments) < min_visible * total:
+                        continue
+                    corners = calculate_obb_corners(
+                        merge_polygon_parts(fragments, policy), tile_width, tile_height
+                    )
+                    lines.append((categories[ann['category_id']], corners))
+                if lines:
+                    tiles[f"{stem}_{x0}_{y0}.txt"] = lines
+    return tiles
+
+
+@pytest.mark.parametrize('policy', ['first', 'largest', 'union'])
+@pytest.mark.parametrize('size, stride, min_visible', [(128, 96, 0.5), (100, 100, 0.2)])
+def test_tiles_match_brute_force(tmp_path, coco_data, coco_file, size, stride, min_visible, policy):
+    output_dir = tmp_path / 'tiles'
+    convert_coco_to_yolo_obb(
+        coco_file, str(output_dir), multi_part=policy,
+        tile_size=size, tile_stride=stride, min_visible=min_visible
+    )
+    labels = read_labels(output_dir)
+    expected = reference_tiles(coco_data, size, stride, min_visible, policy)
+    assert sorted(labels) == sorted(expected)
+    for name, lines in expected.items():
+        written = [line.split() for line in labels[name].splitlines()]
+        assert [int(line[0]) for line in written] == [class_id for class_id, _ in lines], name
+        np.testing.assert_allclose(
+            [[float(value) for value in line[1:]] for line in written],
+            [corners for _, corners in lines], atol=2e-6, err_msg=name
+        )
+
+
+def test_tiles_of_small_image_match_untiled(tmp_path):
+    # An image smaller than a tile is a single tile with the labels of the whole image
+    coco_data = {
+        'images': [{'id': 1, 'file_name': 'small.jpg', 'width': 90, 'height': 60}],
+        'categories': [{'id': 1, 'name': 'thing'}],
+        'annotations': [
+            {'id': 1, 'image_id': 1, 'category_id': 1,
+             'segmentation': [[10, 10, 40, 12, 35, 30, 12, 28]]}
+        ]
+    }
+    coco_file = tmp_path / 'small.json'
+    coco_file.write_text(json.dumps(coco_data))
+    convert_coco_to_yolo_obb(str(coco_file), str(tmp_path / 'plain'))
+    convert_coco_to_yolo_obb(str(coco_file), str(tmp_path / 'tiled'), tile_size=128)
+    plain = read_labels(tmp_path / 'plain')
+    assert read_labels(tmp_path / 'tiled') == {'small_0_0.txt': plain['small.txt']}
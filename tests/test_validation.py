@@ -0,0 +1,78 @@
+"""Box fit validation: flagged boxes are reported and, with ``drop_invalid``, left out."""
+
+import json
+
+import pytest
+
+from coco2yolo_obb import ConversionStats, convert_coco_to_yolo_obb
+from conftest import read_labels
+
+GOOD = [
+    [20, 20, 80, 20, 80, 80, 20, 80],
+    [120, 20, 180, 20, 150, 60],
+]
+# A bow tie crosses itself; a thin L shape covers a few percent of its box
+BAD = [
+    [100, 100, 150, 150, 150, 100, 100, 150],
+    [10, 110, 90, 110, 90, 112, 12, 112, 12, 190, 10, 190],
+]
+
+
+@pytest.fixture
+def fit_file(tmp_path):
+    images, annotations = [], []
+    for image_id in range(1, 5):
+        images.append({
+            'id': image_id, 'file_name': f"fit_{image_id}.jpg", 'width': 200, 'height': 200
+        })
+        for polygon in GOOD + BAD:
+            annotations.append({
+                'id': len(annotations) + 1, 'image_id': image_id, 'category_id': 1,
+                'segmentation': [polygon]
+            })
+    path = tmp_path / 'fit.json'
+    path.write_text(json.dumps({
+        'images': images, 'annotations': annotations, 'categories': [{'id': 1, 'name': 'shape'}]
+    }))
+    return str(path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_drop_invalid_leaves_out_flagged_boxes(tmp_path, fit_file, workers):
+    output_dir = tmp_path / 'labels'
+    stats = ConversionStats()
+    convert_coco_to_yolo_obb(
+        fit_file, str(output_dir), drop_invalid=True, workers=workers, stats=stats
+    )
+    labels = read_labels(output_dir)
+    assert len(labels) == 4
+    assert all(len(text.splitlines()) == len(GOOD) for text in labels.values())
+
+    summary = stats.validation.summary()
+    assert summary['checked'] == 4 * (len(GOOD) + len(BAD))
+    assert summary['flagged'] == summary['dropped'] == 4 * len(BAD)
+    assert summary['issues']['self_intersecting'] == 4
+    # The two halves of the bow tie cancel out, so it has no fill either
+    assert summary['issues']['low_fill'] == 8
+    assert stats.warnings['poor_fit'] == 4 * len(BAD)
+
+
+def test_validate_keeps_flagged_boxes(tmp_path, fit_file):
+    plain_dir, validated_dir = tmp_path / 'plain', tmp_path / 'validated'
+    convert_coco_to_yolo_obb(fit_file, str(plain_dir))
+    stats = convert_coco_to_yolo_obb(fit_file, str(validated_dir), validate=True)
+    assert read_labels(validated_dir) == read_labels(plain_dir)
+    assert stats.validation.summary()['dropped'] == 0
+
+
+def test_report_lists_flagged_annotations(tmp_path, fit_file):
+    report_file = tmp_path / 'report.json'
+    convert_coco_to_yolo_obb(fit_file, str(tmp_path / 'labels'), validation_report=str(report_file))
+    report = json.loads(report_file.read_text())
+    per_image = len(GOOD) + len(BAD)
+    # The bad polygons come after the good ones in every image
+    expected_ids = [
+        ann_id for ann_id in range(1, 4 * per_image + 1) if (ann_id - 1) % per_image >= len(GOOD)
+    ]
+    assert sorted(box[0] for box in report['boxes']) == expected_ids
+    assert report['flagged'] == len(expected_ids) and report['dropped'] == 0
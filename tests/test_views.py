@@ -0,0 +1,81 @@
+"""Output views written in one pass match filtering the labels of a plain conversion."""
+
+import numpy as np
+import pytest
+
+from coco2yolo_obb import convert_coco_to_yolo_obb
+from conftest import read_labels
+
+
+def parse(labels: dict) -> dict:
+    return {name: [line.split() for line in text.splitlines()] for name, text in labels.items()}
+
+
+def box_areas(lines: list, width: int, height: int) -> list:
+    areas = []
+    for line in lines:
+        points = np.array(line[1:], dtype=np.float64).reshape(4, 2) * [width, height]
+        areas.append(
+            np.linalg.norm(points[1] - points[0]) * np.linalg.norm(points[2] - points[1])
+        )
+    return areas
+
+
+def test_views_match_filtered_labels(tmp_path, coco_data, coco_file, expected):
+    expected = parse(expected)
+    sizes = {
+        f"{image['file_name'].rsplit('.', 1)[0]}.txt": (image['width'], image['height'])
+        for image in coco_data['images']
+    }
+    # A threshold in the widest gap between box areas, so rounding cannot move a box across it
+    areas = np.unique(np.concatenate([
+        box_areas(lines, *sizes[name]) for name, lines in expected.items() if lines
+    ]))
+    middle = areas[len(areas) // 4:3 * len(areas) // 4]
+    gap = int(np.argmax(np.diff(middle)))
+    min_area = float(middle[gap] + middle[gap + 1]) / 2
+
+    views = [
+        {'output_dir': str(tmp_path / 'all')},
+        # Default numbering is 1 -> 0, 2 -> 1, 5 -> 2
+        {'output_dir': str(tmp_path / 'subset'), 'categories': [5, 1]},
+        {'output_dir': str(tmp_path / 'remapped'), 'class_mapping': {'2': 7}},
+        {'output_dir': str(tmp_path / 'large'), 'min_area': min_area},
+        {'output_dir': str(tmp_path / 'half'), 'sample': 0.5, 'seed': 7},
+        {'output_dir': str(tmp_path / 'quarter'), 'sample': 0.25, 'seed': 7},
+    ]
+    convert_coco_to_yolo_obb(coco_file, views=views)
+    written = {view['output_dir']: parse(read_labels(view['output_dir'])) for view in views}
+
+    assert written[str(tmp_path / 'all')] == expected
+    subset = {'2': '0', '0': '1'}
+    assert written[str(tmp_path / 'subset')] == {
+        name: [[subset[line[0]]] + line[1:] for line in lines if line[0] in subset]
+        for name, lines in expected.items()
+    }
+    assert written[str(tmp_path / 'remapped')] == {
+        name: [['7'] + line[1:] for line in lines if line[0] == '1']
+        for name, lines in expected.items()
+    }
+    assert written[str(tmp_path / 'large')] == {
+        name: [
+            line for line, area in zip(lines, box_areas(lines, *sizes[name])) if area >= min_area
+        ]
+        for name, lines in expected.items()
+    }
+    assert 0 < sum(len(lines) for lines in written[str(tmp_path / 'large')].values()) < sum(
+        len(lines) for lines in expected.values()
+    )
+
+    half, quarter = written[str(tmp_path / 'half')], written[str(tmp_path / 'quarter')]
+    assert 0 < len(quarter) < len(half) < len(expected)
+    assert set(quarter) <= set(half)
+    assert all(half[name] == expected[name] for name in half)
+
+
+def test_views_must_not_share_a_directory(tmp_path, coco_file):
+    views = [
+        {'output_dir': str(tmp_path / 'a')}, {'output_dir': str(tmp_path / 'a'), 'sample': 0.5}
+    ]
+    with pytest.raises(ValueError, match='both write to'):
+        convert_coco_to_yolo_obb(coco_file, views=views)
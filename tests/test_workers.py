@@ -0,0 +1,13 @@
+"""A process pool writes the same label files as a serial conversion."""
+
+import pytest
+
+from coco2yolo_obb import convert_coco_to_yolo_obb
+from conftest import read_labels
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_workers_match_serial(tmp_path, coco_file, expected, streaming):
+    output_dir = tmp_path / 'workers'
+    convert_coco_to_yolo_obb(coco_file, str(output_dir), workers=2, streaming=streaming)
+    assert read_labels(output_dir) == expected
@@ -0,0 +1,113 @@
+"""xywha labels agree with the corner labels, and the single and batch paths agree."""
+
+import json
+import random
+
+import numpy as np
+import pytest
+
+from coco2yolo_obb import (
+    calculate_obb_corners,
+    calculate_obb_corners_batch,
+    calculate_obb_xywha,
+    calculate_obb_xywha_batch,
+    convert_coco_to_yolo_obb,
+    convert_label_files,
+    corners_to_xywha,
+    xywha_to_corners,
+)
+from conftest import random_polygon, read_labels
+
+cv2 = pytest.importorskip('cv2')
+
+WIDTH, HEIGHT = 320, 240
+
+
+def make_polygons(count: int = 200, seed: int = 3) -> list:
+    """Random polygons, and axis-aligned rectangles whose angle is exactly 90 degrees."""
+    rng = random.Random(seed)
+    polygons = [
+        random_polygon(
+            rng, rng.uniform(40, WIDTH - 40), rng.uniform(40, HEIGHT - 40), rng.uniform(5, 40)
+        )
+        for _ in range(count)
+    ]
+    polygons += [[10, 10, 60, 10, 60, 30, 10, 30], [10, 10, 30, 10, 30, 60, 10, 60]]
+    return polygons
+
+
+def label_values(labels: dict) -> np.ndarray:
+    return np.array([
+        [float(value) for value in line.split()[1:]]
+        for name in sorted(labels) for line in labels[name].splitlines()
+    ])
+
+
+@pytest.fixture
+def box_file(tmp_path):
+    polygons = make_polygons()
+    images = [
+        {'id': image_id, 'file_name': f"box_{image_id}.jpg", 'width': WIDTH, 'height': HEIGHT}
+        for image_id in range(1, 11)
+    ]
+    annotations = [
+        {'id': index + 1, 'image_id': index % 10 + 1, 'category_id': 1, 'segmentation': [polygon]}
+        for index, polygon in enumerate(polygons)
+    ]
+    path = tmp_path / 'boxes.json'
+    path.write_text(json.dumps({
+        'images': images, 'annotations': annotations, 'categories': [{'id': 1, 'name': 'box'}]
+    }))
+    return str(path)
+
+
+def test_single_and_batch_boxes_agree():
+    polygons = make_polygons()
+    xywha = calculate_obb_xywha_batch(polygons, WIDTH, HEIGHT, backend='opencv')
+    corners = calculate_obb_corners_batch(polygons, WIDTH, HEIGHT, backend='opencv')
+    for polygon, box, box_corners in zip(polygons, xywha, corners):
+        np.testing.assert_allclose(calculate_obb_xywha(polygon, WIDTH, HEIGHT), box, atol=1e-9)
+        # The single box's corners come from cv2.boxPoints in float32
+        np.testing.assert_allclose(
+            calculate_obb_corners(polygon, WIDTH, HEIGHT), box_corners, atol=1e-6
+        )
+    assert ((xywha[:, 4] > 0) & (xywha[:, 4] <= 90)).all()
+    assert (xywha[-2:, 4] == 90).all()
+
+
+def test_xywha_labels_match_corner_labels(tmp_path, box_file):
+    corners_dir, xywha_dir = tmp_path / 'corners', tmp_path / 'xywha'
+    convert_coco_to_yolo_obb(box_file, str(corners_dir))
+    convert_coco_to_yolo_obb(box_file, str(xywha_dir), label_format='xywha')
+    corners = label_values(read_labels(corners_dir))
+    xywha = label_values(read_labels(xywha_dir))
+    np.testing.assert_allclose(xywha_to_corners(xywha, WIDTH, HEIGHT), corners, atol=1e-5)
+    # Angles of small boxes taken from rounded corners are off by more than the
+    # rounding, so the round trip is compared by its corners
+    round_trip = corners_to_xywha(corners, WIDTH, HEIGHT)
+    np.testing.assert_allclose(round_trip[:, :4], xywha[:, :4], atol=1e-5)
+    np.testing.assert_allclose(xywha_to_corners(round_trip, WIDTH, HEIGHT), corners, atol=1e-5)
+
+
+def test_convert_label_files_round_trip(tmp_path, box_file):
+    corners_dir, xywha_dir = tmp_path / 'corners', tmp_path / 'xywha'
+    convert_coco_to_yolo_obb(box_file, str(corners_dir))
+    convert_coco_to_yolo_obb(box_file, str(xywha_dir), label_format='xywha')
+
+    converted_dir = tmp_path / 'converted'
+    written = convert_label_files(
+        str(corners_dir), str(converted_dir), 'xywha', image_size=(WIDTH, HEIGHT)
+    )
+    assert written == len(read_labels(corners_dir))
+    corners = label_values(read_labels(corners_dir))
+    converted = label_values(read_labels(converted_dir))
+    np.testing.assert_allclose(
+        converted[:, :4], label_values(read_labels(xywha_dir))[:, :4], atol=1e-5
+    )
+    np.testing.assert_allclose(xywha_to_corners(converted, WIDTH, HEIGHT), corners, atol=1e-5)
+
+    back_dir = tmp_path / 'back'
+    convert_label_files(
+        str(converted_dir), str(back_dir), 'corners', workers=2, image_size=(WIDTH, HEIGHT)
+    )
+    np.testing.assert_allclose(label_values(read_labels(back_dir)), corners, atol=1e-5)